@@ -0,0 +1,34 @@
+"""Compact popularity history.
+
+Revision ID: 0a6c2e9f4b81
+Revises: f8b1d3e7a2c4
+Create Date: 2026-10-18 23:52:07.318645
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0a6c2e9f4b81"
+down_revision = "f8b1d3e7a2c4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Popularity is forward filled by readers, so rows repeating the previous
+    # popularity of their album or track carry no information.
+    for kind, popularity_column in (("album", '"Spotify popularity"'), ("track", "popularity")):
+        op.execute(
+            f"DELETE FROM {kind}_popularity WHERE ({kind}_id, date) IN ("  # noqa: S608
+            f"SELECT {kind}_id, date FROM ("
+            f"SELECT {kind}_id, date, {popularity_column} AS popularity, "
+            f"lag({popularity_column}) OVER (PARTITION BY {kind}_id ORDER BY date) AS previous_popularity "
+            f"FROM {kind}_popularity"
+            f") WHERE popularity = previous_popularity)",
+        )
+
+
+def downgrade() -> None:
+    # Deleted rows repeated the previous popularity and are not restored
+    pass
@@ -0,0 +1,95 @@
+"""Add snapshot deltas.
+
+Revision ID: 1c7e4a2b9d05
+Revises: 0a6c2e9f4b81
+Create Date: 2026-10-19 00:41:26.175092
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "1c7e4a2b9d05"
+down_revision = "0a6c2e9f4b81"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "snapshot_delta",
+        sa.Column("id", sa.String(), nullable=False, comment="Spotify playlist snapshot ID"),
+        sa.Column(
+            "base_id",
+            sa.String(),
+            nullable=False,
+            comment="ID of the snapshot the delta applies to, either a full snapshot or another delta",
+        ),
+        sa.Column(
+            "depth",
+            sa.Integer(),
+            nullable=False,
+            comment="Number of deltas between the full base snapshot and this one",
+        ),
+        sa.Column("playlist_id", sa.String(), nullable=False, comment="Id of this snapshot's playlist"),
+        sa.Column("timestamp", sa.DateTime(), nullable=False, comment="Timestamp at which snapshot was captured"),
+        sa.ForeignKeyConstraint(["playlist_id"], ["playlist.id"], name=op.f("fk_snapshot_delta_playlist_id_playlist")),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_snapshot_delta")),
+    )
+    op.create_index(op.f("ix_snapshot_delta_playlist_id"), "snapshot_delta", ["playlist_id"], unique=False)
+    op.create_table(
+        "snapshot_operation",
+        sa.Column("snapshot_id", sa.String(), nullable=False, comment="Spotify playlist snapshot ID"),
+        sa.Column(
+            "position",
+            sa.Integer(),
+            nullable=False,
+            comment="Position of the operation within the delta, operations being applied in order",
+        ),
+        sa.Column(
+            "type",
+            sa.Enum("delete", "insert", "move", name="snapshotoperationtype"),
+            nullable=False,
+            comment="Type of the operation ('delete', 'insert', or 'move')",
+        ),
+        sa.Column(
+            "index",
+            sa.Integer(),
+            nullable=False,
+            comment="Position of the first deleted, inserted or moved track",
+        ),
+        sa.Column(
+            "length",
+            sa.Integer(),
+            nullable=False,
+            comment="Number of deleted or moved tracks. 1 for insertions",
+        ),
+        sa.Column(
+            "insert_before",
+            sa.Integer(),
+            nullable=True,
+            comment="Position moved tracks are inserted at, once removed. NULL for other operations",
+        ),
+        sa.Column(
+            "track_id",
+            sa.String(),
+            nullable=True,
+            comment="Spotify ID of the inserted track. NULL for other operations",
+        ),
+        sa.ForeignKeyConstraint(
+            ["snapshot_id"],
+            ["snapshot_delta.id"],
+            name=op.f("fk_snapshot_operation_snapshot_id_snapshot_delta"),
+        ),
+        sa.PrimaryKeyConstraint("snapshot_id", "position", name=op.f("pk_snapshot_operation")),
+    )
+    op.create_index(op.f("ix_snapshot_operation_track_id"), "snapshot_operation", ["track_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_snapshot_operation_track_id"), table_name="snapshot_operation")
+    op.drop_table("snapshot_operation")
+    op.drop_index(op.f("ix_snapshot_delta_playlist_id"), table_name="snapshot_delta")
+    op.drop_table("snapshot_delta")
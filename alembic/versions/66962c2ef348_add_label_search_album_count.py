@@ -0,0 +1,42 @@
+"""Add label search album count.
+
+Revision ID: 66962c2ef348
+Revises: 1c7e4a2b9d05
+Create Date: 2026-10-19 02:14:37.508213
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "66962c2ef348"
+down_revision = "1c7e4a2b9d05"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.get_bind().execute(sa.text("pragma foreign_keys = off"))
+
+    with op.batch_alter_table("label_search", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "album_count",
+                sa.Integer(),
+                nullable=True,
+                comment="Number of albums found by the last search of the year. NULL if unknown",
+            )
+        )
+
+    op.get_bind().execute(sa.text("pragma foreign_keys = on"))
+
+
+def downgrade() -> None:
+    op.get_bind().execute(sa.text("pragma foreign_keys = off"))
+
+    with op.batch_alter_table("label_search", schema=None) as batch_op:
+        batch_op.drop_column("album_count")
+
+    op.get_bind().execute(sa.text("pragma foreign_keys = on"))
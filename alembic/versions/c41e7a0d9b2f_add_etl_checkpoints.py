@@ -0,0 +1,51 @@
+"""Add ETL runs and checkpoints.
+
+Revision ID: c41e7a0d9b2f
+Revises: 55c3b8dbf877
+Create Date: 2026-10-18 20:12:31.482913
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c41e7a0d9b2f"
+down_revision = "55c3b8dbf877"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "etl_run",
+        sa.Column("id", sa.Integer(), nullable=False, comment="ETL run ID"),
+        sa.Column("started_at", sa.DateTime(), nullable=False, comment="Timestamp at which the run started"),
+        sa.Column(
+            "finished_at",
+            sa.DateTime(),
+            nullable=True,
+            comment="Timestamp at which the run finished. NULL while the run is unfinished",
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_etl_run")),
+    )
+    op.create_table(
+        "etl_checkpoint",
+        sa.Column("run_id", sa.Integer(), nullable=False, comment="ETL run ID"),
+        sa.Column("stage", sa.String(), nullable=False, comment="Name of the completed stage"),
+        sa.Column(
+            "key",
+            sa.String(),
+            nullable=False,
+            comment="Item the stage completed for, e.g. a label name. Empty for stages run once",
+        ),
+        sa.Column("completed_at", sa.DateTime(), nullable=False, comment="Timestamp at which the stage completed"),
+        sa.ForeignKeyConstraint(["run_id"], ["etl_run.id"], name=op.f("fk_etl_checkpoint_run_id_etl_run")),
+        sa.PrimaryKeyConstraint("run_id", "stage", "key", name=op.f("pk_etl_checkpoint")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("etl_checkpoint")
+    op.drop_table("etl_run")
@@ -0,0 +1,43 @@
+"""Add label searches.
+
+Revision ID: d7f3b2e84a1c
+Revises: c41e7a0d9b2f
+Create Date: 2026-10-18 21:48:05.217340
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d7f3b2e84a1c"
+down_revision = "c41e7a0d9b2f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "label_search",
+        sa.Column("label_name", sa.String(), nullable=False, comment="Name of the searched record label"),
+        sa.Column("year", sa.Integer(), nullable=False, comment="Searched release year"),
+        sa.Column(
+            "searched_at",
+            sa.DateTime(),
+            nullable=False,
+            comment="Timestamp at which the year was last searched",
+        ),
+        sa.Column(
+            "is_frozen",
+            sa.Boolean(),
+            nullable=False,
+            comment="Whether the year was last searched after it settled, so that it is not searched anymore",
+        ),
+        sa.ForeignKeyConstraint(["label_name"], ["label.name"], name=op.f("fk_label_search_label_name_label")),
+        sa.PrimaryKeyConstraint("label_name", "year", name=op.f("pk_label_search")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("label_search")
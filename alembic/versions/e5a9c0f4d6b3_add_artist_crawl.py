@@ -0,0 +1,48 @@
+"""Add artist crawls.
+
+Revision ID: e5a9c0f4d6b3
+Revises: d7f3b2e84a1c
+Create Date: 2026-10-18 22:36:41.905128
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e5a9c0f4d6b3"
+down_revision = "d7f3b2e84a1c"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "artist_crawl",
+        sa.Column("artist_id", sa.String(), nullable=False, comment="Spotify artist ID"),
+        sa.Column(
+            "album_count",
+            sa.Integer(),
+            nullable=False,
+            comment="Number of albums of the artist when last crawled",
+        ),
+        sa.Column(
+            "latest_release_date",
+            sa.Date(),
+            nullable=True,
+            comment="Release date of the latest album of the artist when last crawled. NULL if it had no albums",
+        ),
+        sa.Column(
+            "crawled_at",
+            sa.DateTime(),
+            nullable=False,
+            comment="Timestamp at which the discography of the artist was last crawled",
+        ),
+        sa.ForeignKeyConstraint(["artist_id"], ["artist.id"], name=op.f("fk_artist_crawl_artist_id_artist")),
+        sa.PrimaryKeyConstraint("artist_id", name=op.f("pk_artist_crawl")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("artist_crawl")
@@ -0,0 +1,59 @@
+"""Add popularity refreshes.
+
+Revision ID: f8b1d3e7a2c4
+Revises: e5a9c0f4d6b3
+Create Date: 2026-10-18 23:14:52.630417
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f8b1d3e7a2c4"
+down_revision = "e5a9c0f4d6b3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "popularity_refresh",
+        sa.Column(
+            "kind",
+            sa.Enum("album", "track", name="popularitykind"),
+            nullable=False,
+            comment="Type of the refreshed entity ('album' or 'track')",
+        ),
+        sa.Column("id", sa.String(), nullable=False, comment="Spotify album or track ID"),
+        sa.Column(
+            "refreshed_on",
+            sa.Date(),
+            nullable=False,
+            comment="Date at which popularity was last refreshed",
+        ),
+        sa.Column("popularity", sa.Integer(), nullable=False, comment="Spotify popularity at last refresh"),
+        sa.Column(
+            "volatility",
+            sa.Float(),
+            nullable=False,
+            comment="Exponential moving average of popularity changes between refreshes",
+        ),
+        sa.Column("due_on", sa.Date(), nullable=False, comment="Date from which popularity is due for a refresh"),
+        sa.PrimaryKeyConstraint("kind", "id", name=op.f("pk_popularity_refresh")),
+    )
+    op.create_index(op.f("ix_popularity_refresh_due_on"), "popularity_refresh", ["due_on"], unique=False)
+    # Existing entities are all due, least recently refreshed first. SQLite takes
+    # the popularity column from the row holding `max(date)`.
+    for kind, popularity_column in (("album", '"Spotify popularity"'), ("track", "popularity")):
+        op.execute(
+            f"INSERT INTO popularity_refresh (kind, id, refreshed_on, popularity, volatility, due_on) "  # noqa: S608
+            f"SELECT '{kind}', {kind}_id, max(date), {popularity_column}, 0, max(date) "
+            f"FROM {kind}_popularity GROUP BY {kind}_id",
+        )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_popularity_refresh_due_on"), table_name="popularity_refresh")
+    op.drop_table("popularity_refresh")
@@ -0,0 +1,73 @@
+"""Compare reorder requests planned for New Lofi updates by greedy scan and by longest increasing subsequence.
+
+Snapshot histories of the playlist at `NEW_LOFI_PLAYLIST_ID` are read
+from the database at `DB_NAME`.
+
+Run with `python -m benchmarks.new_lofi_reorders`.
+"""
+
+from __future__ import annotations
+
+import itertools
+from typing import TYPE_CHECKING
+
+from lofi import db, env
+from lofi.etl.snapshots import get_snapshot
+from lofi.spotify_api.tracklist_utils import InvertibleList, TracklistReorder, get_tracklist_reorders
+
+from .playlist_edits import get_snapshot_histories
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+
+
+def get_greedy_tracklist_reorders(target: Sequence[str], current: Sequence[str]) -> Iterator[TracklistReorder]:
+    """Yield reorders the way `get_tracklist_reorders` planned them before, by a left-to-right scan."""
+    invertible_current = InvertibleList(current)
+    insert_before = 0
+    while True:
+        while insert_before < len(current) and invertible_current[insert_before] == target[insert_before]:
+            insert_before += 1
+        if insert_before == len(current):
+            return
+        start = invertible_current.index(target[insert_before])
+        length = 1
+        while (
+            length <= 100  # noqa: PLR2004
+            and (end := (start + length - 1)) < len(target)
+            and target[length - 1] == invertible_current[end]
+        ):
+            length += 1
+        if length > 1:
+            length -= 1
+        yield TracklistReorder(insert_before=insert_before, range_length=length, range_start=start)
+        invertible_current.move(start, length, insert_before)
+        insert_before += length
+
+
+def get_reordered_tracklist(target: Sequence[str], current: Sequence[str]) -> list[str]:
+    """Return the tracklist `set_playlist_tracks` reorders, once tracks are removed and added."""
+    current_set, target_set = set(current), set(target)
+    return [t for t in target if t not in current_set] + [t for t in current if t in target_set]
+
+
+def main() -> None:
+    with db.connect() as session:
+        snapshot_ids = get_snapshot_histories(session).get(env.new_lofi_playlist_id(), [])
+        tracklists = [get_snapshot(session, snapshot_id) for snapshot_id in snapshot_ids]
+        session.rollback()
+    greedy_requests = lis_requests = updates = 0
+    for current, target in itertools.pairwise(tracklists):
+        if current == target:
+            continue
+        updates += 1
+        reordered = get_reordered_tracklist(target, current)
+        greedy_requests += sum(1 for _ in get_greedy_tracklist_reorders(target, reordered))
+        lis_requests += sum(1 for _ in get_tracklist_reorders(target, reordered))
+    print(f"{updates:,} New Lofi updates")  # noqa: T201
+    for name, requests in (("greedy scan", greedy_requests), ("LIS", lis_requests)):
+        print(f"{name:>11}: {requests:>7,} reorders, {requests / max(updates, 1):6.1f} per update")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compare Spotify API requests needed to apply playlist snapshot histories.
+
+Each update strategy of `set_playlist_tracks` is compared with the
+cheapest plan, which is what is applied. Histories are read from the
+database at `DB_NAME`.
+
+Run with `python -m benchmarks.playlist_edits`.
+"""
+
+from __future__ import annotations
+
+import itertools
+from collections import Counter, defaultdict
+
+from sqlalchemy import select, union_all
+
+from lofi import db
+from lofi.etl.snapshots import get_snapshot
+from lofi.spotify_api.tracklist_utils import (
+    get_minimal_edits_plan,
+    get_reorders_plan,
+    get_replace_plan,
+    get_suffix_diff_plan,
+    get_tracklist_plan,
+)
+
+
+def get_snapshot_histories(session: db.Session) -> dict[str, list[str]]:
+    """Return IDs of snapshots of each playlist in chronological order, by playlist ID."""
+    snapshots = union_all(
+        select(db.Snapshot.playlist_id, db.Snapshot.id, db.Snapshot.timestamp).where(db.Snapshot.position == 0),
+        select(db.SnapshotDelta.playlist_id, db.SnapshotDelta.id, db.SnapshotDelta.timestamp),
+    ).subquery()
+    sql = select(snapshots.c.playlist_id, snapshots.c.id).order_by(snapshots.c.timestamp)
+    histories = defaultdict(list)
+    for playlist_id, snapshot_id in session.execute(sql):
+        histories[playlist_id].append(snapshot_id)
+    return histories
+
+
+def main() -> None:
+    with db.connect() as session:
+        histories = get_snapshot_histories(session)
+        requests: Counter[str] = Counter()
+        updates = 0
+        for snapshot_ids in histories.values():
+            tracklists = (get_snapshot(session, snapshot_id) for snapshot_id in snapshot_ids)
+            for current, target in itertools.pairwise(tracklists):
+                if current == target:
+                    continue
+                updates += 1
+                plans = {
+                    "suffix diff": get_suffix_diff_plan(target, current),
+                    "minimal edits": get_minimal_edits_plan(target, current),
+                    "reorders": get_reorders_plan(target, current),
+                    "full replace": get_replace_plan(target),
+                    "cheapest": get_tracklist_plan(target, current),
+                }
+                requests.update({name: plan.request_count for name, plan in plans.items() if plan is not None})
+        session.rollback()
+    print(f"{updates:,} playlist updates across {len(histories):,} playlists")  # noqa: T201
+    for name, count in requests.items():
+        print(f"{name:>13}: {count:>9,} requests, {count / max(updates, 1):6.1f} per update")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare the list-based `InvertibleList` with the treap-based one, and time reorder planning.
+
+Run with `python -m benchmarks.tracklist_reorders`.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from typing import TYPE_CHECKING, Generic, TypeVar
+
+from lofi.spotify_api.tracklist_utils import InvertibleList, get_tracklist_reorders
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+_T = TypeVar("_T")
+
+SIZES = (100, 1_000, 10_000)
+
+
+class ListInvertibleList(Generic[_T]):
+    """`InvertibleList` the way it was implemented before the treap."""
+
+    def __init__(self, values: Sequence[_T] = []) -> None:
+        self.values = list(values)
+        self.inverted = {val: index for index, val in enumerate(values)}
+
+    def delete(self, start: int, length: int) -> None:
+        stop = start + length
+        deleted_values = self.values[start:stop]
+        del self.values[start:stop]
+        for value in deleted_values:
+            del self.inverted[value]
+        for value in self.values[start:]:
+            self.inverted[value] -= stop - start
+
+    def insert(self, start: int, values: Sequence[_T]) -> None:
+        self.values = self.values[:start] + list(values) + self.values[start:]
+        for i, val in enumerate(values):
+            self.inverted[val] = start + i
+        for val in self.values[start + len(values) :]:
+            self.inverted[val] += len(values)
+
+    def index(self, val: _T) -> int:
+        return self.inverted[val]
+
+    def move(self, start: int, length: int, insert_before: int) -> None:
+        moved = self.values[start : start + length]
+        self.delete(start, length)
+        self.insert(insert_before, moved)
+
+
+def get_reorder_steps(n: int, rng: random.Random) -> list[tuple[int, int, int]]:
+    """Return (value, length, insert_before) steps of a reorder plan of `n` tracks."""
+    steps = []
+    for _ in range(n):
+        length = min(rng.randrange(1, 4), n)
+        steps.append((rng.randrange(n), length, rng.randrange(n - length + 1)))
+    return steps
+
+
+def time_steps(il: ListInvertibleList[int] | InvertibleList[int], steps: Sequence[tuple[int, int, int]]) -> float:
+    start = time.perf_counter()
+    for value, length, insert_before in steps:
+        index = min(il.index(value), len(steps) - length)
+        il.move(index, length, insert_before)
+    return time.perf_counter() - start
+
+
+def time_reorders(n: int, rng: random.Random) -> tuple[int, float]:
+    """Return reorder count and planning time of a popularity reshuffle of `n` tracks."""
+    target = list(range(n))
+    # Each track moves by a few positions, as popularity changes only reorder neighbours
+    current = sorted(target, key=lambda i: i + rng.gauss(0, 5))
+    start = time.perf_counter()
+    count = sum(1 for _ in get_tracklist_reorders(target, current))
+    return count, time.perf_counter() - start
+
+
+def main() -> None:
+    rng = random.Random(0)  # noqa: S311
+    for n in SIZES:
+        steps = get_reorder_steps(n, rng)
+        for name, il in (("list", ListInvertibleList(range(n))), ("treap", InvertibleList(range(n)))):
+            elapsed = time_steps(il, steps)
+            print(f"{name:>6} {n:>6,} tracks: {n:>6,} moves in {elapsed:6.3f}s")  # noqa: T201
+    for n in SIZES:
+        count, elapsed = time_reorders(n, rng)
+        print(f"reorders {n:>6,} tracks: {count:>6,} reorders planned in {elapsed:6.3f}s")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compare per-row `Session.merge` uploads with bulk upserts.
+
+Run with `python -m benchmarks.upload`.
+"""
+
+from __future__ import annotations
+
+import datetime
+import time
+from typing import TYPE_CHECKING
+
+from lofi import db
+from lofi.db.connection import get_sessionmaker, get_temp_file_path
+from lofi.etl.main import upload_tracks
+from lofi.spotify_api import Track
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+
+def generate_tracks(n: int) -> list[Track]:
+    return [
+        Track.model_validate(
+            {
+                "id": f"track{i}",
+                "name": f"Track {i}",
+                "album": {"id": "album", "name": "Album"},
+                "artists": [{"id": f"artist{i % 7}", "name": "Artist"}, {"id": f"artist{i % 11}", "name": "Artist"}],
+                "external_ids": {"isrc": f"ISRC{i}"},
+                "popularity": i % 100,
+                "track_number": i % 20,
+            },
+        )
+        for i in range(n)
+    ]
+
+
+def merge_tracks(session: db.Session, tracks: Sequence[Track], *, is_lofi: bool) -> None:
+    """Upload tracks the way the ETL did before bulk upserts."""
+    for track in tracks:
+        session.merge(
+            db.Track(
+                album_id=track.album.id,
+                id=track.id,
+                is_lofi=is_lofi,
+                isrc=track.external_ids.isrc,
+                name=track.name,
+                position=track.track_number,
+            ),
+        )
+        session.merge(db.TrackPopularity(track_id=track.id, date=datetime.date.today(), popularity=track.popularity))
+        for artist_position, artist in enumerate(track.artists):
+            session.merge(db.RelArtistTrack(artist_id=artist.id, track_id=track.id, artist_position=artist_position))
+
+
+def time_upload(upload: Callable[..., None], tracks: Sequence[Track]) -> float:
+    with get_temp_file_path() as path:
+        sessionmaker = get_sessionmaker(str(path))
+        db.Base.metadata.create_all(sessionmaker.kw["bind"])
+        with sessionmaker() as session, session.begin():
+            session.add(db.Playlist(id="", is_editorial=False))
+            session.flush()
+            session.add(db.Label(name="Label", is_indie=False, playlist_id=""))
+            session.add(
+                db.Album(
+                    id="album", label_name="Label", name="Album", release_date=datetime.date.today(), type="single"
+                )
+            )
+            session.add_all(db.Artist(id=f"artist{i}", name="Artist") for i in range(11))
+            session.flush()
+            start = time.perf_counter()
+            upload(session, tracks, is_lofi=True)
+            session.flush()
+            return time.perf_counter() - start
+
+
+def main() -> None:
+    for n in (1_000, 10_000):
+        tracks = generate_tracks(n)
+        # Each track writes one track row, one popularity row and two artist relations
+        rows = 4 * n
+        for name, upload in (("merge", merge_tracks), ("upsert", upload_tracks)):
+            elapsed = time_upload(upload, tracks)
+            print(f"{name:>6} {n:>6,} tracks: {elapsed:6.2f}s, {rows / elapsed:>9,.0f} rows/s")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -70,36 +70,26 @@ def get_track_popularity_sql() -> Select[tuple[str, int]]:
         .where(track_subq.c.id_rank == 1, track_subq.c.release_date > six_months_ago)
         .cte()
     )
-    popularity_subq = (
-        select(
-            db.TrackPopularity.track_id,
-            db.TrackPopularity.popularity,
-            func.row_number()
-            .over(partition_by=db.TrackPopularity.track_id, order_by=db.TrackPopularity.date.desc())
-            .label("date_rank"),
-        )
-        .where(
-            db.TrackPopularity.track_id.in_(
-                select(db.Track.id).where(db.Track.isrc.in_(select(track.c.isrc).scalar_subquery())).scalar_subquery()
-            ),
-        )
-        .subquery()
+    popularity_subq = db.track_popularity_as_of(
+        db.TrackPopularity.track_id.in_(
+            select(db.Track.id).where(db.Track.isrc.in_(select(track.c.isrc).scalar_subquery())).scalar_subquery()
+        ),
     )
     popularity = (
         select(db.Track.isrc, func.max(popularity_subq.c.popularity).label("popularity"))
         .select_from(join(db.Track, popularity_subq, db.Track.id == popularity_subq.c.track_id))
-        .where(popularity_subq.c.date_rank == 1)
         .group_by(db.Track.isrc)
         .subquery()
     )
 
+    editorial_playlist_ids = select(db.Playlist.id).where(db.Playlist.is_editorial).scalar_subquery()
+    editorial_track_ids = db.snapshot_track_ids(editorial_playlist_ids)
     editorials = (
         select(db.Track.isrc)
         .distinct()
-        .select_from(join(db.Snapshot, db.Track, db.Snapshot.track_id == db.Track.id))
         .where(
             db.Track.isrc.in_(select(track.c.isrc).scalar_subquery()),
-            db.Snapshot.playlist_id.in_(select(db.Playlist.id).where(db.Playlist.is_editorial).scalar_subquery()),
+            db.Track.id.in_(editorial_track_ids),
         )
         .subquery()
     )
@@ -14,11 +14,11 @@ def main() -> None:
 
 
 @main.command
-@click.option("--name", help="Label name")
+@click.option("--name", "names", multiple=True, help="Label name, can be repeated to add several labels")
 @lofi.db.with_connection
-def add_label(session: lofi.db.Session, name: str) -> None:
-    """Add label to database."""
-    lofi.etl.add_label(session, name)
+def add_label(session: lofi.db.Session, names: tuple[str, ...]) -> None:
+    """Add labels to database."""
+    lofi.etl.add_labels(session, names)
 
 
 @main.command
@@ -37,9 +37,12 @@ def add_label_playlist(session: lofi.db.Session, label: str, playlist_id: str) -
 
 
 @main.command
-def etl() -> None:
+@click.option("--async", "use_async", is_flag=True, help="Run label searches and playlist reads concurrently.")
+@click.option("--resume", is_flag=True, help="Skip stages completed by the last run if it did not finish.")
+@click.option("--pipelined", is_flag=True, help="Write label albums on a dedicated thread while fetching.")
+def etl(*, use_async: bool, resume: bool, pipelined: bool) -> None:
     """Run main ETL."""
-    lofi.etl.run()
+    lofi.etl.run(use_async=use_async, resume=resume, pipelined=pipelined)
 
 
 @main.group
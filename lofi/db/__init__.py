@@ -2,6 +2,7 @@ from .connection import (
     Session,
     connect,
     download_local_db,
+    get_lock,
     get_url,
     upload_local_db,
     with_connection,
@@ -11,37 +12,63 @@ from .models import (
     AlbumPopularity,
     AlbumType,
     Artist,
+    ArtistCrawl,
     Base,
+    EtlCheckpoint,
+    EtlRun,
     Label,
+    LabelSearch,
     Playlist,
+    PopularityKind,
+    PopularityRefresh,
     PopularityStreams,
     RelArtistAlbum,
     RelArtistTrack,
     Snapshot,
+    SnapshotDelta,
+    SnapshotOperation,
+    SnapshotOperationType,
     Track,
     TrackPopularity,
     User,
 )
+from .popularity import track_popularity_as_of
+from .snapshots import snapshot_track_ids
+from .upsert import insert_ignore, upsert
 
 __all__ = [
     "Album",
     "AlbumPopularity",
     "AlbumType",
     "Artist",
+    "ArtistCrawl",
     "Base",
+    "EtlCheckpoint",
+    "EtlRun",
     "Label",
+    "LabelSearch",
     "Playlist",
+    "PopularityKind",
+    "PopularityRefresh",
     "PopularityStreams",
     "RelArtistAlbum",
     "RelArtistTrack",
     "Session",
     "Snapshot",
+    "SnapshotDelta",
+    "SnapshotOperation",
+    "SnapshotOperationType",
     "Track",
     "TrackPopularity",
     "User",
     "connect",
     "download_local_db",
+    "get_lock",
     "get_url",
+    "insert_ignore",
+    "snapshot_track_ids",
+    "track_popularity_as_of",
     "upload_local_db",
+    "upsert",
     "with_connection",
 ]
@@ -8,7 +8,8 @@ import pathlib
 import shutil
 import sqlite3
 import tempfile
-from typing import TYPE_CHECKING, Any, Callable, Concatenate, ParamSpec, TypeVar
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Concatenate, ParamSpec, TypeVar, cast
 
 import sqlalchemy
 from sqlalchemy import Engine, event
@@ -45,11 +46,16 @@ def create_engine(db_name: str) -> Engine:
 
 @contextlib.contextmanager
 def connect(db_name: str | None = None) -> Iterator[Session]:
-    """Connect to database."""
+    """Connect to database.
+
+    The session is committed on exit, or rolled back if an exception is
+    raised. It may also be committed earlier to persist partial work.
+    """
     if db_name is None:
         db_name = os.environ["DB_NAME"]
-    with get_sessionmaker(db_name)() as session, session.begin():
+    with get_sessionmaker(db_name)() as session:
         yield session
+        session.commit()
 
 
 def download_local_db(drive_file_name: str | None = None, db_path: pathlib.Path | None = None) -> None:
@@ -70,6 +76,11 @@ def download_local_db(drive_file_name: str | None = None, db_path: pathlib.Path
     LOGGER.info("Downloaded local database")
 
 
+def get_lock(session: Session) -> threading.RLock:
+    """Return the lock serializing use of `session` across threads."""
+    return cast(threading.RLock, session.info.setdefault("lock", threading.RLock()))
+
+
 def get_sessionmaker(db_name: str) -> sessionmaker[Session]:
     """Return sessionmaker."""
     return sessionmaker(bind=create_engine(db_name))
@@ -58,6 +58,28 @@ class RelArtistTrack(Base):
     )
 
 
+class EtlRun(Base):
+    id: Mapped[int] = mapped_column(primary_key=True, comment="ETL run ID")
+    started_at: Mapped[datetime.datetime] = mapped_column(comment="Timestamp at which the run started")
+    finished_at: Mapped[datetime.datetime | None] = mapped_column(
+        comment="Timestamp at which the run finished. NULL while the run is unfinished",
+    )
+
+    checkpoints: Mapped[list[EtlCheckpoint]] = relationship(back_populates="run")
+
+
+class EtlCheckpoint(Base):
+    run_id: Mapped[int] = mapped_column(ForeignKey(EtlRun.id), primary_key=True, comment="ETL run ID")
+    stage: Mapped[str] = mapped_column(primary_key=True, comment="Name of the completed stage")
+    key: Mapped[str] = mapped_column(
+        primary_key=True,
+        comment="Item the stage completed for, e.g. a label name. Empty for stages run once",
+    )
+    completed_at: Mapped[datetime.datetime] = mapped_column(comment="Timestamp at which the stage completed")
+
+    run: Mapped[EtlRun] = relationship(back_populates="checkpoints")
+
+
 class Label(Base):
     name: Mapped[str] = mapped_column(
         primary_key=True,
@@ -81,6 +103,25 @@ class Label(Base):
         back_populates="filter_for_label", foreign_keys="Playlist.filter_for_label_name"
     )
     playlist: Mapped[Playlist] = relationship(foreign_keys=[playlist_id])
+    searches: Mapped[list[LabelSearch]] = relationship(back_populates="label")
+
+
+class LabelSearch(Base):
+    label_name: Mapped[str] = mapped_column(
+        ForeignKey(Label.name),
+        primary_key=True,
+        comment="Name of the searched record label",
+    )
+    year: Mapped[int] = mapped_column(primary_key=True, comment="Searched release year")
+    searched_at: Mapped[datetime.datetime] = mapped_column(comment="Timestamp at which the year was last searched")
+    is_frozen: Mapped[bool] = mapped_column(
+        comment="Whether the year was last searched after it settled, so that it is not searched anymore",
+    )
+    album_count: Mapped[int | None] = mapped_column(
+        comment="Number of albums found by the last search of the year. NULL if unknown",
+    )
+
+    label: Mapped[Label] = relationship(back_populates="searches")
 
 
 class Artist(Base):
@@ -93,6 +134,20 @@ class Artist(Base):
         back_populates="artists", secondary=RelArtistAlbum.__table__, order_by="Album.release_date"
     )
     tracks: Mapped[list[Track]] = relationship(back_populates="artists", secondary=RelArtistTrack.__table__)
+    crawl: Mapped[ArtistCrawl | None] = relationship(back_populates="artist")
+
+
+class ArtistCrawl(Base):
+    artist_id: Mapped[str] = mapped_column(ForeignKey(Artist.id), primary_key=True, comment="Spotify artist ID")
+    album_count: Mapped[int] = mapped_column(comment="Number of albums of the artist when last crawled")
+    latest_release_date: Mapped[datetime.date | None] = mapped_column(
+        comment="Release date of the latest album of the artist when last crawled. NULL if it had no albums",
+    )
+    crawled_at: Mapped[datetime.datetime] = mapped_column(
+        comment="Timestamp at which the discography of the artist was last crawled",
+    )
+
+    artist: Mapped[Artist] = relationship(back_populates="crawl")
 
 
 class AlbumType(StrEnum):
@@ -191,6 +246,28 @@ class Playlist(Base):
     snapshots: Mapped[list[Snapshot]] = relationship(back_populates="playlist")
 
 
+class PopularityKind(StrEnum):
+    album = "album"
+    track = "track"
+
+
+class PopularityRefresh(Base):
+    kind: Mapped[PopularityKind] = mapped_column(
+        primary_key=True,
+        comment="Type of the refreshed entity ('album' or 'track')",
+    )
+    id: Mapped[str] = mapped_column(primary_key=True, comment="Spotify album or track ID")
+    refreshed_on: Mapped[datetime.date] = mapped_column(comment="Date at which popularity was last refreshed")
+    popularity: Mapped[int] = mapped_column(comment="Spotify popularity at last refresh")
+    volatility: Mapped[float] = mapped_column(
+        comment="Exponential moving average of popularity changes between refreshes",
+    )
+    due_on: Mapped[datetime.date] = mapped_column(
+        comment="Date from which popularity is due for a refresh",
+        index=True,
+    )
+
+
 class PopularityStreams(Base):
     date: Mapped[datetime.date] = mapped_column(primary_key=True)
     popularity: Mapped[int] = mapped_column(primary_key=True)
@@ -221,6 +298,58 @@ class Snapshot(Base):
     playlist: Mapped[Playlist | None] = relationship(back_populates="snapshots")
 
 
+class SnapshotDelta(Base):
+    id: Mapped[str] = mapped_column(primary_key=True, comment="Spotify playlist snapshot ID")
+    base_id: Mapped[str] = mapped_column(
+        comment="ID of the snapshot the delta applies to, either a full snapshot or another delta",
+    )
+    depth: Mapped[int] = mapped_column(comment="Number of deltas between the full base snapshot and this one")
+    playlist_id: Mapped[str] = mapped_column(
+        ForeignKey(Playlist.id),
+        comment="Id of this snapshot's playlist",
+        index=True,
+    )
+    timestamp: Mapped[datetime.datetime] = mapped_column(comment="Timestamp at which snapshot was captured")
+
+    operations: Mapped[list[SnapshotOperation]] = relationship(
+        back_populates="delta",
+        order_by="SnapshotOperation.position",
+    )
+    playlist: Mapped[Playlist] = relationship()
+
+
+class SnapshotOperationType(StrEnum):
+    delete = "delete"
+    insert = "insert"
+    move = "move"
+
+
+class SnapshotOperation(Base):
+    snapshot_id: Mapped[str] = mapped_column(
+        ForeignKey(SnapshotDelta.id),
+        primary_key=True,
+        comment="Spotify playlist snapshot ID",
+    )
+    position: Mapped[int] = mapped_column(
+        primary_key=True,
+        comment="Position of the operation within the delta, operations being applied in order",
+    )
+    type: Mapped[SnapshotOperationType] = mapped_column(
+        comment="Type of the operation ('delete', 'insert', or 'move')",
+    )
+    index: Mapped[int] = mapped_column(comment="Position of the first deleted, inserted or moved track")
+    length: Mapped[int] = mapped_column(comment="Number of deleted or moved tracks. 1 for insertions")
+    insert_before: Mapped[int | None] = mapped_column(
+        comment="Position moved tracks are inserted at, once removed. NULL for other operations",
+    )
+    track_id: Mapped[str | None] = mapped_column(
+        comment="Spotify ID of the inserted track. NULL for other operations",
+        index=True,
+    )
+
+    delta: Mapped[SnapshotDelta] = relationship(back_populates="operations")
+
+
 class User(Base):
     id: Mapped[str] = mapped_column(primary_key=True, comment="Spotify user ID")
     token: Mapped[str | None] = mapped_column(comment="Spotipy cached token.")
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from sqlalchemy import func, select
+
+from .models import TrackPopularity
+
+if TYPE_CHECKING:
+    import datetime
+
+    from sqlalchemy import ColumnElement, Subquery
+
+__all__ = ["track_popularity_as_of"]
+
+
+def track_popularity_as_of(
+    track_ids: ColumnElement[bool] | None = None,
+    as_of: datetime.date | None = None,
+) -> Subquery:
+    """Return a subquery of track popularity on a given date.
+
+    Popularity rows may only be written when popularity changes, so the
+    popularity of a track on a date is forward filled from its latest
+    row on or before that date.
+
+    Parameters
+    ----------
+    track_ids
+        Condition on `TrackPopularity` restricting the tracks, e.g.
+        `TrackPopularity.track_id.in_(...)`. All tracks if None.
+    as_of
+        Date at which popularity is read. Latest popularity if None.
+
+    Returns
+    -------
+    Subquery with `track_id` and `popularity` columns, one row per track.
+
+    """
+    ranked = select(
+        TrackPopularity.track_id,
+        TrackPopularity.popularity,
+        func.row_number()
+        .over(partition_by=TrackPopularity.track_id, order_by=TrackPopularity.date.desc())
+        .label("date_rank"),
+    )
+    if track_ids is not None:
+        ranked = ranked.where(track_ids)
+    if as_of is not None:
+        ranked = ranked.where(TrackPopularity.date <= as_of)
+    subquery = ranked.subquery()
+    return select(subquery.c.track_id, subquery.c.popularity).where(subquery.c.date_rank == 1).subquery()
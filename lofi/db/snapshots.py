@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from sqlalchemy import join, select, union
+
+from .models import Snapshot, SnapshotDelta, SnapshotOperation, SnapshotOperationType
+
+if TYPE_CHECKING:
+    from sqlalchemy import CompoundSelect, ScalarSelect
+
+__all__ = ["snapshot_track_ids"]
+
+
+def snapshot_track_ids(playlist_ids: ScalarSelect[str]) -> CompoundSelect[tuple[str]]:
+    """Return a query of the IDs of tracks that were ever in a snapshot of given playlists.
+
+    Snapshots are stored either in full or as deltas against a previous
+    snapshot, so every track that was ever in a playlist is either in a
+    full snapshot or inserted by a delta.
+    """
+    return union(
+        select(Snapshot.track_id).where(Snapshot.playlist_id.in_(playlist_ids)),
+        select(SnapshotOperation.track_id)
+        .select_from(join(SnapshotOperation, SnapshotDelta))
+        .where(
+            SnapshotDelta.playlist_id.in_(playlist_ids),
+            SnapshotOperation.type == SnapshotOperationType.insert,
+        ),
+    )
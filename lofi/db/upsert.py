@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+import sqlalchemy
+from sqlalchemy.dialects.sqlite import insert
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping
+
+    from sqlalchemy.orm import Session
+
+    from .models import Base
+
+__all__ = ["insert_ignore", "upsert"]
+
+
+def insert_ignore(session: Session, model: type[Base], rows: Iterable[Mapping[str, Any]]) -> int:
+    """Insert rows, silently skipping those whose primary key already exists.
+
+    Parameters
+    ----------
+    session
+        Connected SQLAlchemy session.
+    model
+        Mapped class of the target table.
+    rows
+        Mappings of attribute name to value. All rows must have the same keys.
+
+    Returns
+    -------
+    Number of rows sent to the database.
+
+    """
+    return upsert(session, model, rows, update=False)
+
+
+def upsert(
+    session: Session,
+    model: type[Base],
+    rows: Iterable[Mapping[str, Any]],
+    *,
+    update: bool = True,
+) -> int:
+    """Insert rows, updating existing ones on primary key conflict.
+
+    All rows are sent in a single `INSERT ... ON CONFLICT DO UPDATE`
+    executemany, instead of one `SELECT` and one `INSERT` or `UPDATE`
+    per row as `Session.merge` does. On conflict, every non primary key
+    attribute present in the rows is overwritten.
+
+    Parameters
+    ----------
+    session
+        Connected SQLAlchemy session.
+    model
+        Mapped class of the target table.
+    rows
+        Mappings of attribute name to value. All rows must have the same keys.
+    update
+        Whether to update existing rows. If False, conflicting rows are
+        skipped.
+
+    Returns
+    -------
+    Number of rows sent to the database.
+
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    mapper = sqlalchemy.inspect(model)
+    primary_key = list(mapper.primary_key)
+    stmt = insert(model)
+    updated_columns = {
+        column: stmt.excluded[column.name]
+        for attr in mapper.column_attrs
+        if attr.key in rows[0] and (column := attr.columns[0]) not in primary_key
+    }
+    if update and updated_columns:
+        stmt = stmt.on_conflict_do_update(index_elements=primary_key, set_=updated_columns)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=primary_key)
+
+    session.execute(stmt, rows)
+    return len(rows)
@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import os
 import pathlib
 
@@ -18,5 +20,34 @@ def new_lofi_playlist_id() -> str:
     return os.environ["NEW_LOFI_PLAYLIST_ID"]
 
 
+def popularity_change_only() -> bool:
+    return os.environ.get("POPULARITY_CHANGE_ONLY", "1") != "0"
+
+
+def popularity_request_budget() -> int:
+    return int(os.environ.get("POPULARITY_REQUEST_BUDGET", "1000"))
+
+
+def search_settling_days() -> int:
+    return int(os.environ.get("SEARCH_SETTLING_DAYS", "60"))
+
+
+def spotify_cache_max_entries() -> int:
+    return int(os.environ.get("SPOTIFY_CACHE_MAX_ENTRIES", "100000"))
+
+
+def spotify_cache_path() -> pathlib.Path | None:
+    path = os.environ.get("SPOTIFY_CACHE_PATH")
+    return pathlib.Path(path) if path else None
+
+
+def spotify_max_workers() -> int:
+    return int(os.environ.get("SPOTIFY_MAX_WORKERS", "8"))
+
+
+def spotify_requests_per_second() -> float:
+    return float(os.environ.get("SPOTIFY_REQUESTS_PER_SECOND", "10"))
+
+
 def spotify_user_id() -> str:
     return os.environ["SPOTIFY_USER_ID"]
@@ -1,5 +1,6 @@
 from .main import (
     add_label,
+    add_labels,
     collect_label_albums,
     collect_popularity,
     run,
@@ -8,6 +9,7 @@ from .main import (
 
 __all__ = [
     "add_label",
+    "add_labels",
     "collect_label_albums",
     "collect_popularity",
     "run",
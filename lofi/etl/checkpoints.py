@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import datetime
+
+from sqlalchemy import select
+
+from lofi import db
+
+from .log import LOGGER
+
+
+class Checkpoints:
+    """Durable record of the stages completed by an ETL run.
+
+    Completing a stage commits the session, so that all work done so far
+    survives a failure later in the run. A resumed run skips the stages
+    its previous attempt completed.
+    """
+
+    def __init__(self, session: db.Session, run: db.EtlRun) -> None:
+        self.session = session
+        self.run = run
+        self.completed = {(c.stage, c.key) for c in run.checkpoints}
+
+    @classmethod
+    def start(cls, session: db.Session, *, resume: bool = False) -> Checkpoints:
+        """Start a new run, or resume the last one if it is unfinished and `resume` is True."""
+        run = session.execute(select(db.EtlRun).order_by(db.EtlRun.id.desc()).limit(1)).scalar_one_or_none()
+        if resume and run is not None and run.finished_at is None:
+            LOGGER.info(f"Resuming ETL run {run.id} from {len(run.checkpoints):,} completed stages")
+        else:
+            run = db.EtlRun(started_at=datetime.datetime.now(datetime.UTC))
+            session.add(run)
+            session.flush()
+        return cls(session, run)
+
+    def complete(self, stage: str, key: str = "") -> None:
+        """Record `stage` as completed for `key` and commit."""
+        self.session.add(
+            db.EtlCheckpoint(
+                run_id=self.run.id,
+                stage=stage,
+                key=key,
+                completed_at=datetime.datetime.now(datetime.UTC),
+            ),
+        )
+        self.session.commit()
+        self.completed.add((stage, key))
+
+    def finish(self) -> None:
+        """Record the run as finished and commit."""
+        self.run.finished_at = datetime.datetime.now(datetime.UTC)
+        self.session.commit()
+
+    def is_completed(self, stage: str, key: str = "") -> bool:
+        return (stage, key) in self.completed
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import bisect
+import heapq
+import threading
+from array import array
+from typing import TYPE_CHECKING, cast
+
+from sqlalchemy import select
+
+from lofi import db
+
+from .log import LOGGER
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from sqlalchemy.orm import InstrumentedAttribute
+
+BASE62_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+ID_LENGTH = 22
+
+_BASE62_DIGITS = {c: i for i, c in enumerate(BASE62_ALPHABET)}
+_LOW_MASK = 2**64 - 1
+
+
+def pack_id(spotify_id: str) -> int | None:
+    """Return the 128-bit integer encoded by a base62 Spotify ID, or None if it is not one."""
+    if len(spotify_id) != ID_LENGTH:
+        return None
+    value = 0
+    for c in spotify_id:
+        if (digit := _BASE62_DIGITS.get(c)) is None:
+            return None
+        value = value * 62 + digit
+    return None if value >> 128 else value
+
+
+class IdIndex:
+    """Compact, thread-safe set of Spotify IDs.
+
+    IDs are packed into 128-bit integers, whose high and low halves are
+    stored in two sorted arrays of unsigned 64-bit integers: 16 bytes per
+    ID, against about 100 for a `str` in a `set`. Added IDs are buffered
+    in a set, which is merged into the arrays once it grows past an
+    eighth of their size. IDs that are not 22-char base62 strings are
+    kept as is in a separate set.
+    """
+
+    min_merge_size = 4_096
+
+    def __init__(self, ids: Iterable[str] = ()) -> None:
+        self._lock = threading.Lock()
+        self._high = array("Q")
+        self._low = array("Q")
+        self._pending: set[int] = set()
+        self._other: set[str] = set()
+        self.update(ids)
+
+    def __contains__(self, spotify_id: object) -> bool:
+        if not isinstance(spotify_id, str):
+            return False
+        packed = pack_id(spotify_id)
+        with self._lock:
+            if packed is None:
+                return spotify_id in self._other
+            return packed in self._pending or self._is_merged(packed)
+
+    def __len__(self) -> int:
+        return len(self._high) + len(self._pending) + len(self._other)
+
+    def add(self, spotify_id: str) -> None:
+        self.update([spotify_id])
+
+    def update(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for spotify_id in ids:
+                packed = pack_id(spotify_id)
+                if packed is None:
+                    self._other.add(spotify_id)
+                elif not self._is_merged(packed):
+                    self._pending.add(packed)
+                    if len(self._pending) > max(self.min_merge_size, len(self._high) // 8):
+                        self._merge()
+
+    def _is_merged(self, packed: int) -> bool:
+        high, low = packed >> 64, packed & _LOW_MASK
+        i = bisect.bisect_left(self._high, high)
+        while i < len(self._high) and self._high[i] == high:
+            if self._low[i] == low:
+                return True
+            i += 1
+        return False
+
+    def _merge(self) -> None:
+        pending = sorted((packed >> 64, packed & _LOW_MASK) for packed in self._pending)
+        high, low = array("Q"), array("Q")
+        for high_half, low_half in heapq.merge(zip(self._high, self._low, strict=True), pending):
+            high.append(high_half)
+            low.append(low_half)
+        self._high, self._low = high, low
+        self._pending.clear()
+
+
+class KnownIds:
+    """IDs of the albums, artists and tracks in database.
+
+    Loaded once per session by `get_known_ids`, then kept up to date by
+    uploaders as they insert rows.
+    """
+
+    def __init__(self, albums: IdIndex, artists: IdIndex, tracks: IdIndex) -> None:
+        self.albums = albums
+        self.artists = artists
+        self.tracks = tracks
+
+    @classmethod
+    def load(cls, session: db.Session) -> KnownIds:
+        LOGGER.info("Loading known album, artist and track IDs")
+
+        def load_index(column: InstrumentedAttribute[str]) -> IdIndex:
+            return IdIndex(session.execute(select(column).execution_options(yield_per=10_000)).scalars())
+
+        known_ids = cls(load_index(db.Album.id), load_index(db.Artist.id), load_index(db.Track.id))
+        LOGGER.info(
+            f"Loaded {len(known_ids.albums):,} album, {len(known_ids.artists):,} artist "
+            f"and {len(known_ids.tracks):,} track IDs",
+        )
+        return known_ids
+
+
+def get_known_ids(session: db.Session) -> KnownIds:
+    """Return the known IDs of `session`, loading them on first call."""
+    with db.get_lock(session):
+        if "known_ids" not in session.info:
+            session.info["known_ids"] = KnownIds.load(session)
+        return cast(KnownIds, session.info["known_ids"])
@@ -1,20 +1,44 @@
 from __future__ import annotations
 
+import asyncio
 import datetime
+import functools
+from collections import Counter
 from typing import TYPE_CHECKING, Literal, Protocol
 
 from spotipy import SpotifyException  # type: ignore[import-untyped]
 from sqlalchemy import func, join, select, union, update
-from tqdm import tqdm
 
 from lofi import db, env
-from lofi.spotify_api import Album, Artist, ImageUrl, Playlist, SearchAlbum, SpotifyAPIClient, Track
-
+from lofi.spotify_api import (
+    Album,
+    Artist,
+    AsyncSpotifyAPIClient,
+    ImageUrl,
+    Playlist,
+    SearchAlbum,
+    SpotifyAPIClient,
+    Track,
+    get_rate_limiter,
+    get_response_cache,
+)
+from lofi.spotify_api.errors import SearchWindowSaturatedError
+
+from .checkpoints import Checkpoints
 from .errors import LabelAlreadyExistsError
+from .known_ids import get_known_ids
 from .log import LOGGER
+from .pipeline import DBWriter
+from .popularity import get_due_ids, schedule_refreshes
+from .snapshots import get_snapshot, get_snapshot_ids_in_db, upload_snapshot
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable, Sequence
+    from collections.abc import Callable, Container, Iterable, Iterator, Mapping, Sequence
+
+    from lofi.spotify_api.models import ArtistAlbum, Page
+
+# Maximum number of results Spotify returns for a search
+SEARCH_WINDOW_SIZE = 1_000
 
 
 class HasIdAndName(Protocol):
@@ -28,11 +52,13 @@ class HasArtists(Protocol):
         ...
 
 
-def add_label(session: db.Session, label_name: str) -> None:
+def add_label(session: db.Session, label_name: str, api: SpotifyAPIClient | None = None) -> None:
     LOGGER.info(f"Adding label {label_name} to database")
     if session.get(db.Label, label_name) is not None:
         raise LabelAlreadyExistsError(label_name)
-    playlist = SpotifyAPIClient(session).create_playlist(
+    if api is None:
+        api = SpotifyAPIClient(session)
+    playlist = api.create_playlist(
         label_name,
         f"All {label_name} releases",
         skip_if_already_exists=True,
@@ -42,6 +68,14 @@ def add_label(session: db.Session, label_name: str) -> None:
     session.flush()
 
 
+def add_labels(session: db.Session, label_names: Iterable[str], api: SpotifyAPIClient | None = None) -> None:
+    """Add labels to database, listing user playlists only once."""
+    if api is None:
+        api = SpotifyAPIClient(session)
+    for label_name in label_names:
+        add_label(session, label_name, api)
+
+
 def collect_artist_images(api: SpotifyAPIClient, session: db.Session) -> None:
     def get_image_width(image: ImageUrl) -> int:
         return 0 if image.width is None else image.width
@@ -57,98 +91,179 @@ def collect_artist_images(api: SpotifyAPIClient, session: db.Session) -> None:
     ids = session.execute(select(db.Artist.id).where(db.Artist.image_url_l.is_(None))).scalars().all()
     LOGGER.info(f"Collecting {len(ids):,} artist images")
     artists = api.artists(ids)
-    for artist in artists:
-        session.merge(
-            db.Artist(
-                id=artist.id,
-                name=artist.name,
-                image_url_s=get_image_url(artist, "smallest"),
-                image_url_l=get_image_url(artist, "largest"),
-            )
-        )
+    db.upsert(
+        session,
+        db.Artist,
+        [
+            {
+                "id": artist.id,
+                "name": artist.name,
+                "image_url_s": get_image_url(artist, "smallest"),
+                "image_url_l": get_image_url(artist, "largest"),
+            }
+            for artist in artists
+        ],
+    )
 
 
 def collect_albums(
     api: SpotifyAPIClient,
     search_results: Sequence[SearchAlbum],
-    excluded_ids: set[str] | None = None,
+    excluded_ids: Container[str] = (),
 ) -> list[Album]:
-    if excluded_ids is None:
-        excluded_ids = set()
-    ids = list({a.id for a in search_results} - excluded_ids)
+    ids = get_album_ids_to_collect(search_results, excluded_ids)
     LOGGER.info(f"Collecting {len(ids):,} albums")
-    return api.albums(ids, with_all_tracks=True)
+    return api.albums(ids, with_all_tracks=True, use_cache=False)
 
 
-def collect_albums_popularity(api: SpotifyAPIClient, session: db.Session) -> None:
-    ids = get_album_ids_with_outdated_popularity(session, max_albums=10_000)
+def collect_albums_popularity(api: SpotifyAPIClient, session: db.Session, ids: Sequence[str]) -> None:
     LOGGER.info(f"Collecting popularity for {len(ids):,} albums")
-    albums = api.albums(ids)
-    upload_albums_popularity(session, albums)
+    for albums in api.iter_albums(ids, use_cache=False):
+        upload_albums_popularity(session, albums)
 
 
-def collect_indie_albums(session: db.Session, labels: Sequence[db.Label], excluded_album_ids: set[str]) -> None:
+def collect_indie_albums(api: SpotifyAPIClient, session: db.Session, labels: Sequence[db.Label]) -> None:
+    """Collect albums of the artists of `labels` that are not in database yet.
+
+    Artist discographies are crawled concurrently. Artists whose album
+    count and latest release date did not change since their last crawl
+    are skipped after the first page. New albums are uploaded under their
+    own label, which is created as indie if it is unknown.
+    """
     LOGGER.info("Collecting indie albums")
-    api = SpotifyAPIClient(session)
     artist_ids = get_label_artist_ids(session, labels)
-    LOGGER.info("Collecting indie album IDs")
-    album_ids = {
-        album.id
-        for artist_id in tqdm(artist_ids)
-        for album in api.artist_albums(artist_id)
-        if album.id not in excluded_album_ids
+    watermarks = {
+        crawl.artist_id: (crawl.album_count, crawl.latest_release_date)
+        for crawl in session.execute(select(db.ArtistCrawl)).scalars()
     }
-    LOGGER.info(f"Collected {len(album_ids):,} album IDs")
-
-
-def collect_label_albums(session: db.Session, label: db.Label, excluded_album_ids: set[str] | None = None) -> None:
+    LOGGER.info(f"Crawling discographies of {len(artist_ids):,} artists")
+    discographies = api.map_concurrently(
+        lambda artist_id: api.artist_albums(
+            artist_id,
+            skip_if=functools.partial(is_discography_unchanged, watermarks.get(artist_id)),
+        ),
+        artist_ids,
+    )
+    changed = {
+        artist_id: discography
+        for artist_id, discography in zip(artist_ids, discographies, strict=True)
+        if discography is not None
+    }
+    LOGGER.info(f"{len(changed):,} out of {len(artist_ids):,} artists have changed discographies")
+
+    known_album_ids = get_known_ids(session).albums
+    album_ids = list(
+        dict.fromkeys(
+            album.id
+            for discography in changed.values()
+            for album in discography.items
+            if album.id not in known_album_ids
+        ),
+    )
+    LOGGER.info(f"Collecting {len(album_ids):,} indie albums")
+    filtered_label_names = set(
+        session.execute(
+            select(db.Playlist.filter_for_label_name).where(db.Playlist.filter_for_label_name.is_not(None)),
+        ).scalars(),
+    )
+    for albums in api.iter_albums(album_ids, with_all_tracks=True, use_cache=False):
+        tracks = collect_tracks(api, albums)
+        for is_lofi in (True, False):
+            if group := [album for album in albums if (album.label not in filtered_label_names) is is_lofi]:
+                group_ids = {album.id for album in group}
+                upload_label_albums(
+                    session,
+                    group,
+                    [track for track in tracks if track.album.id in group_ids],
+                    is_lofi=is_lofi,
+                )
+    upload_artist_crawls(session, changed)
+
+
+def collect_label_albums(
+    api: SpotifyAPIClient,
+    session: db.Session,
+    label: db.Label,
+    excluded_album_ids: Container[str] = (),
+    search_results: Sequence[SearchAlbum] | None = None,
+) -> None:
     LOGGER.info(f"Collecting label albums for {label.name}")
-    if excluded_album_ids is None:
-        excluded_album_ids = set()
-
-    api = SpotifyAPIClient(session)
-    search_results = search_missing_albums(api, label)
-    albums = collect_albums(api, search_results, excluded_album_ids)
-    albums = list(filter(lambda a: a.label == label.name, albums))
-    tracks = collect_tracks(api, albums)
-    upload_objects_artists(session, tracks)
-    upload_objects_artists(session, albums)
-    upload_albums(session, albums)
-    upload_tracks(session, tracks, is_lofi=len(label.filtering_playlists) == 0)
+
+    years = get_label_search_years(label)
+    if search_results is None:
+        search_results = search_missing_albums(api, label)
+    is_lofi = len(label.filtering_playlists) == 0
+    for albums, tracks in iter_label_albums(api, label.name, search_results, excluded_album_ids):
+        upload_label_albums(session, albums, tracks, is_lofi=is_lofi)
+    upload_label_searches(session, label.name, years, search_results)
 
 
-def collect_popularity(session: db.Session) -> None:
+def collect_labels_albums_pipelined(
+    api: SpotifyAPIClient,
+    session: db.Session,
+    labels: Sequence[db.Label],
+    checkpoints: Checkpoints,
+    search_results: Mapping[str, Sequence[SearchAlbum]] | None = None,
+) -> None:
+    """Collect label albums, fetching a label while previous ones are written.
+
+    Fetched albums and tracks are uploaded by a `DBWriter` thread, which
+    also records each label as completed once its data is written. This
+    thread owns the session for the whole collection, so everything
+    fetching needs from the database is read beforehand.
+    """
+    LOGGER.info(f"Collecting label albums of {len(labels):,} labels with a pipelined writer")
+    if search_results is None:
+        search_results = {}
+    excluded_album_ids = get_known_ids(session).albums
+    years = {label.name: get_label_search_years(label) for label in labels}
+    album_counts = {label.name: get_label_album_counts(label) for label in labels}
+    is_lofi = {label.name: len(label.filtering_playlists) == 0 for label in labels}
+    with DBWriter(session) as writer:
+        for i, label_name in enumerate(years):
+            LOGGER.info(f"{i + 1}/{len(years)} Collecting label albums for {label_name}")
+            label_search_results = search_results.get(label_name)
+            if label_search_results is None:
+                label_search_results = search_label_years(api, label_name, years[label_name], album_counts[label_name])
+            for albums, tracks in iter_label_albums(api, label_name, label_search_results, excluded_album_ids):
+                excluded_album_ids.update(album.id for album in albums)
+                writer.submit(upload_label_albums, session, albums, tracks, is_lofi=is_lofi[label_name])
+            writer.submit(upload_label_searches, session, label_name, years[label_name], label_search_results)
+            writer.submit(checkpoints.complete, "collect_label", label_name)
+            LOGGER.info(f"Database writer queue depth: {writer.queue_depth}")
+    LOGGER.info(writer.summary())
+
+
+def collect_popularity(api: SpotifyAPIClient, session: db.Session) -> None:
+    """Refresh popularity of the albums and tracks that are due, within the run request budget."""
     LOGGER.info("Collecting popularity")
-    api = SpotifyAPIClient(session)
-    collect_albums_popularity(api, session)
-    collect_tracks_popularity(api, session)
+    ids = get_due_ids(session, env.popularity_request_budget())
+    collect_albums_popularity(api, session, ids[db.PopularityKind.album])
+    collect_tracks_popularity(api, session, ids[db.PopularityKind.track])
 
 
 def collect_tracks(api: SpotifyAPIClient, albums: Sequence[Album]) -> list[Track]:
     LOGGER.info(f"Collecting tracks for {len(albums):,} albums")
     ids = list({t.id for album in albums for t in album.tracks.items})
-    return api.tracks(ids)
+    return api.tracks(ids, use_cache=False)
 
 
-def collect_tracks_popularity(api: SpotifyAPIClient, session: db.Session) -> None:
-    ids = get_track_ids_with_outdated_popularity(session, max_tracks=25_000)
+def collect_tracks_popularity(api: SpotifyAPIClient, session: db.Session, ids: Sequence[str]) -> None:
     LOGGER.info(f"Collecting popularity for {len(ids):,} tracks")
-    tracks = api.tracks(ids)
-    upload_tracks_popularity(session, tracks)
+    for tracks in api.iter_tracks(ids, use_cache=False):
+        upload_tracks_popularity(session, tracks)
 
 
-def get_album_ids_with_outdated_popularity(session: db.Session, max_albums: int) -> Sequence[str]:
-    sql = (
-        select(db.AlbumPopularity.album_id)
-        .group_by(db.AlbumPopularity.album_id)
-        .order_by(func.max(db.AlbumPopularity.date).nulls_first())
-        .limit(max_albums)
-    )
-    return session.execute(sql).scalars().all()
+def get_album_ids_to_collect(search_results: Iterable[SearchAlbum], excluded_ids: Container[str]) -> list[str]:
+    """Return unique IDs of `search_results` not in `excluded_ids`, in search order."""
+    return [album_id for album_id in dict.fromkeys(a.id for a in search_results) if album_id not in excluded_ids]
 
 
-def get_all_album_ids(session: db.Session) -> set[str]:
-    return set(session.execute(select(db.Album.id)).scalars())
+def get_changed_playlists(session: db.Session, playlists: Iterable[Playlist | None]) -> list[Playlist]:
+    """Return `playlists` whose snapshot is not in database, skipping None values."""
+    found_playlists = [p for p in playlists if p is not None]
+    snapshot_ids_in_db = get_snapshot_ids_in_db(session, [p.snapshot_id for p in found_playlists])
+    return [p for p in found_playlists if p.snapshot_id not in snapshot_ids_in_db]
 
 
 def get_expected_tracklist(session: db.Session, label_name: str) -> Sequence[str]:
@@ -195,6 +310,35 @@ def get_labels(session: db.Session) -> Sequence[db.Label]:
     return session.execute(sql).scalars().all()
 
 
+def get_label_album_counts(label: db.Label) -> dict[int, int]:
+    """Return the number of albums found by the last search of each year of `label`, when known."""
+    return {search.year: search.album_count for search in label.searches if search.album_count is not None}
+
+
+def get_label_search_years(label: db.Label) -> list[int]:
+    """Return release years to search for missing albums of `label`.
+
+    Years from the label's latest release to the current one are searched,
+    except frozen ones.
+    """
+    min_year = get_label_max_albums_release_date(label).year
+    frozen_years = {search.year for search in label.searches if search.is_frozen}
+    return [year for year in range(min_year, datetime.date.today().year + 1) if year not in frozen_years]
+
+
+def get_label_search_query(label_name: str, first_year: int, last_year: int) -> str:
+    year = str(first_year) if first_year == last_year else f"{first_year}-{last_year}"
+    return " ".join([f"year:{year}", *(f"label:{word}" for word in label_name.split())])
+
+
+def get_missing_albums_queries(label: db.Label, years: Iterable[int] | None = None) -> list[str]:
+    """Return queries searching missing albums of `label`, one per range of years, see `get_year_ranges`."""
+    if years is None:
+        years = get_label_search_years(label)
+    ranges = get_year_ranges(years, get_label_album_counts(label))
+    return [get_label_search_query(label.name, first, last) for first, last in ranges]
+
+
 def get_new_lofi_tracklist(session: db.Session) -> list[str]:
     one_week_ago = datetime.date.today() - datetime.timedelta(days=7)
     track_subq = (
@@ -213,23 +357,10 @@ def get_new_lofi_tracklist(session: db.Session) -> list[str]:
         .where(track_subq.c.id_rank == 1, track_subq.c.release_date > one_week_ago)
         .cte()
     )
-    popularity_subq = (
-        select(
-            db.TrackPopularity.track_id,
-            db.TrackPopularity.popularity,
-            func.row_number()
-            .over(
-                partition_by=db.TrackPopularity.track_id,
-                order_by=db.TrackPopularity.date.desc(),
-            )
-            .label("date_rank"),
-        )
-        .where(
-            db.TrackPopularity.track_id.in_(
-                select(db.Track.id).where(db.Track.isrc.in_(select(track.c.isrc).scalar_subquery())).scalar_subquery(),
-            ),
-        )
-        .subquery()
+    popularity_subq = db.track_popularity_as_of(
+        db.TrackPopularity.track_id.in_(
+            select(db.Track.id).where(db.Track.isrc.in_(select(track.c.isrc).scalar_subquery())).scalar_subquery(),
+        ),
     )
     popularity = (
         select(
@@ -239,7 +370,6 @@ def get_new_lofi_tracklist(session: db.Session) -> list[str]:
         .select_from(
             join(db.Track, popularity_subq, db.Track.id == popularity_subq.c.track_id),
         )
-        .where(popularity_subq.c.date_rank == 1)
         .group_by(db.Track.isrc)
         .subquery()
     )
@@ -251,70 +381,233 @@ def get_new_lofi_tracklist(session: db.Session) -> list[str]:
     return list(session.execute(sql).scalars())
 
 
-def get_snapshot(session: db.Session, snapshot_id: str) -> list[str]:
-    sql = select(db.Snapshot.track_id).where(db.Snapshot.id == snapshot_id).order_by(db.Snapshot.position)
-    return list(session.execute(sql).scalars())
+def get_tracked_playlists(session: db.Session) -> Sequence[db.Playlist]:
+    sql = select(db.Playlist).where(db.Playlist.filter_for_label_name.is_not(None))
+    return session.execute(sql).scalars().all()
 
 
-def get_track_ids_with_outdated_popularity(session: db.Session, max_tracks: int) -> Sequence[str]:
-    sql = (
-        select(db.TrackPopularity.track_id)
-        .group_by(db.TrackPopularity.track_id)
-        .order_by(func.max(db.TrackPopularity.date).nulls_first())
-        .limit(max_tracks)
+def get_year_ranges(years: Iterable[int], album_counts: Mapping[int, int] | None = None) -> list[tuple[int, int]]:
+    """Return first and last years of each range of consecutive `years`.
+
+    If the album count of some years is known from their last search,
+    ranges are also split so that their known albums fit in a single
+    search, which then does not need to be split by `search_year_range`.
+    """
+    if album_counts is None:
+        album_counts = {}
+    ranges: list[tuple[int, int]] = []
+    range_album_count = 0
+    for year in sorted(years):
+        album_count = album_counts.get(year, 0)
+        if ranges and ranges[-1][1] == year - 1 and range_album_count + album_count < SEARCH_WINDOW_SIZE:
+            ranges[-1] = (ranges[-1][0], year)
+            range_album_count += album_count
+        else:
+            ranges.append((year, year))
+            range_album_count = album_count
+    return ranges
+
+
+def get_user_playlists(api: SpotifyAPIClient) -> dict[str, Playlist]:
+    """Return an ID -> playlist mapping of all user's playlists."""
+    return dict(api.get_playlist_index().by_id)
+
+
+def iter_label_albums(
+    api: SpotifyAPIClient,
+    label_name: str,
+    search_results: Sequence[SearchAlbum],
+    excluded_album_ids: Container[str],
+) -> Iterator[tuple[list[Album], list[Track]]]:
+    """Yield albums of a label found by `search_results` and their tracks, one window at a time.
+
+    Albums are fetched in fixed-size windows, and the tracks of a window
+    are fetched before the next window is, so that memory use does not
+    grow with the size of the label's catalogue.
+    """
+    ids = get_album_ids_to_collect(search_results, excluded_album_ids)
+    LOGGER.info(f"Collecting {len(ids):,} albums")
+    for window in api.iter_albums(ids, with_all_tracks=True, use_cache=False):
+        albums = [album for album in window if album.label == label_name]
+        yield albums, collect_tracks(api, albums)
+
+
+def is_discography_unchanged(
+    watermark: tuple[int, datetime.date | None] | None,
+    first_page: Page[ArtistAlbum],
+) -> bool:
+    """Return whether an artist discography did not change since `watermark`, judging by its first page.
+
+    `watermark` is the album count and latest release date of the artist
+    when last crawled, or None if it never was.
+    """
+    if watermark is None:
+        return False
+    album_count, latest_release_date = watermark
+    if first_page.total != album_count:
+        return False
+    if latest_release_date is None:
+        return not first_page.items
+    return all(album.release_date <= latest_release_date for album in first_page.items)
+
+
+async def search_labels_missing_albums(
+    api: AsyncSpotifyAPIClient,
+    labels: Sequence[db.Label],
+) -> dict[str, list[SearchAlbum]]:
+    """Run missing album searches of all labels concurrently.
+
+    Returns a label name -> search results mapping.
+    """
+    LOGGER.info(f"Searching missing albums of {len(labels):,} labels")
+    ranges = {
+        label.name: get_year_ranges(get_label_search_years(label), get_label_album_counts(label)) for label in labels
+    }
+    results = await asyncio.gather(
+        *(
+            search_year_range_async(api, label_name, first, last)
+            for label_name, label_ranges in ranges.items()
+            for first, last in label_ranges
+        ),
     )
-    return session.execute(sql).scalars().all()
+    results_iterator = iter(results)
+    return {
+        label_name: [album for _ in label_ranges for album in next(results_iterator)]
+        for label_name, label_ranges in ranges.items()
+    }
 
 
-def get_tracked_playlists(session: db.Session) -> Sequence[db.Playlist]:
-    sql = select(db.Playlist).where(db.Playlist.filter_for_label_name.is_not(None))
-    return session.execute(sql).scalars().all()
+async def search_labels_missing_albums_async(
+    session: db.Session,
+    labels: Sequence[db.Label],
+) -> dict[str, list[SearchAlbum]]:
+    async with AsyncSpotifyAPIClient(session) as api:
+        return await search_labels_missing_albums(api, labels)
 
 
-def get_user_playlists(session: db.Session) -> dict[str, Playlist]:
-    """Return an ID -> playlist mapping of all user's playlists."""
-    api = SpotifyAPIClient(session)
-    playlists = api.user_playlists(api.user_id)
-    return {playlist.id: playlist for playlist in playlists}
+def search_label_years(
+    api: SpotifyAPIClient,
+    label_name: str,
+    years: Iterable[int],
+    album_counts: Mapping[int, int] | None = None,
+) -> list[SearchAlbum]:
+    """Search albums of a label released in `years`.
+
+    Consecutive years are searched with a single query, unless their
+    `album_counts` from the last search do not fit in one, see
+    `get_year_ranges` and `search_year_range`.
+    """
+    ranges = get_year_ranges(years, album_counts)
+    return [album for first, last in ranges for album in search_year_range(api, label_name, first, last)]
 
 
 def search_missing_albums(api: SpotifyAPIClient, label: db.Label) -> list[SearchAlbum]:
     LOGGER.info("Searching missing albums")
-    min_year = get_label_max_albums_release_date(label)
-    search_results: list[SearchAlbum] = []
-    for year in range(min_year.year, datetime.date.today().year + 1):
-        criteria = [f"year:{year}", *[f"label:{word}" for word in label.name.split()]]
-        search_results.extend(api.search_albums(" ".join(criteria)))
-    return search_results
+    return search_label_years(api, label.name, get_label_search_years(label), get_label_album_counts(label))
+
+
+def search_year_range(api: SpotifyAPIClient, label_name: str, first_year: int, last_year: int) -> list[SearchAlbum]:
+    """Search albums of a label released from `first_year` to `last_year`.
+
+    Spotify only returns the first 1,000 results of a search, so a range
+    with more results is split in two halves, recursively, until each
+    sub-range fits. A single year with more results is returned truncated.
+    """
+    q = get_label_search_query(label_name, first_year, last_year)
+    try:
+        return api.search_albums(q, raise_if_saturated=first_year < last_year)
+    except SearchWindowSaturatedError as e:
+        middle = (first_year + last_year) // 2
+        LOGGER.info(f"{e.total:,} results for {q=}, splitting years")
+        return [
+            *search_year_range(api, label_name, first_year, middle),
+            *search_year_range(api, label_name, middle + 1, last_year),
+        ]
+
+
+async def search_year_range_async(
+    api: AsyncSpotifyAPIClient,
+    label_name: str,
+    first_year: int,
+    last_year: int,
+) -> list[SearchAlbum]:
+    """Search albums of a label released from `first_year` to `last_year`, see `search_year_range`."""
+    q = get_label_search_query(label_name, first_year, last_year)
+    try:
+        return await api.search_albums(q, raise_if_saturated=first_year < last_year)
+    except SearchWindowSaturatedError as e:
+        middle = (first_year + last_year) // 2
+        LOGGER.info(f"{e.total:,} results for {q=}, splitting years")
+        halves = await asyncio.gather(
+            search_year_range_async(api, label_name, first_year, middle),
+            search_year_range_async(api, label_name, middle + 1, last_year),
+        )
+        return [album for half in halves for album in half]
 
 
 @db.with_connection
-def run(session: db.Session) -> None:
-    playlists = get_user_playlists(session)
-    for i, label in enumerate(labels := get_labels(session)):
-        LOGGER.info(f"{i + 1}/{len(labels)} Collecting data for {label.name}")
-        collect_label_albums(session, label, excluded_album_ids=get_all_album_ids(session))
-        update_playlist(session, label, playlists[label.playlist_id])
-    collect_popularity(session)
-    collect_artist_images(SpotifyAPIClient(session), session)
-    update_new_lofi(session)
-    update_playlist_images(session, playlists.values())
-    update_tracked_playlists(session)
-    update_track_is_lofi(session)
-
-
-def snapshot_is_in_db(session: db.Session, snapshot_id: str) -> bool:
-    sql = select(db.Snapshot.id).where(db.Snapshot.id == snapshot_id).limit(1)
-    return session.execute(sql).scalar_one_or_none() is not None
-
-
-def update_playlist(session: db.Session, label: db.Label, playlist: Playlist) -> None:
-    api = SpotifyAPIClient(session)
+def run(session: db.Session, *, use_async: bool = False, resume: bool = False, pipelined: bool = False) -> None:
+    """Run main ETL.
+
+    If `use_async` is True, label searches and tracked playlist reads are
+    run concurrently with `AsyncSpotifyAPIClient`. If `pipelined` is True,
+    label albums are written by a dedicated thread while the next labels
+    are fetched.
+
+    The session is committed after each stage, and after each label for
+    per-label stages. If `resume` is True and the last run is unfinished,
+    stages it completed are skipped.
+    """
+    checkpoints = Checkpoints.start(session, resume=resume)
+    with SpotifyAPIClient(session) as api:
+        playlists = get_user_playlists(api)
+        labels = get_labels(session)
+        pending_labels = [label for label in labels if not checkpoints.is_completed("collect_label", label.name)]
+        search_results = asyncio.run(search_labels_missing_albums_async(session, pending_labels)) if use_async else {}
+        if pipelined:
+            collect_labels_albums_pipelined(api, session, pending_labels, checkpoints, search_results)
+        for i, label in enumerate(labels):
+            LOGGER.info(f"{i + 1}/{len(labels)} Collecting data for {label.name}")
+            if not checkpoints.is_completed("collect_label", label.name):
+                collect_label_albums(
+                    api,
+                    session,
+                    label,
+                    excluded_album_ids=get_known_ids(session).albums,
+                    search_results=search_results.get(label.name),
+                )
+                checkpoints.complete("collect_label", label.name)
+            if not checkpoints.is_completed("sync_playlist", label.name):
+                update_playlist(api, session, label, playlists[label.playlist_id])
+                checkpoints.complete("sync_playlist", label.name)
+        stages: dict[str, Callable[[], object]] = {
+            "indie_albums": lambda: collect_indie_albums(api, session, labels),
+            "popularity": lambda: collect_popularity(api, session),
+            "artist_images": lambda: collect_artist_images(api, session),
+            "new_lofi": lambda: update_new_lofi(api, session),
+            "playlist_images": lambda: update_playlist_images(session, playlists.values()),
+            "tracked_playlists": (
+                (lambda: asyncio.run(update_tracked_playlists_async(session)))
+                if use_async
+                else (lambda: update_tracked_playlists(api, session))
+            ),
+            "track_is_lofi": lambda: update_track_is_lofi(session),
+        }
+        for stage, func in stages.items():
+            if not checkpoints.is_completed(stage):
+                func()
+                checkpoints.complete(stage)
+    checkpoints.finish()
+    LOGGER.info(get_rate_limiter().summary())
+    if (cache := get_response_cache()) is not None:
+        LOGGER.info(cache.summary())
+
+
+def update_playlist(api: SpotifyAPIClient, session: db.Session, label: db.Label, playlist: Playlist) -> None:
     expected_tracklist = get_expected_tracklist(session, label.name)
     snapshot = get_snapshot(session, playlist.snapshot_id)
-    api.set_playlist_tracks(label.playlist_id, expected_tracklist, snapshot or None)
-    new_snapshot_id = api.playlist(label.playlist_id).snapshot_id
-    upload_snapshot(session, playlist.id, new_snapshot_id, expected_tracklist)
+    new_snapshot_id = api.set_playlist_tracks(label.playlist_id, expected_tracklist, snapshot or None)
+    upload_snapshot(session, playlist.id, new_snapshot_id or playlist.snapshot_id, expected_tracklist)
 
 
 def update_playlist_images(session: db.Session, playlists: Iterable[Playlist]) -> None:
@@ -335,48 +628,73 @@ def update_playlist_images(session: db.Session, playlists: Iterable[Playlist]) -
     session.flush()
 
 
-def update_new_lofi(session: db.Session) -> None:
+def update_new_lofi(api: SpotifyAPIClient, session: db.Session) -> None:
     LOGGER.info("Updating new lofi")
-    api = SpotifyAPIClient(session)
     tracklist = get_new_lofi_tracklist(session)
-    api.set_playlist_tracks(env.new_lofi_playlist_id(), tracklist, use_reorders=True)
+    playlist_id = env.new_lofi_playlist_id()
+    if (snapshot_id := api.set_playlist_tracks(playlist_id, tracklist)) is not None:
+        if session.get(db.Playlist, playlist_id) is None:
+            session.add(db.Playlist(id=playlist_id, is_editorial=False))
+            session.flush()
+        upload_snapshot(session, playlist_id, snapshot_id, tracklist)
 
 
 def update_track_is_lofi(session: db.Session) -> None:
     LOGGER.info("Updating track.is_lofi with filtering playlists")
     filtering_playlist_ids = select(db.Playlist.id).where(db.Playlist.filter_for_label_name.is_not(None))
-    filtering_playlist_track_ids = (
-        select(db.Snapshot.track_id).where(db.Snapshot.playlist_id.in_(filtering_playlist_ids)).distinct()
-    )
+    filtering_playlist_track_ids = db.snapshot_track_ids(filtering_playlist_ids.scalar_subquery())
     sql = update(db.Track).where(~db.Track.is_lofi, db.Track.id.in_(filtering_playlist_track_ids)).values(is_lofi=True)
     session.execute(sql)
 
 
-def update_tracked_playlists(session: db.Session) -> None:
+def update_tracked_playlists(api: SpotifyAPIClient, session: db.Session) -> None:
+    """Upload new snapshots of tracked playlists.
+
+    Playlist metadata is fetched concurrently, and all snapshot IDs are
+    checked against the database at once. Tracklists are then fetched
+    concurrently, only for playlists whose snapshot is new.
+    """
     LOGGER.info("Updating tracked playlists")
-    api = SpotifyAPIClient(session)
     not_found_http_status = 404
-    for playlist in tqdm(get_tracked_playlists(session)):
+
+    def get_playlist(playlist_id: str) -> Playlist | None:
         try:
-            spotify_playlist = api.playlist(playlist.id)
+            return api.playlist(playlist_id)
         except SpotifyException as e:
             if e.http_status == not_found_http_status:
                 # This playlist does not exist anymore!
-                continue
+                return None
             raise
-        if snapshot_is_in_db(session, spotify_playlist.snapshot_id):
-            continue
-        track_ids = [t.id for t in api.playlist_tracks(playlist.id)]
-        upload_snapshot(session, playlist.id, spotify_playlist.snapshot_id, track_ids)
 
+    tracked_playlists = get_tracked_playlists(session)
+    spotify_playlists = api.map_concurrently(get_playlist, [p.id for p in tracked_playlists])
+    changed_playlists = get_changed_playlists(session, spotify_playlists)
+    LOGGER.info(f"{len(changed_playlists):,} out of {len(tracked_playlists):,} tracked playlists changed")
+    tracklists = api.map_concurrently(api.playlist_tracks, [p.id for p in changed_playlists])
+    for playlist, tracklist in zip(changed_playlists, tracklists, strict=True):
+        upload_snapshot(session, playlist.id, playlist.snapshot_id, [t.id for t in tracklist])
 
-def upload_album_popularity(session: db.Session, album: Album) -> None:
-    popularity = db.AlbumPopularity(
-        album_id=album.id,
-        date=datetime.date.today(),
-        popularity=album.popularity,
-    )
-    session.merge(popularity)
+
+async def update_tracked_playlists_async(session: db.Session) -> None:
+    LOGGER.info("Updating tracked playlists")
+    not_found_http_status = 404
+
+    async def get_playlist(api: AsyncSpotifyAPIClient, playlist_id: str) -> Playlist | None:
+        try:
+            return await api.playlist(playlist_id)
+        except SpotifyException as e:
+            if e.http_status == not_found_http_status:
+                # This playlist does not exist anymore!
+                return None
+            raise
+
+    async with AsyncSpotifyAPIClient(session) as api:
+        tracked_playlists = get_tracked_playlists(session)
+        spotify_playlists = await asyncio.gather(*(get_playlist(api, p.id) for p in tracked_playlists))
+        changed_playlists = get_changed_playlists(session, spotify_playlists)
+        tracklists = await asyncio.gather(*(api.playlist_tracks(p.id) for p in changed_playlists))
+    for playlist, tracklist in zip(changed_playlists, tracklists, strict=True):
+        upload_snapshot(session, playlist.id, playlist.snapshot_id, [t.id for t in tracklist])
 
 
 def upload_albums(session: db.Session, albums: Sequence[Album]) -> None:
@@ -393,103 +711,174 @@ def upload_albums(session: db.Session, albums: Sequence[Album]) -> None:
 
         return func(album.images, key=get_image_width).url
 
-    for album in tqdm(albums):
-        if session.get(db.Label, album.label) is None:
-            session.merge(
-                db.Label(
-                    name=album.label,
-                    is_lofi=True,
-                    is_indie=True,
-                    playlist=session.merge(db.Playlist(id="")),
-                ),
-            )
-        session.merge(
-            db.Album(
-                id=album.id,
-                image_url_l=get_image_url(album, "largest"),
-                image_url_s=get_image_url(album, "smallest"),
-                label_name=album.label,
-                name=album.name,
-                release_date=album.release_date,
-                type=album.album_type,
-            ),
+    label_names = {album.label for album in albums}
+    existing_label_names = set(session.execute(select(db.Label.name).where(db.Label.name.in_(label_names))).scalars())
+    if missing_label_names := label_names - existing_label_names:
+        db.insert_ignore(session, db.Playlist, [{"id": "", "is_editorial": False}])
+        db.insert_ignore(
+            session,
+            db.Label,
+            [
+                {"name": name, "is_lofi": True, "is_indie": True, "playlist_id": ""}
+                for name in sorted(missing_label_names)
+            ],
         )
-        upload_album_popularity(session, album)
-        for artist_position, artist in enumerate(album.artists):
-            session.merge(
-                db.RelArtistAlbum(
-                    artist_id=artist.id,
-                    album_id=album.id,
-                    artist_position=artist_position,
-                ),
-            )
+    db.upsert(
+        session,
+        db.Album,
+        [
+            {
+                "id": album.id,
+                "image_url_l": get_image_url(album, "largest"),
+                "image_url_s": get_image_url(album, "smallest"),
+                "label_name": album.label,
+                "name": album.name,
+                "release_date": album.release_date,
+                "type": album.album_type,
+            }
+            for album in albums
+        ],
+    )
+    get_known_ids(session).albums.update(album.id for album in albums)
+    upload_albums_popularity(session, albums)
+    db.insert_ignore(
+        session,
+        db.RelArtistAlbum,
+        [
+            {"artist_id": artist.id, "album_id": album.id, "artist_position": artist_position}
+            for album in albums
+            for artist_position, artist in enumerate(album.artists)
+        ],
+    )
 
 
 def upload_albums_popularity(session: db.Session, albums: Sequence[Album]) -> None:
+    """Upload album popularity.
+
+    Unless `POPULARITY_CHANGE_ONLY` is "0", a row is only written when
+    popularity changed since the last refresh, whose date is kept by
+    `db.PopularityRefresh`.
+    """
     LOGGER.info(f"Uploading popularity for {len(albums):,} albums")
-    for album in tqdm(albums):
-        upload_album_popularity(session, album)
+    today = datetime.date.today()
+    changed_ids = schedule_refreshes(session, db.PopularityKind.album, {album.id: album.popularity for album in albums})
+    if env.popularity_change_only():
+        albums = [album for album in albums if album.id in changed_ids]
+    db.upsert(
+        session,
+        db.AlbumPopularity,
+        [{"album_id": album.id, "date": today, "popularity": album.popularity} for album in albums],
+    )
 
 
-def upload_objects_artists(session: db.Session, objs: Iterable[HasArtists]) -> None:
-    LOGGER.info("Uploading artists")
-    unique_artists = {artist.id: artist for obj in objs for artist in obj.artists}
-    for artist in tqdm(unique_artists.values()):
-        session.merge(db.Artist(id=artist.id, name=artist.name))
+def upload_artist_crawls(session: db.Session, discographies: Mapping[str, Page[ArtistAlbum]]) -> None:
+    """Record the album count and latest release date of just crawled artists."""
+    now = datetime.datetime.now(datetime.UTC)
+    db.upsert(
+        session,
+        db.ArtistCrawl,
+        [
+            {
+                "artist_id": artist_id,
+                "album_count": discography.total,
+                "latest_release_date": max((album.release_date for album in discography.items), default=None),
+                "crawled_at": now,
+            }
+            for artist_id, discography in discographies.items()
+        ],
+    )
+
+
+def upload_label_albums(
+    session: db.Session, albums: Sequence[Album], tracks: Sequence[Track], *, is_lofi: bool
+) -> None:
+    upload_objects_artists(session, tracks)
+    upload_objects_artists(session, albums)
+    upload_albums(session, albums)
+    upload_tracks(session, tracks, is_lofi=is_lofi)
 
 
-def upload_snapshot(
+def upload_label_searches(
     session: db.Session,
-    playlist_id: str,
-    snapshot_id: str,
-    track_ids: Iterable[str],
+    label_name: str,
+    years: Iterable[int],
+    search_results: Iterable[SearchAlbum],
 ) -> None:
-    LOGGER.info("Uploading playlist snapshot")
-    if snapshot_is_in_db(session, snapshot_id):
-        LOGGER.info("Snapshot already in database, skipping")
-        return
-    timestamp = datetime.datetime.now(datetime.UTC)
-    for position, track_id in enumerate(tqdm(track_ids)):
-        snapshot = db.Snapshot(
-            id=snapshot_id,
-            position=position,
-            playlist_id=playlist_id,
-            timestamp=timestamp,
-            track_id=track_id,
-        )
-        session.merge(snapshot)
+    """Record that `years` of a label were just searched, and the number of albums found each year.
+
+    Years that ended more than `SEARCH_SETTLING_DAYS` days ago are frozen,
+    and will not be searched again.
+    """
+    now = datetime.datetime.now(datetime.UTC)
+    last_settled_year = (now - datetime.timedelta(days=env.search_settling_days())).year - 1
+    album_counts = Counter(album.release_date.year for album in search_results)
+    db.upsert(
+        session,
+        db.LabelSearch,
+        [
+            {
+                "label_name": label_name,
+                "year": year,
+                "searched_at": now,
+                "is_frozen": year <= last_settled_year,
+                "album_count": album_counts[year],
+            }
+            for year in years
+        ],
+    )
 
 
-def upload_track_popularity(session: db.Session, track: Track) -> None:
-    popularity = db.TrackPopularity(track_id=track.id, date=datetime.date.today(), popularity=track.popularity)
-    session.merge(popularity)
+def upload_objects_artists(session: db.Session, objs: Iterable[HasArtists]) -> None:
+    LOGGER.info("Uploading artists")
+    unique_artists = {artist.id: artist for obj in objs for artist in obj.artists}
+    db.upsert(session, db.Artist, [{"id": artist.id, "name": artist.name} for artist in unique_artists.values()])
+    get_known_ids(session).artists.update(unique_artists)
 
 
 def upload_tracks(session: db.Session, tracks: Sequence[Track], *, is_lofi: bool) -> None:
     LOGGER.info(f"Uploading {len(tracks):,} tracks")
-    for track in tqdm(tracks):
-        session.merge(
-            db.Track(
-                album_id=track.album.id,
-                id=track.id,
-                is_lofi=is_lofi,
-                isrc=track.external_ids.isrc,
-                name=track.name,
-                position=track.track_number,
-            ),
-        )
-        upload_track_popularity(session, track)
-        for artist_position, artist in enumerate(track.artists):
-            session.merge(
-                db.RelArtistTrack(
-                    artist_id=artist.id,
-                    track_id=track.id,
-                    artist_position=artist_position,
-                ),
-            )
+    db.upsert(
+        session,
+        db.Track,
+        [
+            {
+                "album_id": track.album.id,
+                "id": track.id,
+                "is_lofi": is_lofi,
+                "isrc": track.external_ids.isrc,
+                "name": track.name,
+                "position": track.track_number,
+            }
+            for track in tracks
+        ],
+    )
+    get_known_ids(session).tracks.update(track.id for track in tracks)
+    upload_tracks_popularity(session, tracks)
+    db.insert_ignore(
+        session,
+        db.RelArtistTrack,
+        [
+            {"artist_id": artist.id, "track_id": track.id, "artist_position": artist_position}
+            for track in tracks
+            for artist_position, artist in enumerate(track.artists)
+        ],
+    )
 
 
 def upload_tracks_popularity(session: db.Session, tracks: Sequence[Track]) -> None:
+    """Upload track popularity.
+
+    Unless `POPULARITY_CHANGE_ONLY` is "0", a row is only written when
+    popularity changed since the last refresh. Readers forward fill it
+    with `db.track_popularity_as_of`.
+    """
     LOGGER.info(f"Uploading popularity for {len(tracks):,} tracks")
-    for track in tracks:
-        upload_track_popularity(session, track)
+    today = datetime.date.today()
+    changed_ids = schedule_refreshes(session, db.PopularityKind.track, {track.id: track.popularity for track in tracks})
+    if env.popularity_change_only():
+        tracks = [track for track in tracks if track.id in changed_ids]
+    db.upsert(
+        session,
+        db.TrackPopularity,
+        [{"track_id": track.id, "date": today, "popularity": track.popularity} for track in tracks],
+    )
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Self
+
+from lofi import db
+
+from .log import LOGGER
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from types import TracebackType
+
+
+class DBWriter:
+    """Thread applying database writes submitted by producer threads.
+
+    Writes are queued in a bounded queue, so that producers block instead
+    of buffering unboundedly when the database falls behind. The writer
+    thread applies them in submission order while holding the session
+    lock, so that SQLite only ever sees a single writer.
+
+    Once a write fails, following writes are discarded and the error is
+    raised by the next call to `submit` or `close`.
+
+    Attributes
+    ----------
+    writes
+        Number of applied writes.
+    max_queue_depth
+        Largest number of writes waiting in the queue on submission.
+    total_lag_seconds
+        Total time writes waited in the queue before being applied.
+    max_lag_seconds
+        Longest time a write waited in the queue before being applied.
+    busy_seconds
+        Total time spent applying writes.
+
+    """
+
+    def __init__(self, session: db.Session, maxsize: int = 4) -> None:
+        self.session = session
+        self.writes = 0
+        self.max_queue_depth = 0
+        self.total_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self.busy_seconds = 0.0
+        self._error: BaseException | None = None
+        self._queue: queue.Queue[tuple[float, Callable[[], object]] | None] = queue.Queue(maxsize)
+        self._thread = threading.Thread(target=self._run, name="lofi-db-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    @property
+    def queue_depth(self) -> int:
+        """Return the number of writes waiting in the queue."""
+        return self._queue.qsize()
+
+    def close(self) -> None:
+        """Wait for all submitted writes to be applied, then stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
+
+    def submit(self, func: Callable[..., object], *args: Any, **kwargs: Any) -> None:  # noqa: ANN401
+        """Queue `func(*args, **kwargs)`, blocking while the queue is full."""
+        self._raise_error()
+        self._queue.put((time.monotonic(), lambda: func(*args, **kwargs)))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+    def summary(self) -> str:
+        mean_lag = self.total_lag_seconds / self.writes if self.writes else 0.0
+        return (
+            f"{self.writes:,} database writes in {self.busy_seconds:,.1f}s, "
+            f"max queue depth {self.max_queue_depth}/{self._queue.maxsize}, "
+            f"lag {mean_lag:,.1f}s on average and {self.max_lag_seconds:,.1f}s at most"
+        )
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def _run(self) -> None:
+        while (item := self._queue.get()) is not None:
+            submitted_at, write = item
+            if self._error is not None:
+                continue
+            started_at = time.monotonic()
+            lag = started_at - submitted_at
+            try:
+                with db.get_lock(self.session):
+                    write()
+            except BaseException as e:  # noqa: BLE001
+                LOGGER.error(f"Database write failed, discarding following writes: {e!r}")
+                self._error = e
+                continue
+            self.writes += 1
+            self.total_lag_seconds += lag
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+            self.busy_seconds += time.monotonic() - started_at
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import datetime
+import heapq
+from typing import TYPE_CHECKING, cast
+
+from sqlalchemy import join, or_, select
+
+from lofi import db
+from lofi.spotify_api.client import chunk
+
+from .log import LOGGER
+from .snapshots import get_latest_snapshots, get_snapshot
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+IDS_PER_REQUEST = {db.PopularityKind.album: 20, db.PopularityKind.track: 50}
+MAX_REFRESH_INTERVAL_DAYS = 60
+PLAYLISTED_MAX_REFRESH_INTERVAL_DAYS = 2
+RELEASE_AGE_DAYS_PER_INTERVAL_DAY = 30
+VOLATILITY_SMOOTHING = 0.3
+
+
+def get_due_ids(session: db.Session, budget: int) -> dict[db.PopularityKind, list[str]]:
+    """Return IDs of albums and tracks to refresh with at most `budget` requests.
+
+    Due entities are taken from the popularity refresh queue in due date
+    order, most volatile first within a date, until refreshing them
+    would take more than `budget` requests.
+    """
+    today = datetime.date.today()
+
+    def get_queue(kind: db.PopularityKind) -> list[tuple[datetime.date, float, db.PopularityKind, str]]:
+        sql = (
+            select(db.PopularityRefresh.due_on, -db.PopularityRefresh.volatility, db.PopularityRefresh.id)
+            .where(db.PopularityRefresh.kind == kind, db.PopularityRefresh.due_on <= today)
+            .order_by(db.PopularityRefresh.due_on, db.PopularityRefresh.volatility.desc())
+            .limit(budget * IDS_PER_REQUEST[kind])
+        )
+        return [(due_on, priority, kind, entity_id) for due_on, priority, entity_id in session.execute(sql)]
+
+    ids: dict[db.PopularityKind, list[str]] = {kind: [] for kind in db.PopularityKind}
+    for *_, kind, entity_id in heapq.merge(*(get_queue(kind) for kind in db.PopularityKind)):
+        ids[kind].append(entity_id)
+        if get_request_count(ids) > budget:
+            ids[kind].pop()
+            break
+    return ids
+
+
+def get_playlisted_ids(session: db.Session) -> dict[db.PopularityKind, set[str]]:
+    """Return IDs of tracks in the last snapshot of editorial and tracked playlists, and of their albums.
+
+    Loaded on first call, then cached in the session.
+    """
+    with db.get_lock(session):
+        if "playlisted_ids" not in session.info:
+            playlist_ids = session.execute(
+                select(db.Playlist.id).where(
+                    or_(db.Playlist.is_editorial, db.Playlist.filter_for_label_name.is_not(None)),
+                ),
+            ).scalars()
+            track_ids = {
+                track_id
+                for snapshot_id, _ in get_latest_snapshots(session, list(playlist_ids)).values()
+                for track_id in get_snapshot(session, snapshot_id)
+            }
+            album_ids: set[str] = set()
+            for ids in chunk(list(track_ids), 10_000):
+                album_ids.update(session.execute(select(db.Track.album_id).where(db.Track.id.in_(ids))).scalars())
+            session.info["playlisted_ids"] = {db.PopularityKind.album: album_ids, db.PopularityKind.track: track_ids}
+        return cast(dict[db.PopularityKind, set[str]], session.info["playlisted_ids"])
+
+
+def get_refresh_interval(release_age_days: int, volatility: float, *, is_playlisted: bool) -> int:
+    """Return the number of days until the next refresh of an entity.
+
+    The interval grows by a day every `RELEASE_AGE_DAYS_PER_INTERVAL_DAY`
+    days of release age, and shrinks with popularity volatility. It is
+    capped at `PLAYLISTED_MAX_REFRESH_INTERVAL_DAYS` for playlisted
+    entities, and `MAX_REFRESH_INTERVAL_DAYS` for the others.
+    """
+    interval = (1 + max(release_age_days, 0) / RELEASE_AGE_DAYS_PER_INTERVAL_DAY) / (1 + volatility)
+    max_interval = PLAYLISTED_MAX_REFRESH_INTERVAL_DAYS if is_playlisted else MAX_REFRESH_INTERVAL_DAYS
+    return max(1, min(round(interval), max_interval))
+
+
+def get_request_count(ids: Mapping[db.PopularityKind, list[str]]) -> int:
+    """Return the number of requests needed to refresh `ids`."""
+    return sum(-(-len(kind_ids) // IDS_PER_REQUEST[kind]) for kind, kind_ids in ids.items())
+
+
+def schedule_refreshes(session: db.Session, kind: db.PopularityKind, popularity: Mapping[str, int]) -> set[str]:
+    """Record refreshed popularity of albums or tracks, and schedule their next refresh.
+
+    Return IDs whose popularity changed since their last refresh, or
+    that were never refreshed.
+    """
+    today = datetime.date.today()
+    if kind == db.PopularityKind.album:
+        release_date_sql = select(db.Album.id, db.Album.release_date)
+        id_column = db.Album.id
+    else:
+        release_date_sql = select(db.Track.id, db.Album.release_date).select_from(
+            join(db.Track, db.Album, db.Track.album_id == db.Album.id),
+        )
+        id_column = db.Track.id
+
+    release_dates: dict[str, datetime.date] = {}
+    previous: dict[str, tuple[int, float]] = {}
+    for ids in chunk(list(popularity), 10_000):
+        release_dates.update(session.execute(release_date_sql.where(id_column.in_(ids))).tuples().all())
+        sql = select(db.PopularityRefresh.id, db.PopularityRefresh.popularity, db.PopularityRefresh.volatility).where(
+            db.PopularityRefresh.kind == kind,
+            db.PopularityRefresh.id.in_(ids),
+        )
+        previous.update((entity_id, (p, v)) for entity_id, p, v in session.execute(sql))
+
+    playlisted_ids = get_playlisted_ids(session)[kind]
+    rows = []
+    changed_ids = set()
+    for entity_id, entity_popularity in popularity.items():
+        volatility = 0.0
+        if entity_id not in previous:
+            changed_ids.add(entity_id)
+        else:
+            previous_popularity, previous_volatility = previous[entity_id]
+            if change := abs(entity_popularity - previous_popularity):
+                changed_ids.add(entity_id)
+            volatility = (1 - VOLATILITY_SMOOTHING) * previous_volatility + VOLATILITY_SMOOTHING * change
+        release_date = release_dates.get(entity_id, today)
+        interval = get_refresh_interval(
+            (today - release_date).days,
+            volatility,
+            is_playlisted=entity_id in playlisted_ids,
+        )
+        rows.append(
+            {
+                "kind": kind,
+                "id": entity_id,
+                "refreshed_on": today,
+                "popularity": entity_popularity,
+                "volatility": volatility,
+                "due_on": today + datetime.timedelta(days=interval),
+            },
+        )
+    LOGGER.info(f"Scheduling next popularity refresh of {len(rows):,} {kind}s")
+    db.upsert(session, db.PopularityRefresh, rows)
+    return changed_ids
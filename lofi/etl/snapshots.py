@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import datetime
+from collections import Counter
+from typing import TYPE_CHECKING
+
+from sqlalchemy import func, literal, select, union, union_all
+
+from lofi import db
+from lofi.spotify_api.client import chunk
+
+from .log import LOGGER
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+KEYFRAME_INTERVAL = 32
+MAX_DELTA_RATIO = 0.5
+
+
+def apply_snapshot_operations(track_ids: Iterable[str], operations: Iterable[db.SnapshotOperation]) -> list[str]:
+    """Return the tracklist obtained by applying `operations` in order to `track_ids`."""
+    track_ids = list(track_ids)
+    for operation in operations:
+        if operation.type == db.SnapshotOperationType.delete:
+            del track_ids[operation.index : operation.index + operation.length]
+        elif operation.type == db.SnapshotOperationType.insert:
+            track_ids.insert(operation.index, str(operation.track_id))
+        else:
+            moved = track_ids[operation.index : operation.index + operation.length]
+            del track_ids[operation.index : operation.index + operation.length]
+            track_ids[operation.insert_before : operation.insert_before] = moved
+    return track_ids
+
+
+def get_latest_snapshots(session: db.Session, playlist_ids: Iterable[str]) -> dict[str, tuple[str, int]]:
+    """Return ID and delta depth of the latest snapshot of each playlist, by playlist ID.
+
+    Playlists without a snapshot are left out.
+    """
+    snapshots = union_all(
+        select(db.Snapshot.playlist_id, db.Snapshot.id, db.Snapshot.timestamp, literal(0).label("depth")).where(
+            db.Snapshot.playlist_id.in_(playlist_ids),
+            db.Snapshot.position == 0,
+        ),
+        select(
+            db.SnapshotDelta.playlist_id, db.SnapshotDelta.id, db.SnapshotDelta.timestamp, db.SnapshotDelta.depth
+        ).where(db.SnapshotDelta.playlist_id.in_(playlist_ids)),
+    ).subquery()
+    ranked = select(
+        snapshots,
+        func.row_number()
+        .over(partition_by=snapshots.c.playlist_id, order_by=snapshots.c.timestamp.desc())
+        .label("snapshot_rank"),
+    ).subquery()
+    sql = select(ranked.c.playlist_id, ranked.c.id, ranked.c.depth).where(ranked.c.snapshot_rank == 1)
+    return {playlist_id: (snapshot_id, depth) for playlist_id, snapshot_id, depth in session.execute(sql)}
+
+
+def get_snapshot(session: db.Session, snapshot_id: str) -> list[str]:
+    """Return the tracklist of a snapshot, or an empty list if it is not in database.
+
+    Deltas are followed back to their full base snapshot, then applied
+    from oldest to newest.
+    """
+    deltas = []
+    while (delta := session.get(db.SnapshotDelta, snapshot_id)) is not None:
+        deltas.append(delta)
+        snapshot_id = delta.base_id
+    sql = select(db.Snapshot.track_id).where(db.Snapshot.id == snapshot_id).order_by(db.Snapshot.position)
+    track_ids = list(session.execute(sql).scalars())
+    for delta in reversed(deltas):
+        track_ids = apply_snapshot_operations(track_ids, delta.operations)
+    return track_ids
+
+
+def get_snapshot_ids_in_db(session: db.Session, snapshot_ids: Sequence[str]) -> set[str]:
+    """Return the subset of `snapshot_ids` in database, with one query per 10,000 IDs."""
+    snapshot_ids_in_db: set[str] = set()
+    for ids in chunk(snapshot_ids, 10_000):
+        sql = union(
+            select(db.Snapshot.id).where(db.Snapshot.id.in_(ids)),
+            select(db.SnapshotDelta.id).where(db.SnapshotDelta.id.in_(ids)),
+        )
+        snapshot_ids_in_db.update(session.execute(sql).scalars())
+    return snapshot_ids_in_db
+
+
+def get_snapshot_operations(base: Sequence[str], target: Sequence[str]) -> list[db.SnapshotOperation]:
+    """Return operations turning tracklist `base` into `target`.
+
+    Tracklists are walked position by position. Tracks no longer needed
+    are deleted, tracks found further down are moved up along with the
+    following tracks that match, and other tracks are inserted. Trailing
+    tracks are deleted at the end.
+    """
+    current = list(base)
+    current_counts = Counter(current)
+    target_counts = Counter(target)
+    operations: list[db.SnapshotOperation] = []
+    position = 0
+    while position < len(target):
+        deleted = 0
+        while (
+            position + deleted < len(current)
+            and current_counts[track_id := current[position + deleted]] > target_counts[track_id]
+        ):
+            current_counts[track_id] -= 1
+            deleted += 1
+        if deleted:
+            operations.append(
+                db.SnapshotOperation(type=db.SnapshotOperationType.delete, index=position, length=deleted),
+            )
+            del current[position : position + deleted]
+
+        track_id = target[position]
+        length = 1
+        if position < len(current) and current[position] == track_id:
+            current_counts[track_id] -= 1
+        elif current_counts[track_id]:
+            start = current.index(track_id, position + 1)
+            while (
+                start + length < len(current)
+                and position + length < len(target)
+                and current[start + length] == target[position + length]
+            ):
+                length += 1
+            operations.append(
+                db.SnapshotOperation(
+                    type=db.SnapshotOperationType.move,
+                    index=start,
+                    length=length,
+                    insert_before=position,
+                ),
+            )
+            moved = current[start : start + length]
+            del current[start : start + length]
+            current[position:position] = moved
+            current_counts.subtract(moved)
+        else:
+            operations.append(
+                db.SnapshotOperation(
+                    type=db.SnapshotOperationType.insert,
+                    index=position,
+                    length=1,
+                    track_id=track_id,
+                ),
+            )
+            current.insert(position, track_id)
+        target_counts.subtract(target[position : position + length])
+        position += length
+    if len(current) > len(target):
+        operations.append(
+            db.SnapshotOperation(
+                type=db.SnapshotOperationType.delete,
+                index=len(target),
+                length=len(current) - len(target),
+            ),
+        )
+    return operations
+
+
+def snapshot_is_in_db(session: db.Session, snapshot_id: str) -> bool:
+    sql = union_all(
+        select(db.Snapshot.id).where(db.Snapshot.id == snapshot_id),
+        select(db.SnapshotDelta.id).where(db.SnapshotDelta.id == snapshot_id),
+    )
+    return session.execute(sql).first() is not None
+
+
+def upload_snapshot(
+    session: db.Session,
+    playlist_id: str,
+    snapshot_id: str,
+    track_ids: Iterable[str],
+) -> None:
+    """Upload a playlist snapshot.
+
+    The snapshot is stored as a delta against the latest snapshot of the
+    playlist. It is stored in full instead if the playlist has no
+    snapshot yet, if the latest one is `KEYFRAME_INTERVAL` deltas away
+    from a full snapshot, or if the delta would take more than
+    `MAX_DELTA_RATIO` times the rows of a full snapshot.
+    """
+    LOGGER.info("Uploading playlist snapshot")
+    if snapshot_is_in_db(session, snapshot_id):
+        LOGGER.info("Snapshot already in database, skipping")
+        return
+    track_ids = list(track_ids)
+    timestamp = datetime.datetime.now(datetime.UTC)
+    if (latest := get_latest_snapshots(session, [playlist_id]).get(playlist_id)) is not None:
+        base_id, depth = latest
+        if depth + 1 < KEYFRAME_INTERVAL:
+            operations = get_snapshot_operations(get_snapshot(session, base_id), track_ids)
+            if len(operations) + 1 <= MAX_DELTA_RATIO * len(track_ids) or not track_ids:
+                LOGGER.info(f"Storing snapshot as a delta of {len(operations):,} operations")
+                delta = {
+                    "id": snapshot_id,
+                    "base_id": base_id,
+                    "depth": depth + 1,
+                    "playlist_id": playlist_id,
+                    "timestamp": timestamp,
+                }
+                db.upsert(session, db.SnapshotDelta, [delta])
+                db.upsert(
+                    session,
+                    db.SnapshotOperation,
+                    [
+                        {
+                            "snapshot_id": snapshot_id,
+                            "position": position,
+                            "type": operation.type,
+                            "index": operation.index,
+                            "length": operation.length,
+                            "insert_before": operation.insert_before,
+                            "track_id": operation.track_id,
+                        }
+                        for position, operation in enumerate(operations)
+                    ],
+                )
+                return
+    db.upsert(
+        session,
+        db.Snapshot,
+        [
+            {
+                "id": snapshot_id,
+                "position": position,
+                "playlist_id": playlist_id,
+                "timestamp": timestamp,
+                "track_id": track_id,
+            }
+            for position, track_id in enumerate(track_ids)
+        ],
+    )
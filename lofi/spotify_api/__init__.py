@@ -1,4 +1,20 @@
+from .async_client import AsyncSpotifyAPIClient
 from .client import SpotifyAPIClient
 from .models import Album, Artist, ImageUrl, Playlist, SearchAlbum, Track
+from .rate_limiter import RateLimiter, get_rate_limiter
+from .response_cache import ResponseCache, get_response_cache
 
-__all__ = ["Album", "Artist", "ImageUrl", "Playlist", "SearchAlbum", "SpotifyAPIClient", "Track"]
+__all__ = [
+    "Album",
+    "Artist",
+    "AsyncSpotifyAPIClient",
+    "ImageUrl",
+    "Playlist",
+    "RateLimiter",
+    "ResponseCache",
+    "SearchAlbum",
+    "SpotifyAPIClient",
+    "Track",
+    "get_rate_limiter",
+    "get_response_cache",
+]
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import asyncio
+import http
+from typing import TYPE_CHECKING, Any, Self
+
+import httpx
+from spotipy import SpotifyException  # type: ignore[import-untyped]
+
+from lofi import db, env
+
+from .client import SEARCH_MAX_OFFSET, check_search_window, chunk, get_auth_manager, get_page_offsets
+from .log import LOGGER
+from .models import Album, Artist, ArtistAlbum, Playlist, PlaylistTrack, SearchAlbum, Track
+from .rate_limiter import get_rate_limiter, get_retry_after
+from .response_cache import get_cache_key, get_response_cache
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from types import TracebackType
+
+
+class AsyncSpotifyAPIClient:
+    """Asyncio counterpart of `SpotifyAPIClient` for read endpoints.
+
+    Must be used as an async context manager, which owns the underlying
+    HTTP connection pool. At most `max_concurrency` requests are in
+    flight at the same time, and paginated endpoints fetch all their
+    pages concurrently once the first one has returned the total.
+    """
+
+    prefix = "https://api.spotify.com/v1/"
+    max_retries = 10
+    retried_statuses = frozenset(
+        {
+            http.HTTPStatus.INTERNAL_SERVER_ERROR,
+            http.HTTPStatus.BAD_GATEWAY,
+            http.HTTPStatus.SERVICE_UNAVAILABLE,
+            http.HTTPStatus.GATEWAY_TIMEOUT,
+        },
+    )
+
+    def __init__(
+        self,
+        session: db.Session,
+        user_id: str | None = None,
+        max_concurrency: int | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.user_id = env.spotify_user_id() if user_id is None else user_id
+        self.max_concurrency = env.spotify_max_workers() if max_concurrency is None else max_concurrency
+        self.auth_manager = get_auth_manager(self.user_id, session)
+        self.session = session
+        self.transport = transport
+        self._http: httpx.AsyncClient | None = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def __aenter__(self) -> Self:
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.max_concurrency),
+            timeout=60,
+            transport=self.transport,
+        )
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            msg = f"{self.__class__.__name__} must be used as an async context manager"
+            raise RuntimeError(msg)
+        return self._http
+
+    async def _auth_headers(self) -> dict[str, str]:
+        """Return authorization headers.
+
+        The token is got on a worker thread, since it may be read from
+        database or refreshed over HTTP, which must not block the event loop.
+        """
+        token = await asyncio.to_thread(self.auth_manager.get_access_token, as_dict=False)
+        return {"Authorization": f"Bearer {token}"}
+
+    async def _get(self, url: str, **params: Any) -> Any:  # noqa: ANN401
+        cache = get_response_cache()
+        key = get_cache_key(url, params)
+        if cache is None or (ttl := cache.get_ttl(key)) is None:
+            return await self._send(url, **params)
+        if (response := cache.get(key)) is None:
+            response = await self._send(url, **params)
+            cache.set(key, response, ttl)
+        return response
+
+    async def _send(self, url: str, **params: Any) -> Any:  # noqa: ANN401
+        if not url.startswith("http"):
+            url = self.prefix + url
+        rate_limiter = get_rate_limiter()
+        for i in range(self.max_retries + 1):
+            await rate_limiter.acquire_async()
+            headers = await self._auth_headers()
+            try:
+                async with self._semaphore:
+                    response = await self.http.get(url, params=params, headers=headers)
+            except httpx.TransportError:
+                if i == self.max_retries:
+                    raise
+                delay = 2**i
+                LOGGER.warning(f"Spotify API error. Retrying in {delay} seconds")
+            else:
+                if response.status_code == http.HTTPStatus.TOO_MANY_REQUESTS and i < self.max_retries:
+                    # Next acquire waits for the end of the pause
+                    rate_limiter.pause(get_retry_after(response.headers))
+                    continue
+                if response.status_code in self.retried_statuses and i < self.max_retries:
+                    delay = 2**i
+                    LOGGER.warning(f"Spotify API error {response.status_code}. Retrying in {delay} seconds")
+                elif response.is_error:
+                    raise SpotifyException(
+                        response.status_code,
+                        -1,
+                        f"{response.url}:\n {response.text}",
+                        headers=response.headers,
+                    )
+                else:
+                    return response.json()
+            await asyncio.sleep(delay)
+
+        # Following code is unreachable, only here for type check
+        raise NotImplementedError  # pragma: no cover
+
+    async def _get_items(
+        self,
+        response: Any,  # noqa: ANN401
+        max_offset: int | None = None,
+        subkey: str | None = None,
+    ) -> list[dict[str, Any]]:
+        def get_subkey(response: Any) -> Any:  # noqa: ANN401
+            return response if subkey is None else response[subkey]
+
+        response = get_subkey(response)
+        items: list[dict[str, Any] | None] = list(response["items"])
+        if response.get("next"):
+            next_url = httpx.URL(response["next"])
+            pages = await asyncio.gather(
+                *(
+                    self._get(str(next_url.copy_set_param("offset", offset)))
+                    for offset in get_page_offsets(response, max_offset)
+                ),
+            )
+            for page in pages:
+                items.extend(get_subkey(page)["items"])
+        return [item for item in items if item is not None]
+
+    async def albums(self, ids: Sequence[str], *, with_all_tracks: bool = False) -> list[Album]:
+        async def get_album_tracks(album: dict[str, Any]) -> None:
+            album["tracks"]["items"] = await self._get_items(album["tracks"])
+
+        responses = await asyncio.gather(*(self._get("albums/", ids=",".join(c)) for c in chunk(ids, 20)))
+        albums = [a for response in responses for a in response["albums"] if a is not None]
+        if with_all_tracks:
+            await asyncio.gather(*map(get_album_tracks, albums))
+        return list(map(Album.model_validate, albums))
+
+    async def artist_albums(self, artist_id: str) -> list[ArtistAlbum]:
+        response = await self._get(f"artists/{artist_id}/albums", country="US", limit=50)
+        return list(map(ArtistAlbum.model_validate, await self._get_items(response)))
+
+    async def artists(self, ids: Sequence[str]) -> list[Artist]:
+        responses = await asyncio.gather(*(self._get("artists/", ids=",".join(c)) for c in chunk(ids, 50)))
+        return [Artist.model_validate(a) for response in responses for a in response["artists"] if a is not None]
+
+    async def playlist(self, playlist_id: str) -> Playlist:
+        return Playlist.model_validate(await self._get(f"playlists/{playlist_id}"))
+
+    async def playlist_tracks(self, playlist_id: str) -> list[PlaylistTrack]:
+        LOGGER.info(f"Fetching tracks of Spotify playlist {playlist_id}")
+        items = await self._get_items(await self._get(f"playlists/{playlist_id}/tracks", limit=100))
+        raw_tracks = [item["track"] for item in items if item["track"] is not None]
+        return list(map(PlaylistTrack.model_validate, raw_tracks))
+
+    async def search_albums(self, q: str, *, raise_if_saturated: bool = False) -> list[SearchAlbum]:
+        """Return albums matching `q`, see `SpotifyAPIClient.search_albums`."""
+        LOGGER.info(f"Searching for {q=}")
+        response = await self._get("search", q=q, type="album", limit=50)
+        check_search_window(q, response["albums"], raise_if_saturated=raise_if_saturated)
+        items = await self._get_items(response, SEARCH_MAX_OFFSET, "albums")
+        return list(map(SearchAlbum.model_validate, items))
+
+    async def tracks(self, ids: Sequence[str]) -> list[Track]:
+        responses = await asyncio.gather(*(self._get("tracks/", ids=",".join(c)) for c in chunk(ids, 50)))
+        return [Track.model_validate(t) for response in responses for t in response["tracks"] if t is not None]
+
+    async def user_playlists(self, user_id: str) -> list[Playlist]:
+        LOGGER.info(f"Fetching playlists for user {user_id} from Spotify")
+        items = await self._get_items(await self._get(f"users/{user_id}/playlists", limit=50))
+        return list(map(Playlist.model_validate, items))
@@ -1,28 +1,46 @@
 from __future__ import annotations
 
+import threading
+import time
+from typing import Any, cast
+
 import spotipy  # type: ignore[import-untyped]
+from spotipy.oauth2 import SpotifyOAuth  # type: ignore[import-untyped]
 
 from lofi import db
 
 from .token import Token
 
+REFRESH_MARGIN_SECONDS = 300
+
 
 class CacheHandler(spotipy.cache_handler.CacheHandler):  # type: ignore[misc]
-    """Cache and retrieve Spotify API tokens in database."""
+    """Cache and retrieve Spotify API tokens in database.
+
+    The token is read from database on first use, then kept validated in
+    memory, so that spotipy getting it before each request costs an
+    attribute lookup. It is written to database only when it changes.
+    """
 
     def __init__(self, user_id: str, session: db.Session) -> None:
         self.user_id = user_id
         self.session = session
         self.save_token_to_db: bool = True
         self.token_cache: dict[str, str | int] | None = None
+        self._is_loaded = False
+        self._lock = threading.Lock()
 
     def get_cached_token(self: CacheHandler) -> dict[str, str | int] | None:
-        """Return token from database."""
-        if self.save_token_to_db:
-            user = self.get_user()
-            if user.token is None:
-                return None
-            return Token.model_validate_json(user.token).model_dump()
+        """Return token from memory, loading it from database on first call."""
+        if self._is_loaded or not self.save_token_to_db:
+            return self.token_cache
+        with self._lock:
+            if not self._is_loaded:
+                with db.get_lock(self.session):
+                    user = self.get_user()
+                    if user.token is not None:
+                        self.token_cache = Token.model_validate_json(user.token).model_dump()
+                self._is_loaded = True
         return self.token_cache
 
     def get_user(self) -> db.User:
@@ -36,9 +54,38 @@ class CacheHandler(spotipy.cache_handler.CacheHandler):  # type: ignore[misc]
         self: CacheHandler,
         token_info: dict[str, str | int],
     ) -> None:
-        """Save token to database."""
-        if self.save_token_to_db:
-            user = self.get_user()
-            user.token = Token.model_validate(token_info).model_dump_json()
-        else:
-            self.token_cache = token_info
+        """Save token to memory, and to database if it changed."""
+        token_cache = Token.model_validate(token_info).model_dump()
+        with self._lock:
+            if token_cache == self.token_cache:
+                return
+            self.token_cache = token_cache
+            self._is_loaded = True
+            if self.save_token_to_db:
+                with db.get_lock(self.session):
+                    user = self.get_user()
+                    user.token = Token.model_validate(token_cache).model_dump_json()
+
+
+class SingleFlightSpotifyOAuth(SpotifyOAuth):  # type: ignore[misc]
+    """OAuth manager refreshing tokens shortly before they expire, one thread at a time.
+
+    Tokens are refreshed `REFRESH_MARGIN_SECONDS` before they expire. A
+    thread finding the token expired waits for the refresh lock, then
+    reads the token again, so that threads waiting while another one
+    refreshes it reuse the new token.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:  # noqa: ANN401
+        super().__init__(*args, **kwargs)
+        self._refresh_lock = threading.Lock()
+
+    @staticmethod
+    def is_token_expired(token_info: dict[str, Any]) -> bool:
+        return bool(token_info["expires_at"] - time.time() < REFRESH_MARGIN_SECONDS)
+
+    def validate_token(self, token_info: dict[str, Any] | None) -> dict[str, Any] | None:
+        if token_info is None or not self.is_token_expired(token_info):
+            return cast(dict[str, Any] | None, super().validate_token(token_info))
+        with self._refresh_lock:
+            return cast(dict[str, Any] | None, super().validate_token(self.cache_handler.get_cached_token()))
@@ -1,15 +1,19 @@
 from __future__ import annotations
 
+import contextlib
 import functools
-import itertools
-import operator
+import http
+import threading
 import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import (
     TYPE_CHECKING,
     Any,
     Callable,
     Concatenate,
     ParamSpec,
+    Self,
     TypeVar,
     cast,
 )
@@ -17,63 +21,106 @@ from typing import (
 import spotipy  # type: ignore[import-untyped]
 from requests import ConnectionError as RequestsConnectionError
 from requests import ReadTimeout
-from spotipy.oauth2 import SpotifyOAuth  # type: ignore[import-untyped]
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
 from tqdm import tqdm
 
 from lofi import db, env
 
-from .cache_handler import CacheHandler
-from .errors import PlaylistAlreadyExistsError
+from .cache_handler import CacheHandler, SingleFlightSpotifyOAuth
+from .errors import PlaylistAlreadyExistsError, SearchWindowSaturatedError
 from .log import LOGGER
 from .models import (
     Album,
     Artist,
     ArtistAlbum,
+    Page,
     Playlist,
     PlaylistTrack,
     SearchAlbum,
     Track,
     User,
 )
-from .tracklist_utils import get_tracklist_reorders
+from .playlist_index import PlaylistIndex
+from .rate_limiter import get_rate_limiter, get_retry_after
+from .response_cache import get_cache_key, get_response_cache
+from .tracklist_utils import (
+    TracklistInsert,
+    TracklistPlan,
+    TracklistRemove,
+    TracklistReplace,
+    get_tracklist_plan,
+)
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable, Sequence
+    from collections.abc import Iterable, Iterator, Sequence
+    from contextlib import AbstractContextManager
+    from types import TracebackType
 
 _T = TypeVar("_T")
+_U = TypeVar("_U")
 _P = ParamSpec("_P")
 
+SEARCH_MAX_OFFSET = 950
+STREAM_WINDOW_SIZE = 200
+
+
+def check_search_window(q: str, page: Any, *, raise_if_saturated: bool) -> None:  # noqa: ANN401
+    """Check whether all results of search `q` fit in the pages Spotify returns.
+
+    Only results up to `SEARCH_MAX_OFFSET` are returned. Raise
+    `SearchWindowSaturatedError` if `raise_if_saturated` is True and
+    `page`, the first page of results, shows more, otherwise log a warning.
+    """
+    window = SEARCH_MAX_OFFSET + page["limit"]
+    if page["total"] <= window:
+        return
+    if raise_if_saturated:
+        raise SearchWindowSaturatedError(q, page["total"])
+    LOGGER.warning(f"{page['total']:,} results for {q=}, only the first {window:,} are returned")
+
 
 def chunk(it: Sequence[_T], size: int) -> Iterable[Sequence[_T]]:
     for i in range(0, len(it), size):
         yield it[i : i + size]
 
 
-def get_first_differing_index(l1: Iterable[Any], l2: Iterable[Any]) -> int | None:
-    try:
-        return next(itertools.compress(itertools.count(), map(operator.ne, l1, l2)))
-    except StopIteration:
-        return None
+def get_auth_manager(user_id: str, session: db.Session) -> SingleFlightSpotifyOAuth:
+    """Return OAuth manager caching the token of `user_id` in database."""
+    scopes = (
+        "playlist-modify-public",
+        "playlist-modify-private",
+        "playlist-read-private",
+        "playlist-read-collaborative",
+    )
+    return SingleFlightSpotifyOAuth(
+        cache_handler=CacheHandler(user_id=user_id, session=session), scope=",".join(scopes)
+    )
+
 
+def get_page_offsets(page: Any, max_offset: int | None = None) -> range:  # noqa: ANN401
+    """Return offsets of all pages following `page` of a paginated response."""
+    stop = page["total"] if max_offset is None else min(page["total"], max_offset + 1)
+    return range(page["offset"] + page["limit"], stop, page["limit"])
 
-def get_tracklist_diffs(
-    l1: Sequence[_T],
-    l2: Sequence[_T],
-) -> tuple[list[_T], list[_T]]:
-    l1, l2 = list(l1), list(l2)
-    i = get_first_differing_index(reversed(l1), reversed(l2))
-    if i is not None:
-        if i == 0:
-            return l1, l2
-        return l1[:-i], l2[:-i]
-    if (n := len(l2) - len(l1)) > 0:
-        return [], l2[:n]
-    return l1[:-n], []
+
+def set_url_offset(url: str, offset: int) -> str:
+    """Return `url` with its `offset` query parameter set to `offset`."""
+    parts = urllib.parse.urlsplit(url)
+    query = dict(urllib.parse.parse_qsl(parts.query))
+    query["offset"] = str(offset)
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query)))
 
 
 def retry_on_timeout(
     func: Callable[Concatenate[SpotifyAPIClient, _P], _T],
 ) -> Callable[Concatenate[SpotifyAPIClient, _P], _T]:
+    """Retry calls failing on timeouts or connection errors, with exponential backoff.
+
+    Only the failed call is retried. The spotipy client is shared by all
+    threads of the client, so it is kept, along with its connection pool
+    and access token.
+    """
+
     @functools.wraps(func)
     def wrapped(self: SpotifyAPIClient, *args: _P.args, **kwargs: _P.kwargs) -> _T:
         max_retries = 10
@@ -86,7 +133,6 @@ def retry_on_timeout(
                 n = 2**i
                 LOGGER.warning(f"Spotify API error. Retrying in {n} seconds")
                 time.sleep(n)
-                self.api = self.get_api(self.session)
 
         # Following code is unreachable, only here for type check
         raise NotImplementedError  # pragma: no cover
@@ -94,29 +140,165 @@ def retry_on_timeout(
     return cast(Callable[Concatenate["SpotifyAPIClient", _P], _T], wrapped)
 
 
+class RateLimitedSpotify(spotipy.Spotify):  # type: ignore[misc]
+    """spotipy client throttled by the process-wide rate limiter.
+
+    Rate limited responses are not retried by the HTTP session, which only
+    retries server errors: they pause the shared rate limiter for
+    `Retry-After` seconds and are retried once the pause is over.
+
+    GET responses of cacheable endpoints are served from the process-wide
+    response cache when enabled, and writes invalidate cached responses of
+    the written resource.
+
+    Connections are kept alive in a pool of `pool_maxsize` connections,
+    which should be at least the number of threads sharing the client.
+    """
+
+    max_rate_limited_retries = 10
+    status_forcelist = (500, 502, 503, 504)
+
+    def __init__(self, *args: Any, pool_maxsize: int = DEFAULT_POOLSIZE, **kwargs: Any) -> None:  # noqa: ANN401
+        # Must be set before super().__init__, which builds the HTTP session
+        self.pool_maxsize = pool_maxsize
+        super().__init__(*args, status_forcelist=self.status_forcelist, **kwargs)
+
+    def _build_session(self) -> None:
+        super()._build_session()
+        # Let rate limited responses, with their headers, reach `_send` instead of
+        # having urllib3 sleep `Retry-After` in each thread, and report server
+        # errors with their own status once retries are exhausted
+        retry = self._session.get_adapter("https://").max_retries.new(
+            respect_retry_after_header=False, raise_on_status=False
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=self.pool_maxsize)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def _internal_call(self, method: str, url: str, payload: Any, params: dict[str, Any]) -> Any:  # noqa: ANN401
+        cache = get_response_cache()
+        if cache is None:
+            return self._send(method, url, payload, params)
+        if method != "GET":
+            response = self._send(method, url, payload, params)
+            cache.invalidate(url)
+            return response
+        key = get_cache_key(url, params)
+        if (ttl := cache.get_ttl(key)) is None:
+            return self._send(method, url, payload, params)
+        if (response := cache.get(key)) is None:
+            response = self._send(method, url, payload, params)
+            cache.set(key, response, ttl)
+        return response
+
+    def _send(self, method: str, url: str, payload: Any, params: dict[str, Any]) -> Any:  # noqa: ANN401
+        rate_limiter = get_rate_limiter()
+        for i in range(self.max_rate_limited_retries + 1):
+            rate_limiter.acquire()
+            try:
+                return super()._internal_call(method, url, payload, dict(params))
+            except spotipy.SpotifyException as e:
+                if e.http_status != http.HTTPStatus.TOO_MANY_REQUESTS or i == self.max_rate_limited_retries:
+                    raise
+                rate_limiter.pause(get_retry_after(e.headers))
+
+        # Following code is unreachable, only here for type check
+        raise NotImplementedError  # pragma: no cover
+
+
 class SpotifyAPIClient:
-    def __init__(self, session: db.Session, user_id: str | None = None) -> None:
+    """Spotify API client.
+
+    A single instance is meant to be shared by a whole ETL run, so that
+    HTTP connections are kept alive between requests. It can be used as a
+    context manager to release these connections at the end of the run.
+    """
+
+    def __init__(self, session: db.Session, user_id: str | None = None, max_workers: int | None = None) -> None:
         self.user_id = env.spotify_user_id() if user_id is None else user_id
+        self.max_workers = env.spotify_max_workers() if max_workers is None else max_workers
         self.api = self.get_api(session)
         self.session = session
+        self._playlist_index: PlaylistIndex | None = None
+        self._playlist_index_lock = threading.Lock()
+        self._worker = threading.local()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close pooled HTTP connections."""
+        self.api._session.close()  # noqa: SLF001
+
+    def _caching(self, use_cache: bool) -> AbstractContextManager[None]:  # noqa: FBT001
+        cache = get_response_cache()
+        return contextlib.nullcontext() if use_cache or cache is None else cache.disabled()
 
     def get_api(self, session: db.Session) -> spotipy.Spotify:
         """Return spotipy API client."""
-        scopes = (
-            "playlist-modify-public",
-            "playlist-modify-private",
-            "playlist-read-private",
-            "playlist-read-collaborative",
-        )
-        return spotipy.Spotify(
-            auth_manager=SpotifyOAuth(
-                cache_handler=CacheHandler(user_id=self.user_id, session=session),
-                scope=",".join(scopes),
-            ),
+        return RateLimitedSpotify(
+            auth_manager=get_auth_manager(self.user_id, session),
             requests_timeout=60,
             retries=10,
+            pool_maxsize=max(DEFAULT_POOLSIZE, self.max_workers),
         )
 
+    def map_concurrently(
+        self,
+        func: Callable[[_T], _U],
+        items: Sequence[_T],
+        *,
+        unit_scale: int = 1,
+        show_progress: bool = True,
+    ) -> list[_U]:
+        """Apply `func` to all items on a thread pool of `max_workers` threads.
+
+        Results are returned in input order. Calls are isolated from each
+        other: a failing call neither cancels nor restarts the others. Once
+        all calls are done, failed ones are retried once, alone, so that
+        the results of the others are kept, and the first error (in input
+        order) is raised if any still fails.
+
+        Calls from a worker thread of the pool run sequentially on that
+        thread, so that there are never more than `max_workers` threads
+        sending requests, and that the response cache scope of the worker,
+        which is thread-local, applies to them.
+        """
+
+        def run_in_worker(item: _T) -> _U:
+            self._worker.is_active = True
+            return func(item)
+
+        with tqdm(total=len(items), unit_scale=unit_scale, disable=not show_progress) as progress:
+            if self.max_workers <= 1 or len(items) <= 1 or getattr(self._worker, "is_active", False):
+                results = []
+                for item in items:
+                    results.append(func(item))
+                    progress.update()
+                return results
+
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+                futures = [executor.submit(run_in_worker, item) for item in items]
+                for _ in as_completed(futures):
+                    progress.update()
+
+        results = []
+        for item, future in zip(items, futures, strict=True):
+            if (error := future.exception()) is None:
+                results.append(future.result())
+                continue
+            LOGGER.warning(f"Concurrent Spotify API call failed with {error!r}. Retrying it alone")
+            results.append(func(item))
+        return results
+
     def _get_items(
         self,
         response: Any,  # noqa: ANN401
@@ -128,39 +310,90 @@ class SpotifyAPIClient:
 
         response = get_subkey(response)
         items: list[dict[str, Any] | None] = response["items"]
+        if self.max_workers > 1 and isinstance(response.get("next"), str) and "total" in response:
+            # All offsets are known from the first page: fetch remaining pages concurrently, unless
+            # already on a worker thread, see `map_concurrently`
+            pages = self.map_concurrently(
+                functools.partial(self._get_page, response["next"]),
+                get_page_offsets(response, max_offset),
+                show_progress=False,
+            )
+            for page in pages:
+                items.extend(get_subkey(page)["items"])
+            return [item for item in items if item is not None]
         while response.get("next") and (max_offset is None or response.get("offset", max_offset) < max_offset):
             response = get_subkey(self.api.next(response))
             items.extend(response["items"])
         return [item for item in items if item is not None]
 
     @retry_on_timeout
-    def albums(self, ids: Sequence[str], *, with_all_tracks: bool = False) -> list[Album]:
-        albums: list[Any] = []
-        for i in tqdm(range(0, len(ids), 20), unit_scale=20):
-            albums.extend(
-                [a for a in self.api.albums(ids[i : i + 20])["albums"] if a is not None],
-            )
-            if not with_all_tracks:
-                continue
-            for album in albums[i : i + 20]:
-                album["tracks"]["items"] = self._get_items(album["tracks"])
+    def _get_page(self, url: str, offset: int) -> Any:  # noqa: ANN401
+        return self.api._get(set_url_offset(url, offset))  # noqa: SLF001
+
+    def albums(self, ids: Sequence[str], *, with_all_tracks: bool = False, use_cache: bool = True) -> list[Album]:
+        """Return albums of given IDs.
+
+        Set `use_cache` to False to get up-to-date popularity.
+        """
+        batches = self.map_concurrently(
+            functools.partial(self._albums_batch, with_all_tracks=with_all_tracks, use_cache=use_cache),
+            list(chunk(ids, 20)),
+            unit_scale=20,
+        )
+        return [Album.model_validate(album) for batch in batches for album in batch]
 
-        return list(map(Album.model_validate, albums))
+    def iter_albums(
+        self,
+        ids: Sequence[str],
+        *,
+        with_all_tracks: bool = False,
+        use_cache: bool = True,
+        window_size: int = STREAM_WINDOW_SIZE,
+    ) -> Iterator[list[Album]]:
+        """Yield albums of given IDs in windows of `window_size` albums.
+
+        Each window is fetched once the previous one is consumed, so that
+        only one window of responses is held in memory at a time.
+        """
+        for window in chunk(ids, window_size):
+            yield self.albums(window, with_all_tracks=with_all_tracks, use_cache=use_cache)
 
     @retry_on_timeout
-    def artist_albums(self, artist_id: str) -> list[ArtistAlbum]:
-        items = self.api.artist_albums(artist_id, country="US", limit=50)
-        return list(map(ArtistAlbum.model_validate, self._get_items(items)))
+    def _albums_batch(self, ids: Sequence[str], *, with_all_tracks: bool, use_cache: bool) -> list[Any]:
+        with self._caching(use_cache):
+            albums = [a for a in self.api.albums(ids)["albums"] if a is not None]
+        if with_all_tracks:
+            for album in albums:
+                album["tracks"]["items"] = self._get_items(album["tracks"])
+        return albums
 
     @retry_on_timeout
+    def artist_albums(
+        self,
+        artist_id: str,
+        *,
+        skip_if: Callable[[Page[ArtistAlbum]], bool] | None = None,
+    ) -> Page[ArtistAlbum] | None:
+        """Return albums of an artist, along with their total count.
+
+        If `skip_if` returns True for the first page, return None without
+        fetching the other ones.
+        """
+        response = self.api.artist_albums(artist_id, country="US", limit=50)
+        if skip_if is not None and skip_if(Page[ArtistAlbum].model_validate(response)):
+            return None
+        return Page[ArtistAlbum](
+            items=list(map(ArtistAlbum.model_validate, self._get_items(response))),
+            total=response["total"],
+        )
+
     def artists(self, ids: Sequence[str]) -> list[Artist]:
-        artists: list[Any] = []
-        for i in tqdm(range(0, len(ids), 50), unit_scale=50):
-            artists.extend(
-                [a for a in self.api.artists(ids[i : i + 50])["artists"] if a is not None],
-            )
+        batches = self.map_concurrently(self._artists_batch, list(chunk(ids, 50)), unit_scale=50)
+        return [Artist.model_validate(artist) for batch in batches for artist in batch]
 
-        return list(map(Artist.model_validate, artists))
+    @retry_on_timeout
+    def _artists_batch(self, ids: Sequence[str]) -> list[Any]:
+        return [a for a in self.api.artists(ids)["artists"] if a is not None]
 
     @retry_on_timeout
     def create_playlist(
@@ -173,15 +406,29 @@ class SpotifyAPIClient:
         skip_if_already_exists: bool = False,
     ) -> Playlist:
         LOGGER.info(f"Creating Spotify playlist with {name=}")
-        playlists = self.user_playlists(self.user_id)
-        matching = [p for p in playlists if p.name == name]
+        playlist_index = self.get_playlist_index()
+        matching = playlist_index.get_by_name(name)
         if matching and not allow_duplicates:
             if skip_if_already_exists:
                 LOGGER.info("Playlist already exists, skipping")
                 return matching[0]
             raise PlaylistAlreadyExistsError(self.user_id, name, matching[0].id)
         resp = self.api.user_playlist_create(self.user_id, name, public=public, description=description)
-        return Playlist.model_validate(resp)
+        playlist = Playlist.model_validate(resp)
+        with self._playlist_index_lock:
+            playlist_index.add(playlist)
+        return playlist
+
+    def get_playlist_index(self, *, refresh: bool = False) -> PlaylistIndex:
+        """Return playlists of the client user, indexed by ID and name.
+
+        Playlists are listed on first call, or if `refresh` is True, then
+        kept up to date as playlists are created by this client.
+        """
+        with self._playlist_index_lock:
+            if self._playlist_index is None or refresh:
+                self._playlist_index = PlaylistIndex(self.user_playlists(self.user_id))
+            return self._playlist_index
 
     @retry_on_timeout
     def me(self) -> User:
@@ -192,6 +439,17 @@ class SpotifyAPIClient:
     def playlist(self, playlist_id: str) -> Playlist:
         return Playlist.model_validate(self.api.playlist(playlist_id))
 
+    def iter_tracks(
+        self,
+        ids: Sequence[str],
+        *,
+        use_cache: bool = True,
+        window_size: int = STREAM_WINDOW_SIZE,
+    ) -> Iterator[list[Track]]:
+        """Yield tracks of given IDs in windows of `window_size` tracks."""
+        for window in chunk(ids, window_size):
+            yield self.tracks(window, use_cache=use_cache)
+
     @retry_on_timeout
     def playlist_tracks(self, playlist_id: str) -> list[PlaylistTrack]:
         LOGGER.info(f"Fetching tracks of Spotify playlist {playlist_id}")
@@ -200,62 +458,107 @@ class SpotifyAPIClient:
         return list(map(PlaylistTrack.model_validate, raw_tracks))
 
     @retry_on_timeout
-    def search_albums(self, q: str) -> list[SearchAlbum]:
+    def search_albums(self, q: str, *, raise_if_saturated: bool = False) -> list[SearchAlbum]:
+        """Return albums matching `q`.
+
+        If `raise_if_saturated` is True and `q` has more results than
+        Spotify returns, `SearchWindowSaturatedError` is raised as soon as
+        the first page is received.
+        """
         LOGGER.info(f"Searching for {q=}")
-        items = self._get_items(self.api.search(q, type="album", limit=50), 950, "albums")
+        response = self.api.search(q, type="album", limit=50)
+        check_search_window(q, response["albums"], raise_if_saturated=raise_if_saturated)
+        items = self._get_items(response, SEARCH_MAX_OFFSET, "albums")
         return list(map(SearchAlbum.model_validate, items))
 
-    @retry_on_timeout
-    def set_playlist_tracks(
+    def plan_playlist_tracks(
         self,
         playlist_id: str,
         ids: Sequence[str],
         current_ids: Sequence[str] | None = None,
-        *,
-        use_reorders: bool = False,
-    ) -> None:
-        LOGGER.info(f"Updating tracklist of Spotify playlist {playlist_id}")
+    ) -> TracklistPlan[str]:
+        """Return the plan setting tracklist of a playlist in the fewest requests, without applying it."""
         if current_ids is None:
             current_ids = [track.id for track in self.playlist_tracks(playlist_id)]
         else:
             LOGGER.info("Current snapshot already in database")
-            current_ids = list(current_ids)
-        if ids == current_ids:
+        plan = get_tracklist_plan(ids, current_ids)
+        LOGGER.info(
+            f"Planned {plan.strategy} update in {plan.request_count:,} requests sending {plan.payload:,} track IDs",
+        )
+        return plan
+
+    def set_playlist_tracks(
+        self,
+        playlist_id: str,
+        ids: Sequence[str],
+        current_ids: Sequence[str] | None = None,
+    ) -> str | None:
+        """Set tracklist of a playlist with the plan taking the fewest requests.
+
+        Return the snapshot ID returned by the last request, or None if
+        the playlist already had the tracklist.
+
+        Plan steps are positional, so if a request times out, the playlist
+        may have been partly updated: the update is then retried with a
+        plan from its current tracklist, fetched again from Spotify.
+        """
+        LOGGER.info(f"Updating tracklist of Spotify playlist {playlist_id}")
+        try:
+            return self._apply_playlist_tracks(playlist_id, ids, current_ids)
+        except (ReadTimeout, RequestsConnectionError):
+            LOGGER.warning("Spotify API error while updating playlist. Retrying from its current tracklist")
+            return self._reset_playlist_tracks(playlist_id, ids)
+
+    @retry_on_timeout
+    def _reset_playlist_tracks(self, playlist_id: str, ids: Sequence[str]) -> str:
+        if (snapshot_id := self._apply_playlist_tracks(playlist_id, ids)) is not None:
+            return snapshot_id
+        # The failed attempt was applied in full
+        return self.playlist(playlist_id).snapshot_id
+
+    def _apply_playlist_tracks(
+        self,
+        playlist_id: str,
+        ids: Sequence[str],
+        current_ids: Sequence[str] | None = None,
+    ) -> str | None:
+        plan = self.plan_playlist_tracks(playlist_id, ids, current_ids)
+        if not plan.steps:
             LOGGER.info("Playlist already has required tracklist")
-            return
-        current_ids_set = set(current_ids)
-        ids_to_remove_set = current_ids_set - set(ids)
-        if use_reorders:
-            ids_to_add = [track_id for track_id in ids if track_id not in current_ids_set]
-            ids_to_remove = list(ids_to_remove_set)
-        else:
-            ids_to_add, ids_to_remove = get_tracklist_diffs(ids, current_ids)
-        LOGGER.info(f"Removing {len(ids_to_remove):,} tracks")
-        for ids_chunk in chunk(ids_to_remove, 100):
-            self.api.playlist_remove_all_occurrences_of_items(playlist_id, ids_chunk)
-        LOGGER.info(f"Adding {len(ids_to_add):,} tracks")
-        for i, ids_chunk in enumerate(chunk(ids_to_add, 100)):
-            self.api.playlist_add_items(playlist_id, ids_chunk, position=i * 100)
-        if use_reorders:
-            current_ids = ids_to_add + [track_id for track_id in current_ids if track_id not in ids_to_remove_set]
-            for reorder in get_tracklist_reorders(ids, current_ids):
-                self.api.playlist_reorder_items(
+            return None
+        for step in plan.steps:
+            if isinstance(step, TracklistRemove):
+                response = self.api.playlist_remove_all_occurrences_of_items(playlist_id, step.ids)
+            elif isinstance(step, TracklistInsert):
+                response = self.api.playlist_add_items(playlist_id, step.ids, position=step.position)
+            elif isinstance(step, TracklistReplace):
+                response = self.api.playlist_replace_items(playlist_id, step.ids)
+            else:
+                response = self.api.playlist_reorder_items(
                     playlist_id,
-                    reorder.range_start,
-                    reorder.insert_before,
-                    reorder.range_length,
+                    step.range_start,
+                    step.insert_before,
+                    step.range_length,
                 )
+        return cast(str, response["snapshot_id"])
 
-    @retry_on_timeout
-    def tracks(self, ids: Sequence[str]) -> list[Track]:
-        n = 50
-        tracks = (
-            t
-            for i in tqdm(range(0, len(ids), n), unit_scale=n)
-            for t in self.api.tracks(ids[i : i + n])["tracks"]
-            if t is not None
+    def tracks(self, ids: Sequence[str], *, use_cache: bool = True) -> list[Track]:
+        """Return tracks of given IDs.
+
+        Set `use_cache` to False to get up-to-date popularity.
+        """
+        batches = self.map_concurrently(
+            functools.partial(self._tracks_batch, use_cache=use_cache),
+            list(chunk(ids, 50)),
+            unit_scale=50,
         )
-        return list(map(Track.model_validate, tracks))
+        return [Track.model_validate(track) for batch in batches for track in batch]
+
+    @retry_on_timeout
+    def _tracks_batch(self, ids: Sequence[str], *, use_cache: bool) -> list[Any]:
+        with self._caching(use_cache):
+            return [t for t in self.api.tracks(ids)["tracks"] if t is not None]
 
     @retry_on_timeout
     def user_playlists(self, user_id: str) -> list[Playlist]:
@@ -3,3 +3,9 @@ class PlaylistAlreadyExistsError(Exception):
         self.user_id = user_id
         self.name = name
         self.playlist_id = playlist_id
+
+
+class SearchWindowSaturatedError(Exception):
+    def __init__(self, q: str, total: int) -> None:
+        self.q = q
+        self.total = total
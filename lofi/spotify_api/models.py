@@ -84,6 +84,10 @@ class Items(BaseModel, Generic[_T]):
     items: Sequence[_T]
 
 
+class Page(Items[_T], Generic[_T]):
+    total: int
+
+
 class AlbumTrack(HasIdAndName):
     pass
 
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .models import Playlist
+
+
+class PlaylistIndex:
+    """Playlists of a user, indexed by ID and by name.
+
+    Several playlists may share a name, in which case they are listed in
+    the order they were added.
+    """
+
+    def __init__(self, playlists: Iterable[Playlist] = ()) -> None:
+        self.by_id: dict[str, Playlist] = {}
+        self.by_name: defaultdict[str, list[Playlist]] = defaultdict(list)
+        for playlist in playlists:
+            self.add(playlist)
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def add(self, playlist: Playlist) -> None:
+        if (previous := self.by_id.get(playlist.id)) is not None:
+            self.by_name[previous.name].remove(previous)
+        self.by_id[playlist.id] = playlist
+        self.by_name[playlist.name].append(playlist)
+
+    def get_by_name(self, name: str) -> list[Playlist]:
+        return list(self.by_name.get(name, []))
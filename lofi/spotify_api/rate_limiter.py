@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from lofi import env
+
+from .log import LOGGER
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+
+class RateLimiter:
+    """Token bucket throttling Spotify API requests.
+
+    Tokens are refilled at `rate` per second, up to `capacity`. Each
+    request takes one token and waits until the bucket is no longer in
+    debt. A rate limited (429) response pauses the whole bucket, so that
+    all callers wait for `Retry-After` instead of retrying separately.
+
+    Attributes
+    ----------
+    requests
+        Number of acquired tokens.
+    throttled_seconds
+        Total time callers spent waiting for a token or for a pause to end.
+    paused_seconds
+        Total time the bucket was paused after rate limited responses.
+    rate_limited_responses
+        Number of pauses, i.e. rate limited responses.
+
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, rate) if capacity is None else capacity
+        self.requests = 0
+        self.throttled_seconds = 0.0
+        self.paused_seconds = 0.0
+        self.rate_limited_responses = 0
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+
+    def acquire(self) -> None:
+        """Block until a request can be sent."""
+        delay = self.reserve()
+        while delay > 0:
+            time.sleep(delay)
+            delay = self._get_pause_delay()
+
+    async def acquire_async(self) -> None:
+        """Wait without blocking the event loop until a request can be sent."""
+        delay = self.reserve()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._get_pause_delay()
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for `seconds` seconds."""
+        LOGGER.warning(f"Spotify API rate limit reached. Pausing all requests for {seconds} seconds")
+        with self._lock:
+            now = time.monotonic()
+            paused_until = max(self._paused_until, now + seconds)
+            self.paused_seconds += paused_until - max(self._paused_until, now)
+            self.rate_limited_responses += 1
+            self._paused_until = paused_until
+            # Do not let the bucket refill while paused, to avoid a burst once the pause ends
+            self._tokens = min(self._tokens, 0.0)
+            self._updated_at = paused_until
+
+    def reserve(self) -> float:
+        """Take a token and return how many seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            if now > self._updated_at:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+            self._tokens -= 1
+            self.requests += 1
+            delay = max(0.0, self._paused_until - now, -self._tokens / self.rate + self._updated_at - now)
+            self.throttled_seconds += delay
+            return delay
+
+    def summary(self) -> str:
+        return (
+            f"{self.requests:,} Spotify API requests, throttled for {self.throttled_seconds:,.1f}s, "
+            f"paused for {self.paused_seconds:,.1f}s after {self.rate_limited_responses:,} rate limited responses"
+        )
+
+    def _get_pause_delay(self) -> float:
+        with self._lock:
+            delay = max(0.0, self._paused_until - time.monotonic())
+            self.throttled_seconds += delay
+            return delay
+
+
+@functools.lru_cache
+def get_rate_limiter() -> RateLimiter:
+    """Return the rate limiter shared by all clients and threads of the process."""
+    return RateLimiter(env.spotify_requests_per_second())
+
+
+def get_retry_after(headers: Mapping[str, str] | None, default: float = 1.0) -> float:
+    """Return the `Retry-After` delay in seconds of a rate limited response."""
+    try:
+        return float((headers or {})["Retry-After"])
+    except (KeyError, ValueError):
+        return default
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import contextlib
+import datetime
+import functools
+import json
+import sqlite3
+import threading
+import time
+import urllib.parse
+from typing import TYPE_CHECKING, Any
+
+from lofi import env
+
+from .log import LOGGER
+
+if TYPE_CHECKING:
+    import pathlib
+    from collections.abc import Iterator, Mapping
+
+# Playlists are never cached: their snapshot IDs and tracklists must be
+# current when planning writes, which a stale response would corrupt
+DEFAULT_TTLS = {
+    "albums": datetime.timedelta(days=7),
+    "albums/{id}/tracks": datetime.timedelta(days=7),
+    "artists": datetime.timedelta(days=7),
+    "artists/{id}/albums": datetime.timedelta(days=1),
+    "search": datetime.timedelta(days=1),
+    "tracks": datetime.timedelta(days=7),
+}
+PREFIX = "https://api.spotify.com/v1/"
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def get_cache_key(url: str, params: Mapping[str, Any] | None = None) -> str:
+    """Return the cache key of a GET request, i.e. its path and sorted query."""
+    split = urllib.parse.urlsplit(url if url.startswith("http") else PREFIX + url)
+    query = dict(urllib.parse.parse_qsl(split.query))
+    query.update({k: str(v) for k, v in (params or {}).items() if v is not None})
+    path = split.path.removeprefix("/v1/").strip("/")
+    return f"{path}?{urllib.parse.urlencode(sorted(query.items()))}"
+
+
+def get_endpoint(key: str) -> str:
+    """Return the endpoint of a cache key, e.g. `artists/{id}/albums`."""
+    segments = key.split("?", 1)[0].split("/")
+    return "/".join("{id}" if i % 2 else segment for i, segment in enumerate(segments))
+
+
+class ResponseCache:
+    """SQLite store of Spotify API GET responses.
+
+    Responses are cached for the TTL of their endpoint, and endpoints
+    without a TTL are never cached. Once the store holds more than
+    `max_entries` responses, the least recently used ones are evicted.
+
+    The database is in WAL mode and each thread has its own connection,
+    so that concurrent readers, including other processes, do not block
+    each other.
+
+    Attributes
+    ----------
+    hits
+        Number of requests served from the cache.
+    misses
+        Number of cacheable requests sent to Spotify.
+
+    """
+
+    evict_every = 1_000
+
+    def __init__(
+        self,
+        path: pathlib.Path,
+        ttls: Mapping[str, datetime.timedelta] = DEFAULT_TTLS,
+        max_entries: int = 100_000,
+    ) -> None:
+        self.path = path
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self.connection.execute("pragma journal_mode = wal")
+        self.connection.execute(
+            "create table if not exists response ("
+            "key text primary key, body text not null, expires_at real not null, accessed_at real not null)",
+        )
+        self.connection.execute("create index if not exists ix_response_accessed_at on response (accessed_at)")
+        self.evict()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Return the connection of the current thread."""
+        if not hasattr(self._local, "connection"):
+            self._local.connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        return self._local.connection  # type: ignore[no-any-return]
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(self._local, "enabled", True)
+
+    @contextlib.contextmanager
+    def disabled(self) -> Iterator[None]:
+        """Bypass the cache for requests sent by the current thread."""
+        enabled = self.enabled
+        self._local.enabled = False
+        try:
+            yield
+        finally:
+            self._local.enabled = enabled
+
+    @property
+    def hit_ratio(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def get_ttl(self, key: str) -> datetime.timedelta | None:
+        return self.ttls.get(get_endpoint(key)) if self.enabled else None
+
+    def get(self, key: str) -> Any:  # noqa: ANN401
+        """Return cached response of `key`, or None if it is missing or expired."""
+        now = time.time()
+        row = self.connection.execute(
+            "update response set accessed_at = ? where key = ? and expires_at > ? returning body",
+            (now, key, now),
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, response: Any, ttl: datetime.timedelta) -> None:  # noqa: ANN401
+        now = time.time()
+        self.connection.execute(
+            "insert or replace into response values (?, ?, ?, ?)",
+            (key, json.dumps(response), now + ttl.total_seconds(), now),
+        )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        if evict:
+            self.evict()
+
+    def invalidate(self, url: str) -> None:
+        """Remove cached responses of the resource `url` was written to.
+
+        The resource is given by the first two segments of the path, e.g.
+        adding tracks to a playlist invalidates the playlist and all its
+        track pages.
+        """
+        resource = "/".join(get_cache_key(url).split("?", 1)[0].split("/")[:2])
+        self.connection.execute(
+            "delete from response where key = ? or key like ? escape '\\' or key like ? escape '\\'",
+            (resource, f"{escape_like(resource)}?%", f"{escape_like(resource)}/%"),
+        )
+
+    def evict(self) -> None:
+        """Remove expired responses, then least recently used ones beyond `max_entries`."""
+        self.connection.execute("delete from response where expires_at <= ?", (time.time(),))
+        self.connection.execute(
+            "delete from response where key in "
+            "(select key from response order by accessed_at desc limit -1 offset ?)",
+            (self.max_entries,),
+        )
+
+    def summary(self) -> str:
+        return (
+            f"Spotify API response cache: {self.hits:,} hits, {self.misses:,} misses ({self.hit_ratio:.1%} hit ratio)"
+        )
+
+
+@functools.lru_cache
+def get_response_cache() -> ResponseCache | None:
+    """Return the response cache shared by all clients of the process, if enabled."""
+    path = env.spotify_cache_path()
+    if path is None:
+        return None
+    LOGGER.info(f"Caching Spotify API responses in {path}")
+    return ResponseCache(path, max_entries=env.spotify_cache_max_entries())
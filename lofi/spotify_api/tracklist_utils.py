@@ -1,19 +1,98 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Generic, TypeVar, overload
+import bisect
+import itertools
+import operator
+import random
+from collections import Counter
+from enum import StrEnum
+from typing import TYPE_CHECKING, Any, Generic, TypeVar, overload
 
 from pydantic import BaseModel
 
 if TYPE_CHECKING:
-    from collections.abc import Iterator, Sequence
+    from collections.abc import Iterable, Iterator, Sequence
 
 _T = TypeVar("_T")
 
+MAX_ITEMS_PER_REQUEST = 100
+
+
+class _Node(Generic[_T]):
+    __slots__ = ("left", "parent", "priority", "right", "size", "value")
+
+    def __init__(self, value: _T) -> None:
+        self.value = value
+        self.priority = random.random()  # noqa: S311
+        self.left: _Node[_T] | None = None
+        self.right: _Node[_T] | None = None
+        self.parent: _Node[_T] | None = None
+        self.size = 1
+
+
+def _size(node: _Node[_T] | None) -> int:
+    return 0 if node is None else node.size
+
+
+def _update(node: _Node[_T]) -> None:
+    node.size = 1 + _size(node.left) + _size(node.right)
+    for child in (node.left, node.right):
+        if child is not None:
+            child.parent = node
+
+
+def _merge(left: _Node[_T] | None, right: _Node[_T] | None) -> _Node[_T] | None:
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _split(node: _Node[_T] | None, k: int) -> tuple[_Node[_T] | None, _Node[_T] | None]:
+    """Split the subtree of `node` into its first `k` values and the others."""
+    if node is None:
+        return None, None
+    if _size(node.left) >= k:
+        left, node.left = _split(node.left, k)
+        _update(node)
+        return left, node
+    node.right, right = _split(node.right, k - _size(node.left) - 1)
+    _update(node)
+    return node, right
+
+
+def _iter_values(node: _Node[_T] | None) -> Iterator[_T]:
+    stack: list[_Node[_T]] = []
+    while stack or node is not None:
+        while node is not None:
+            stack.append(node)
+            node = node.left
+        node = stack.pop()
+        yield node.value
+        node = node.right
+
 
 class InvertibleList(Generic[_T]):
+    """List of unique values supporting fast lookup of the index of a value.
+
+    Values are stored in an implicit treap, a randomized binary search
+    tree keyed by position, whose nodes know the size of their subtree
+    and their parent. Lookups by index or by value, and insertions,
+    deletions and moves of ranges all run in O(log n) expected time,
+    plus the number of inserted or returned values.
+    """
+
     def __init__(self, values: Sequence[_T] = []) -> None:
-        self.values = list(values)
-        self.inverted = {val: index for index, val in enumerate(values)}
+        self._root: _Node[_T] | None = None
+        self._nodes: dict[_T, _Node[_T]] = {}
+        self.insert(0, values)
 
     @overload
     def __getitem__(self, key: int) -> _T:  # pragma: no cover
@@ -24,74 +103,334 @@ class InvertibleList(Generic[_T]):
         ...
 
     def __getitem__(self, key: int | slice) -> _T | list[_T]:
-        return self.values[key]
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return list(self)[key]
+            left, right = _split(self._root, start)
+            middle, right = _split(right, max(stop - start, 0))
+            values = list(_iter_values(middle))
+            self._set_root(_merge(_merge(left, middle), right))
+            return values
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            msg = "InvertibleList index out of range"
+            raise IndexError(msg)
+        node = self._root
+        while node is not None:
+            if key < (left_size := _size(node.left)):
+                node = node.left
+            elif key == left_size:
+                return node.value
+            else:
+                key -= left_size + 1
+                node = node.right
+        raise AssertionError  # pragma: no cover
 
     def __iter__(self) -> Iterator[_T]:
-        yield from self.values
+        yield from _iter_values(self._root)
+
+    def __len__(self) -> int:
+        return _size(self._root)
 
     def delete(self, start: int, length: int) -> None:
-        stop = start + length
-        deleted_values = self.values[start:stop]
-        del self.values[start:stop]
-        for value in deleted_values:
-            del self.inverted[value]
-        for value in self.values[start:]:
-            self.inverted[value] -= stop - start
+        left, right = _split(self._root, start)
+        deleted, right = _split(right, length)
+        for value in _iter_values(deleted):
+            del self._nodes[value]
+        self._set_root(_merge(left, right))
 
     def insert(self, start: int, values: Sequence[_T]) -> None:
-        self.values = self.values[:start] + list(values) + self.values[start:]
-        for i, val in enumerate(values):
-            self.inverted[val] = start + i
-        for val in self.values[start + len(values) :]:
-            self.inverted[val] += len(values)
+        inserted = None
+        for value in values:
+            self._nodes[value] = node = _Node(value)
+            inserted = _merge(inserted, node)
+        left, right = _split(self._root, start)
+        self._set_root(_merge(_merge(left, inserted), right))
+
+    def move(self, start: int, length: int, insert_before: int) -> None:
+        """Move `length` values from `start` to before index `insert_before` of the list without them."""
+        left, right = _split(self._root, start)
+        moved, right = _split(right, length)
+        left, right = _split(_merge(left, right), insert_before)
+        self._set_root(_merge(_merge(left, moved), right))
 
     def index(self, val: _T) -> int:
-        return self.inverted[val]
+        node = self._nodes[val]
+        index = _size(node.left)
+        while (parent := node.parent) is not None:
+            if node is parent.right:
+                index += _size(parent.left) + 1
+            node = parent
+        return index
+
+    def _set_root(self, root: _Node[_T] | None) -> None:
+        if root is not None:
+            root.parent = None
+        self._root = root
+
+
+class TracklistStrategy(StrEnum):
+    suffix_diff = "suffix_diff"
+    minimal_edits = "minimal_edits"
+    reorders = "reorders"
+    full_replace = "full_replace"
+
+
+class TracklistRemove(BaseModel, Generic[_T]):
+    ids: list[_T]
+
+
+class TracklistReplace(BaseModel, Generic[_T]):
+    ids: list[_T]
+
+
+class TracklistInsert(BaseModel, Generic[_T]):
+    position: int
+    ids: list[_T]
+
+
+class TracklistEdits(BaseModel, Generic[_T]):
+    """Tracks to remove from a playlist, then tracks to insert, in order."""
+
+    ids_to_remove: list[_T]
+    inserts: list[TracklistInsert[_T]]
+
+    @property
+    def request_count(self) -> int:
+        return -(-len(self.ids_to_remove) // MAX_ITEMS_PER_REQUEST) + len(self.inserts)
 
 
 class TracklistReorder(BaseModel):
+    """Move of `range_length` tracks from `range_start` to before track `insert_before`.
+
+    Like in Spotify API, `insert_before` is an index in the tracklist
+    before the move.
+    """
+
     range_start: int
     range_length: int
     insert_before: int
 
 
+class TracklistPlan(BaseModel, Generic[_T]):
+    """Requests turning a tracklist into another, one per step."""
+
+    strategy: TracklistStrategy
+    steps: list[TracklistRemove[_T] | TracklistReplace[_T] | TracklistInsert[_T] | TracklistReorder]
+
+    @property
+    def payload(self) -> int:
+        """Return the number of track IDs sent."""
+        return sum(len(step.ids) for step in self.steps if not isinstance(step, TracklistReorder))
+
+    @property
+    def request_count(self) -> int:
+        return len(self.steps)
+
+
+def get_first_differing_index(l1: Iterable[Any], l2: Iterable[Any]) -> int | None:
+    try:
+        return next(itertools.compress(itertools.count(), map(operator.ne, l1, l2)))
+    except StopIteration:
+        return None
+
+
+def get_tracklist_diffs(
+    l1: Sequence[_T],
+    l2: Sequence[_T],
+) -> tuple[list[_T], list[_T]]:
+    l1, l2 = list(l1), list(l2)
+    i = get_first_differing_index(reversed(l1), reversed(l2))
+    if i is not None:
+        if i == 0:
+            return l1, l2
+        return l1[:-i], l2[:-i]
+    if (n := len(l2) - len(l1)) > 0:
+        return [], l2[:n]
+    return l1[:-n], []
+
+
 def get_tracklist_reorders(
     target: Sequence[_T],
     current: Sequence[_T],
 ) -> Iterator[TracklistReorder]:
-    target = list(target)
-    current = list(current)
+    """Yield reorders turning `current` into `target`, a permutation of it.
+
+    Tracks of a longest increasing subsequence of target positions of
+    `current` stay in place, so that as few tracks as possible move. The
+    other tracks are moved in target order to right after the track
+    preceding them in `target`. Tracks following each other in both
+    tracklists are moved together, up to `MAX_ITEMS_PER_REQUEST` at once.
+    """
+    target_positions = {track_id: i for i, track_id in enumerate(target)}
+    current_positions = [target_positions[track_id] for track_id in current]
+    fixed = {current[i] for i in get_longest_increasing_subsequence(current_positions)}
     invertible_current = InvertibleList(current)
-    max_reorder_length = 100
-
-    def get_next_reorder(insert_before: int) -> TracklistReorder | None:
-        if insert_before >= len(current):
-            return None
-        while insert_before < len(current) and invertible_current[insert_before] == target[insert_before]:
-            insert_before += 1
-        if insert_before == len(current):
-            return None
-        start = invertible_current.index(target[insert_before])
+    i = 0
+    while i < len(target):
+        if target[i] in fixed:
+            i += 1
+            continue
+        start = invertible_current.index(target[i])
         length = 1
         while (
-            length <= max_reorder_length
-            and (end := (start + length - 1)) < len(target)
-            and target[length - 1] == invertible_current[end]
+            length < MAX_ITEMS_PER_REQUEST
+            and i + length < len(target)
+            and start + length < len(target)
+            and target[i + length] not in fixed
+            and invertible_current[start + length] == target[i + length]
         ):
             length += 1
-        if length > 1:
-            length -= 1
-        return TracklistReorder(
-            insert_before=insert_before,
-            range_length=length,
-            range_start=start,
-        )
-
-    insert_before = 0
-    while (reorder := get_next_reorder(insert_before)) is not None:
-        yield reorder
-        insert_before += reorder.range_length
-        moved_items = invertible_current[reorder.range_start : reorder.range_start + reorder.range_length]
-        invertible_current.delete(reorder.range_start, reorder.range_length)
-        invertible_current.insert(reorder.insert_before, moved_items)
-    return
+        insert_before = 0 if i == 0 else invertible_current.index(target[i - 1]) + 1
+        if insert_before != start:
+            yield TracklistReorder(range_start=start, range_length=length, insert_before=insert_before)
+            invertible_current.move(start, length, insert_before - length if insert_before > start else insert_before)
+        i += length
+
+
+def get_longest_increasing_subsequence(values: Sequence[int]) -> list[int]:
+    """Return indexes of a longest strictly increasing subsequence of `values`."""
+    # tails[k] is the index of the smallest value ending an increasing subsequence of length k + 1
+    tails: list[int] = []
+    tail_values: list[int] = []
+    previous: list[int | None] = []
+    for i, value in enumerate(values):
+        k = bisect.bisect_left(tail_values, value)
+        previous.append(tails[k - 1] if k else None)
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(value)
+        else:
+            tails[k] = i
+            tail_values[k] = value
+    indexes = []
+    i_or_none = tails[-1] if tails else None
+    while i_or_none is not None:
+        indexes.append(i_or_none)
+        i_or_none = previous[i_or_none]
+    return indexes[::-1]
+
+
+def get_tracklist_edits(target: Sequence[_T], current: Sequence[_T]) -> TracklistEdits[_T]:
+    """Return edits turning tracklist `current` into `target` in few requests.
+
+    Tracks of a longest common subsequence of both tracklists are kept,
+    all others are removed then inserted back at their target position,
+    so that edits are minimal. Tracks appearing more than once are never
+    kept, since removal drops every occurrence of a track. Runs of
+    inserted tracks separated by kept tracks are then merged, removing
+    and inserting back the kept tracks in between, whenever this saves
+    requests.
+    """
+    target_counts = Counter(target)
+    current_counts = Counter(current)
+    current_positions = {track_id: i for i, track_id in enumerate(current) if current_counts[track_id] == 1}
+    candidates = [
+        i for i, track_id in enumerate(target) if target_counts[track_id] == 1 and track_id in current_positions
+    ]
+    kept = [False] * len(target)
+    for k in get_longest_increasing_subsequence([current_positions[target[i]] for i in candidates]):
+        kept[candidates[k]] = True
+
+    def get_request_count(n: int) -> int:
+        return -(-n // MAX_ITEMS_PER_REQUEST)
+
+    removed_count = len(current) - sum(kept)
+    runs: list[tuple[int, int]] = []
+    for i, is_kept in enumerate(kept):
+        if is_kept:
+            continue
+        if runs and runs[-1][1] == i:
+            runs[-1] = (runs[-1][0], i + 1)
+            continue
+        if runs:
+            start, stop = runs[-1]
+            gap = i - stop
+            merged_cost = get_request_count(i + 1 - start) + get_request_count(removed_count + gap)
+            cost = get_request_count(stop - start) + 1 + get_request_count(removed_count)
+            if merged_cost < cost:
+                kept[stop:i] = [False] * gap
+                removed_count += gap
+                runs[-1] = (start, i + 1)
+                continue
+        runs.append((i, i + 1))
+
+    kept_ids = {track_id for track_id, is_kept in zip(target, kept, strict=True) if is_kept}
+    ids_to_remove = [track_id for track_id in dict.fromkeys(current) if track_id not in kept_ids]
+    inserts = [
+        TracklistInsert(position=position, ids=list(target[position : min(position + MAX_ITEMS_PER_REQUEST, stop)]))
+        for start, stop in runs
+        for position in range(start, stop, MAX_ITEMS_PER_REQUEST)
+    ]
+    return TracklistEdits(ids_to_remove=ids_to_remove, inserts=inserts)
+
+
+def _chunk(values: Sequence[_T]) -> Iterator[list[_T]]:
+    for i in range(0, len(values), MAX_ITEMS_PER_REQUEST):
+        yield list(values[i : i + MAX_ITEMS_PER_REQUEST])
+
+
+def get_minimal_edits_plan(target: Sequence[_T], current: Sequence[_T]) -> TracklistPlan[_T]:
+    edits = get_tracklist_edits(target, current)
+    removes = [TracklistRemove(ids=ids) for ids in _chunk(edits.ids_to_remove)]
+    return TracklistPlan(strategy=TracklistStrategy.minimal_edits, steps=[*removes, *edits.inserts])
+
+
+def get_reorders_plan(target: Sequence[_T], current: Sequence[_T]) -> TracklistPlan[_T] | None:
+    """Return plan removing tracks, adding new ones at the top, then reordering, or None if a tracklist has duplicates.
+
+    Tracks in both tracklists are kept, as well as the date they were added.
+    """
+    target_set, current_set = set(target), set(current)
+    if len(target_set) != len(target) or len(current_set) != len(current):
+        return None
+    ids_to_remove = [track_id for track_id in current if track_id not in target_set]
+    ids_to_add = [track_id for track_id in target if track_id not in current_set]
+    removes = [TracklistRemove(ids=ids) for ids in _chunk(ids_to_remove)]
+    inserts = [TracklistInsert(position=i * MAX_ITEMS_PER_REQUEST, ids=ids) for i, ids in enumerate(_chunk(ids_to_add))]
+    reordered = ids_to_add + [track_id for track_id in current if track_id in target_set]
+    reorders = list(get_tracklist_reorders(target, reordered))
+    return TracklistPlan(strategy=TracklistStrategy.reorders, steps=[*removes, *inserts, *reorders])
+
+
+def get_replace_plan(target: Sequence[_T]) -> TracklistPlan[_T]:
+    """Return plan replacing the tracklist with its first 100 tracks, then appending the others."""
+    chunks = list(_chunk(target))
+    replace = TracklistReplace(ids=chunks[0] if chunks else [])
+    inserts = [TracklistInsert(position=i * MAX_ITEMS_PER_REQUEST, ids=ids) for i, ids in enumerate(chunks) if i]
+    return TracklistPlan(strategy=TracklistStrategy.full_replace, steps=[replace, *inserts])
+
+
+def get_suffix_diff_plan(target: Sequence[_T], current: Sequence[_T]) -> TracklistPlan[_T] | None:
+    """Return plan removing then adding back the head of the tracklist, up to the common suffix.
+
+    Removing a track removes all its occurrences, including those in the
+    common suffix, so None is returned if `current` has duplicates.
+    """
+    if len(set(current)) != len(current):
+        return None
+    ids_to_add, ids_to_remove = get_tracklist_diffs(target, current)
+    removes = [TracklistRemove(ids=ids) for ids in _chunk(ids_to_remove)]
+    inserts = [TracklistInsert(position=i * MAX_ITEMS_PER_REQUEST, ids=ids) for i, ids in enumerate(_chunk(ids_to_add))]
+    return TracklistPlan(strategy=TracklistStrategy.suffix_diff, steps=[*removes, *inserts])
+
+
+def get_tracklist_plan(target: Sequence[_T], current: Sequence[_T]) -> TracklistPlan[_T]:
+    """Return the plan turning `current` into `target` in the fewest requests.
+
+    Ties are broken by the number of track IDs sent, then by order of
+    `TracklistStrategy`. The plan has no steps if `current` already is
+    `target`, even if it has duplicates, which only the replace plan
+    handles otherwise.
+    """
+    if list(target) == list(current):
+        return TracklistPlan(strategy=TracklistStrategy.suffix_diff, steps=[])
+    plans = [
+        get_suffix_diff_plan(target, current),
+        get_minimal_edits_plan(target, current),
+        get_reorders_plan(target, current),
+        get_replace_plan(target),
+    ]
+    return min((plan for plan in plans if plan is not None), key=lambda plan: (plan.request_count, plan.payload))
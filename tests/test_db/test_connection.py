@@ -23,3 +23,25 @@ def test_with_connection() -> None:
         assert isinstance(session, lofi.db.Session)
 
     foo()
+
+
+def test_get_lock_is_shared_by_session(session: lofi.db.Session) -> None:
+    assert lofi.db.get_lock(session) is lofi.db.get_lock(session)
+
+
+@pytest.mark.usefixtures("_patch_connect")
+def test_connect_commits_on_exit() -> None:
+    def insert_then_fail() -> None:
+        with lofi.db.connect() as session:
+            session.execute(text("insert into t values (2)"))
+            session.commit()
+            session.execute(text("insert into t values (3)"))
+            raise ValueError
+
+    with lofi.db.connect() as session:
+        session.execute(text("create table t(a int)"))
+        session.execute(text("insert into t values (1)"))
+    with pytest.raises(ValueError):  # noqa: PT011
+        insert_then_fail()
+    with lofi.db.connect() as session:
+        assert session.execute(text("select a from t order by a")).scalars().all() == [1, 2]
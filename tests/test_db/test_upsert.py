@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import datetime
+
+from sqlalchemy import func, select
+
+from lofi import db
+from tests.utils import AlbumGenerator, LabelGenerator, PlaylistGenerator, load_data
+
+
+def test_upsert_inserts_new_rows(session: db.Session) -> None:
+    rows = [{"id": str(i), "name": f"Artist {i}"} for i in range(3)]
+    assert db.upsert(session, db.Artist, rows) == len(rows)
+    assert session.execute(select(func.count()).select_from(db.Artist)).scalar_one() == len(rows)
+
+
+def test_upsert_updates_existing_rows(session: db.Session) -> None:
+    load_data(session, db.Artist(id="1", name="Old name", image_url_s="s"))
+    db.upsert(session, db.Artist, [{"id": "1", "name": "New name"}])
+    session.expire_all()
+    artist = session.get(db.Artist, "1")
+    assert artist is not None
+    assert artist.name == "New name"
+    assert artist.image_url_s == "s"
+
+
+def test_upsert_without_update_keeps_existing_rows(session: db.Session) -> None:
+    load_data(session, db.Artist(id="1", name="Old name"))
+    db.insert_ignore(session, db.Artist, [{"id": "1", "name": "New name"}, {"id": "2", "name": "Other"}])
+    session.expire_all()
+    assert session.execute(select(db.Artist.name).order_by(db.Artist.id)).scalars().all() == ["Old name", "Other"]
+
+
+def test_upsert_uses_attribute_names(
+    session: db.Session,
+    playlist_generator: PlaylistGenerator,
+    label_generator: LabelGenerator,
+    album_generator: AlbumGenerator,
+) -> None:
+    load_data(session, playlist := playlist_generator.generate())
+    load_data(session, label := label_generator.generate(playlist_id=playlist.id))
+    load_data(session, album := album_generator.generate(label_name=label.name))
+    today = datetime.date.today()
+    db.upsert(session, db.AlbumPopularity, [{"album_id": album.id, "date": today, "popularity": 1}])
+    db.upsert(session, db.AlbumPopularity, [{"album_id": album.id, "date": today, "popularity": 2}])
+    assert session.execute(select(db.AlbumPopularity.popularity)).scalars().all() == [2]
+
+
+def test_upsert_with_no_rows_does_nothing(session: db.Session) -> None:
+    assert db.upsert(session, db.Artist, []) == 0
@@ -1,10 +1,12 @@
+from unittest.mock import Mock
+
 import pytest
 
 import lofi.etl.main
 from lofi import db
 from lofi.etl.errors import LabelAlreadyExistsError
-from lofi.etl.main import add_label
-from lofi.spotify_api import Playlist
+from lofi.etl.main import add_label, add_labels
+from lofi.spotify_api import Playlist, SpotifyAPIClient
 from tests.utils import LabelGenerator, PlaylistGenerator, load_data_output
 
 from .conftest import get_spotify_api_client_patch
@@ -58,3 +60,24 @@ def test_add_label(session: db.Session, label_generator: LabelGenerator) -> None
     assert session.get(db.Label, label.name) is None
     add_label(session, label.name)
     assert session.get(db.Label, label.name) is not None
+
+
+def test_add_labels_lists_user_playlists_once(session: db.Session, label_generator: LabelGenerator) -> None:
+    label_names = [label_generator.generate().name for _ in range(3)]
+    api = SpotifyAPIClient(session, user_id="foo")
+    api.api.user_playlists = Mock(return_value={"items": []})
+    api.api.user_playlist_create = Mock(
+        side_effect=lambda user_id, name, **kwargs: {  # noqa: ARG005
+            "id": f"{name} playlist",
+            "images": [],
+            "name": name,
+            "owner": {"id": user_id, "display_name": user_id},
+            "snapshot_id": "",
+        },
+    )
+    add_labels(session, label_names, api)
+    api.api.user_playlists.assert_called_once()
+    for label_name in label_names:
+        label = session.get(db.Label, label_name)
+        assert label is not None
+        assert label.playlist_id == f"{label_name} playlist"
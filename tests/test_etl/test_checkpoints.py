@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import pytest
+
+from lofi import db
+from lofi.etl.checkpoints import Checkpoints
+
+
+def test_complete_records_stage(session: db.Session) -> None:
+    checkpoints = Checkpoints.start(session)
+    checkpoints.complete("collect_label", "foo")
+    assert checkpoints.is_completed("collect_label", "foo")
+    assert not checkpoints.is_completed("collect_label", "bar")
+    assert not checkpoints.is_completed("popularity")
+
+
+def test_complete_commits_session(session: db.Session) -> None:
+    checkpoints = Checkpoints.start(session)
+    checkpoints.complete("popularity")
+    session.rollback()
+    assert session.get(db.EtlCheckpoint, (checkpoints.run.id, "popularity", "")) is not None
+
+
+@pytest.mark.parametrize("resume", [False, True])
+def test_unfinished_run_is_resumed_only_if_requested(session: db.Session, *, resume: bool) -> None:
+    previous = Checkpoints.start(session)
+    previous.complete("popularity")
+    checkpoints = Checkpoints.start(session, resume=resume)
+    assert (checkpoints.run.id == previous.run.id) is resume
+    assert checkpoints.is_completed("popularity") is resume
+
+
+def test_finished_run_is_not_resumed(session: db.Session) -> None:
+    previous = Checkpoints.start(session)
+    previous.complete("popularity")
+    previous.finish()
+    checkpoints = Checkpoints.start(session, resume=True)
+    assert checkpoints.run.id != previous.run.id
+    assert not checkpoints.is_completed("popularity")
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import datetime
+from typing import TYPE_CHECKING, cast
+
+import pytest
+
+from lofi import db
+from lofi.etl.main import collect_indie_albums, is_discography_unchanged, upload_label_albums
+from lofi.spotify_api import Album, SpotifyAPIClient, Track
+from lofi.spotify_api.models import ArtistAlbum, Page
+from tests.utils import LabelGenerator, PlaylistGenerator, load_data_output
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Sequence
+
+
+@pytest.fixture
+@load_data_output
+def playlist(session: db.Session, playlist_generator: PlaylistGenerator) -> db.Playlist:  # noqa: ARG001
+    return playlist_generator.generate()
+
+
+@pytest.fixture
+@load_data_output
+def label(session: db.Session, playlist: db.Playlist, label_generator: LabelGenerator) -> db.Label:  # noqa: ARG001
+    return label_generator.generate(name="Foo Records", playlist_id=playlist.id, is_indie=False)
+
+
+def get_album(album_id: str, label_name: str, release_date: str = "2024-01-01") -> Album:
+    return Album.model_validate(
+        {
+            "id": album_id,
+            "name": f"Album {album_id}",
+            "album_type": "single",
+            "artists": [{"id": "a1", "name": "Artist 1"}],
+            "release_date": release_date,
+            "images": [],
+            "label": label_name,
+            "popularity": 10,
+            "tracks": {"items": [{"id": f"{album_id}-t1", "name": "Track 1"}]},
+        },
+    )
+
+
+def get_track(album: Album) -> Track:
+    return Track.model_validate(
+        {
+            "id": f"{album.id}-t1",
+            "name": "Track 1",
+            "album": {"id": album.id, "name": album.name},
+            "artists": [{"id": "a1", "name": "Artist 1"}],
+            "external_ids": {"isrc": f"ISRC {album.id}"},
+            "popularity": 20,
+            "track_number": 1,
+        },
+    )
+
+
+def get_page(*release_dates: str, total: int | None = None) -> Page[ArtistAlbum]:
+    items = [{"id": str(i), "name": "", "release_date": d, "total_tracks": 1} for i, d in enumerate(release_dates)]
+    return Page[ArtistAlbum].model_validate({"items": items, "total": len(items) if total is None else total})
+
+
+class FakeSpotifyAPIClient:
+    def __init__(self, albums: Sequence[Album]) -> None:
+        self.albums = {album.id: album for album in albums}
+        self.crawled_artist_ids: list[str] = []
+        self.fetched_album_ids: list[str] = []
+
+    def artist_albums(
+        self,
+        artist_id: str,
+        *,
+        skip_if: Callable[[Page[ArtistAlbum]], bool] | None = None,
+    ) -> Page[ArtistAlbum] | None:
+        page = Page[ArtistAlbum].model_validate(
+            {
+                "items": [album.model_dump() | {"total_tracks": 1} for album in self.albums.values()],
+                "total": len(self.albums),
+            },
+        )
+        if skip_if is not None and skip_if(page):
+            return None
+        self.crawled_artist_ids.append(artist_id)
+        return page
+
+    def iter_albums(
+        self,
+        ids: Sequence[str],
+        *,
+        with_all_tracks: bool = False,  # noqa: ARG002
+        use_cache: bool = True,
+    ) -> Iterator[list[Album]]:
+        assert not use_cache
+        self.fetched_album_ids.extend(ids)
+        yield [self.albums[album_id] for album_id in ids]
+
+    def map_concurrently(self, func: Callable[[str], object], items: Sequence[str]) -> list[object]:
+        return list(map(func, items))
+
+    def tracks(self, ids: Sequence[str], *, use_cache: bool = True) -> list[Track]:
+        assert not use_cache
+        return [get_track(self.albums[track_id.removesuffix("-t1")]) for track_id in ids]
+
+
+def test_collect_indie_albums_skips_unchanged_artists(session: db.Session, label: db.Label) -> None:
+    label_album = get_album("1", label.name)
+    upload_label_albums(session, [label_album], [get_track(label_album)], is_lofi=True)
+    fake = FakeSpotifyAPIClient([label_album, get_album("2", "Indie Records", "2025-03-01")])
+    api = cast(SpotifyAPIClient, fake)
+
+    collect_indie_albums(api, session, [label])
+    assert fake.fetched_album_ids == ["2"]
+    indie_label = session.get(db.Label, "Indie Records")
+    assert indie_label is not None
+    assert indie_label.is_indie
+    crawl = session.get(db.ArtistCrawl, "a1")
+    assert crawl is not None
+    assert (crawl.album_count, crawl.latest_release_date) == (2, datetime.date(2025, 3, 1))
+
+    collect_indie_albums(api, session, [label])
+    assert fake.crawled_artist_ids == ["a1"]
+    assert fake.fetched_album_ids == ["2"]
+
+    fake.albums["3"] = get_album("3", "Indie Records", "2025-06-01")
+    collect_indie_albums(api, session, [label])
+    assert fake.crawled_artist_ids == ["a1", "a1"]
+    assert fake.fetched_album_ids == ["2", "3"]
+    assert session.get(db.Album, "3") is not None
+
+
+@pytest.mark.parametrize(
+    ("watermark", "first_page", "expected"),
+    [
+        (None, get_page(), False),
+        ((0, None), get_page(), True),
+        ((0, None), get_page("2020"), False),
+        ((2, datetime.date(2021, 1, 1)), get_page("2020", "2021"), True),
+        ((2, datetime.date(2021, 1, 1)), get_page("2020", "2021", total=3), False),
+        ((2, datetime.date(2020, 1, 1)), get_page("2020", "2021"), False),
+    ],
+)
+def test_is_discography_unchanged(
+    watermark: tuple[int, datetime.date | None] | None,
+    first_page: Page[ArtistAlbum],
+    expected: bool,  # noqa: FBT001
+) -> None:
+    assert is_discography_unchanged(watermark, first_page) is expected
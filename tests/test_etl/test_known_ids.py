@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import random
+from typing import TYPE_CHECKING
+
+import pytest
+
+from lofi.etl.known_ids import BASE62_ALPHABET, IdIndex, get_known_ids, pack_id
+from lofi.etl.main import upload_albums, upload_objects_artists
+from tests.utils import LabelGenerator, PlaylistGenerator, load_data_output
+
+from .test_upload import get_album
+
+if TYPE_CHECKING:
+    from lofi import db
+
+
+def get_random_id(rng: random.Random) -> str:
+    return "".join(rng.choices(BASE62_ALPHABET, k=22))
+
+
+@pytest.fixture
+@load_data_output
+def playlist(session: db.Session, playlist_generator: PlaylistGenerator) -> db.Playlist:  # noqa: ARG001
+    return playlist_generator.generate()
+
+
+@pytest.fixture
+@load_data_output
+def label(session: db.Session, playlist: db.Playlist, label_generator: LabelGenerator) -> db.Label:  # noqa: ARG001
+    return label_generator.generate(playlist_id=playlist.id, is_indie=False)
+
+
+@pytest.mark.parametrize(
+    ("spotify_id", "expected"),
+    [
+        ("0" * 22, 0),
+        ("0" * 21 + "Z", 61),
+        ("0" * 20 + "10", 62),
+        ("foo", None),
+        ("0" * 21 + "-", None),
+        ("Z" * 22, None),
+    ],
+)
+def test_pack_id(spotify_id: str, expected: int | None) -> None:
+    assert pack_id(spotify_id) == expected
+
+
+def test_id_index_contains_added_ids() -> None:
+    rng = random.Random(0)  # noqa: S311
+    ids = [get_random_id(rng) for _ in range(10_000)]
+    index = IdIndex(ids[:5_000])
+    index.update(ids[5_000:9_000])
+    index.update(ids[:100])
+    index.add("foo")
+    assert len(index) == 9_001  # noqa: PLR2004
+    assert all(spotify_id in index for spotify_id in ids[:9_000])
+    assert not any(spotify_id in index for spotify_id in ids[9_000:])
+    assert "foo" in index
+    assert "bar" not in index
+
+
+def test_known_ids_are_loaded_once_and_updated_by_uploaders(session: db.Session, label: db.Label) -> None:
+    known_ids = get_known_ids(session)
+    assert get_known_ids(session) is known_ids
+    assert "1" not in known_ids.albums
+    upload_objects_artists(session, [album := get_album("1", label.name)])
+    upload_albums(session, [album])
+    assert "1" in known_ids.albums
+    assert "a1" in known_ids.artists
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
 import datetime
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, cast
 
 import pytest
-from sqlalchemy import select
+from sqlalchemy import select, update
 
 from lofi import db
-from lofi.etl.main import get_new_lofi_tracklist
+from lofi.etl.main import get_new_lofi_tracklist, update_new_lofi, update_playlist
+from lofi.etl.snapshots import get_snapshot
+from lofi.spotify_api import Playlist, SpotifyAPIClient
 from tests.utils import (
     AlbumGenerator,
     LabelGenerator,
@@ -19,7 +21,7 @@ from tests.utils import (
 )
 
 if TYPE_CHECKING:
-    from collections.abc import Iterator
+    from collections.abc import Iterator, Sequence
 
 
 @pytest.fixture
@@ -137,3 +139,56 @@ def test_get_new_lofi_tracklist_returns_all_recent_tracks(
 def test_get_new_lofi_tracklist_is_ordered_by_decreasing_popularity(new_lofi_tracklist: list[db.Track]) -> None:
     popularities = [track.popularity[-1].popularity for track in new_lofi_tracklist]
     assert popularities == sorted(popularities, reverse=True)
+
+
+class FakeSpotifyAPIClient:
+    """Client whose only method is `set_playlist_tracks`, so that any other request fails."""
+
+    def __init__(self, snapshot_id: str | None) -> None:
+        self.snapshot_id = snapshot_id
+        self.tracklists: dict[str, list[str]] = {}
+
+    def set_playlist_tracks(
+        self,
+        playlist_id: str,
+        ids: Sequence[str],
+        current_ids: Sequence[str] | None = None,  # noqa: ARG002
+    ) -> str | None:
+        self.tracklists[playlist_id] = list(ids)
+        return self.snapshot_id
+
+
+def test_update_new_lofi_uploads_snapshot_returned_by_write(
+    session: db.Session,
+    monkeypatch: pytest.MonkeyPatch,
+    new_lofi_tracklist: list[db.Track],
+) -> None:
+    monkeypatch.setenv("NEW_LOFI_PLAYLIST_ID", playlist_id := "new-lofi")
+    fake = FakeSpotifyAPIClient("new-lofi-snapshot")
+    update_new_lofi(cast(SpotifyAPIClient, fake), session)
+    assert get_snapshot(session, "new-lofi-snapshot") == fake.tracklists[playlist_id]
+    assert set(fake.tracklists[playlist_id]) == {track.id for track in new_lofi_tracklist}
+
+
+@pytest.mark.parametrize(("returned_snapshot_id", "expected_snapshot_id"), [("new", "new"), (None, "current")])
+def test_update_playlist_uploads_snapshot_without_reading_playlist(
+    session: db.Session,
+    lofi_label: db.Label,
+    tracks: list[db.Track],  # noqa: ARG001
+    returned_snapshot_id: str | None,
+    expected_snapshot_id: str,
+) -> None:
+    session.execute(update(db.Track).values(is_lofi=True))
+    playlist = Playlist.model_validate(
+        {
+            "id": lofi_label.playlist_id,
+            "images": [],
+            "name": "",
+            "owner": {"id": "", "display_name": ""},
+            "snapshot_id": "current",
+        },
+    )
+    fake = FakeSpotifyAPIClient(returned_snapshot_id)
+    update_playlist(cast(SpotifyAPIClient, fake), session, lofi_label, playlist)
+    assert fake.tracklists[lofi_label.playlist_id]
+    assert get_snapshot(session, expected_snapshot_id) == fake.tracklists[lofi_label.playlist_id]
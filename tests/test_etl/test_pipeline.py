@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING
+from unittest.mock import Mock
+
+import pytest
+from sqlalchemy import select
+
+import lofi.etl.main
+from lofi import db
+from lofi.etl.checkpoints import Checkpoints
+from lofi.etl.main import collect_labels_albums_pipelined, iter_label_albums
+from lofi.etl.pipeline import DBWriter
+from lofi.spotify_api import SearchAlbum
+from tests.utils import LabelGenerator, PlaylistGenerator, load_data_output
+
+from .test_upload import get_album, get_track
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from lofi.spotify_api import Album, SpotifyAPIClient, Track
+
+
+@pytest.fixture
+@load_data_output
+def playlist(session: db.Session, playlist_generator: PlaylistGenerator) -> db.Playlist:  # noqa: ARG001
+    return playlist_generator.generate()
+
+
+@pytest.fixture
+@load_data_output
+def label(session: db.Session, playlist: db.Playlist, label_generator: LabelGenerator) -> db.Label:  # noqa: ARG001
+    return label_generator.generate(playlist_id=playlist.id, is_indie=False)
+
+
+def test_writes_are_applied_in_order_on_writer_thread(session: db.Session) -> None:
+    applied: list[tuple[int, str]] = []
+    with DBWriter(session, maxsize=2) as writer:
+        for i in range(5):
+            writer.submit(lambda i: applied.append((i, threading.current_thread().name)), i)
+    assert applied == [(i, "lofi-db-writer") for i in range(5)]
+    assert writer.writes == len(applied)
+    assert 0 <= writer.max_queue_depth <= 2  # noqa: PLR2004
+    assert writer.max_lag_seconds >= 0
+
+
+def test_failed_write_discards_following_writes(session: db.Session) -> None:
+    write = Mock(side_effect=[ValueError, None])
+    writer = DBWriter(session)
+    writer.submit(write)
+    writer.submit(write)
+    with pytest.raises(ValueError):  # noqa: PT011
+        writer.close()
+    write.assert_called_once()
+    with pytest.raises(ValueError):  # noqa: PT011
+        writer.submit(write)
+
+
+def test_collect_labels_albums_pipelined(
+    session: db.Session,
+    label: db.Label,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def iter_label_albums(
+        api: SpotifyAPIClient,  # noqa: ARG001
+        label_name: str,
+        search_results: list[SearchAlbum],  # noqa: ARG001
+        excluded_album_ids: set[str],
+    ) -> Iterator[tuple[list[Album], list[Track]]]:
+        for album_id in ["1", "2", "1"]:
+            if album_id not in excluded_album_ids:
+                yield [get_album(album_id, label_name)], [get_track(f"{album_id}-t1", album_id)]
+
+    monkeypatch.setattr(lofi.etl.main, "iter_label_albums", iter_label_albums)
+    checkpoints = Checkpoints.start(session)
+    collect_labels_albums_pipelined(Mock(), session, [label], checkpoints, {label.name: []})
+    assert set(session.execute(select(db.Album.id)).scalars()) == {"1", "2"}
+    assert set(session.execute(select(db.Track.id)).scalars()) == {"1-t1", "2-t1"}
+    assert checkpoints.is_completed("collect_label", label.name)
+
+
+def test_iter_label_albums_fetches_tracks_of_each_window() -> None:
+    api = Mock()
+    api.iter_albums.return_value = iter([[get_album("1", "foo"), get_album("2", "bar")], [get_album("3", "foo")]])
+    api.tracks.side_effect = lambda ids, **_: [get_track(track_id, track_id.split("-")[0]) for track_id in ids]
+    search_results = [
+        SearchAlbum.model_validate({"id": i, "name": "", "album_type": "single", "artists": [], "release_date": "2020"})
+        for i in "1234"
+    ]
+    windows = list(iter_label_albums(api, "foo", search_results, {"4"}))
+    assert [[album.id for album in albums] for albums, _ in windows] == [["1"], ["3"]]
+    assert [[track.id for track in tracks] for _, tracks in windows] == [["1-t1"], ["3-t1"]]
+    assert sorted(api.iter_albums.call_args.args[0]) == ["1", "2", "3"]
+    assert api.iter_albums.call_args.kwargs["use_cache"] is False
+    assert all(call.kwargs["use_cache"] is False for call in api.tracks.call_args_list)
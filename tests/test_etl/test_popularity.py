@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import datetime
+from typing import TYPE_CHECKING, cast
+
+import pytest
+from sqlalchemy import select, update
+
+from lofi import db
+from lofi.etl.main import collect_tracks_popularity, upload_label_albums
+from lofi.etl.popularity import get_due_ids, get_refresh_interval, get_request_count, schedule_refreshes
+from lofi.spotify_api import Album, SpotifyAPIClient, Track
+from tests.utils import LabelGenerator, PlaylistGenerator, load_data_output
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+
+
+@pytest.fixture
+@load_data_output
+def playlist(session: db.Session, playlist_generator: PlaylistGenerator) -> db.Playlist:  # noqa: ARG001
+    return playlist_generator.generate()
+
+
+@pytest.fixture
+@load_data_output
+def label(session: db.Session, playlist: db.Playlist, label_generator: LabelGenerator) -> db.Label:  # noqa: ARG001
+    return label_generator.generate(playlist_id=playlist.id, is_indie=False)
+
+
+def get_album(album_id: str, label_name: str, release_date: datetime.date, n_tracks: int = 1) -> Album:
+    return Album.model_validate(
+        {
+            "id": album_id,
+            "name": f"Album {album_id}",
+            "album_type": "single",
+            "artists": [],
+            "release_date": release_date.isoformat(),
+            "images": [],
+            "label": label_name,
+            "popularity": 10,
+            "tracks": {"items": [{"id": f"{album_id}-t{i}", "name": ""} for i in range(n_tracks)]},
+        },
+    )
+
+
+def get_tracks(album: Album, popularity: int = 20) -> list[Track]:
+    return [
+        Track.model_validate(
+            {
+                "id": track.id,
+                "name": "",
+                "album": {"id": album.id, "name": album.name},
+                "artists": [],
+                "external_ids": {"isrc": track.id},
+                "popularity": popularity,
+                "track_number": 1,
+            },
+        )
+        for track in album.tracks.items
+    ]
+
+
+class FakeSpotifyAPIClient:
+    def __init__(self, tracks: Sequence[Track]) -> None:
+        self.tracks = {track.id: track for track in tracks}
+        self.windows: list[list[str]] = []
+
+    def iter_tracks(self, ids: Sequence[str], *, use_cache: bool = True) -> Iterator[list[Track]]:
+        assert not use_cache
+        for i in range(0, len(ids), 2):
+            self.windows.append(list(ids[i : i + 2]))
+            yield [self.tracks[track_id] for track_id in ids[i : i + 2]]
+
+
+def make_all_due(session: db.Session) -> None:
+    session.execute(update(db.PopularityRefresh).values(due_on=datetime.date.today()))
+
+
+@pytest.mark.parametrize(
+    ("release_age_days", "volatility", "is_playlisted", "expected"),
+    [
+        (0, 0, False, 1),
+        (300, 0, False, 11),
+        (300, 1, False, 6),
+        (300, 0, True, 2),
+        (10_000, 0, False, 60),
+    ],
+)
+def test_get_refresh_interval(
+    release_age_days: int,
+    volatility: float,
+    is_playlisted: bool,  # noqa: FBT001
+    expected: int,
+) -> None:
+    assert get_refresh_interval(release_age_days, volatility, is_playlisted=is_playlisted) == expected
+
+
+def test_get_request_count() -> None:
+    assert get_request_count({db.PopularityKind.album: ["a"] * 21, db.PopularityKind.track: ["t"] * 50}) == 3  # noqa: PLR2004
+
+
+def test_uploads_schedule_new_releases_before_old_ones(session: db.Session, label: db.Label) -> None:
+    today = datetime.date.today()
+    new_album = get_album("new", label.name, today)
+    old_album = get_album("old", label.name, today - datetime.timedelta(days=3_000))
+    upload_label_albums(session, [new_album, old_album], get_tracks(new_album) + get_tracks(old_album), is_lofi=True)
+    new_refresh = session.get(db.PopularityRefresh, (db.PopularityKind.track, "new-t0"))
+    old_refresh = session.get(db.PopularityRefresh, (db.PopularityKind.track, "old-t0"))
+    assert new_refresh is not None
+    assert old_refresh is not None
+    assert new_refresh.due_on < old_refresh.due_on
+    assert get_due_ids(session, budget=10) == {db.PopularityKind.album: [], db.PopularityKind.track: []}
+
+
+def test_schedule_refreshes_tracks_volatility(session: db.Session, label: db.Label) -> None:
+    album = get_album("a", label.name, datetime.date(2020, 1, 1))
+    upload_label_albums(session, [album], get_tracks(album, popularity=20), is_lofi=True)
+    schedule_refreshes(session, db.PopularityKind.track, {"a-t0": 30})
+    refresh = session.get(db.PopularityRefresh, (db.PopularityKind.track, "a-t0"))
+    assert refresh is not None
+    session.refresh(refresh)
+    assert refresh.popularity == 30  # noqa: PLR2004
+    assert refresh.volatility == pytest.approx(3)
+
+
+def test_get_due_ids_fills_budget_by_priority(session: db.Session, label: db.Label) -> None:
+    today = datetime.date.today()
+    albums = [get_album(str(i), label.name, today, n_tracks=30) for i in range(3)]
+    upload_label_albums(session, albums, [track for album in albums for track in get_tracks(album)], is_lofi=True)
+    make_all_due(session)
+    session.execute(
+        update(db.PopularityRefresh)
+        .where(db.PopularityRefresh.kind == db.PopularityKind.track, db.PopularityRefresh.id.like("0-%"))
+        .values(due_on=today - datetime.timedelta(days=1)),
+    )
+
+    ids = get_due_ids(session, budget=2)
+    assert get_request_count(ids) == 2  # noqa: PLR2004
+    assert {track_id for track_id in ids[db.PopularityKind.track] if track_id.startswith("0-")} == {
+        track.id for track in albums[0].tracks.items
+    }
+    assert len(ids[db.PopularityKind.track]) == 50  # noqa: PLR2004
+    assert ids[db.PopularityKind.album] == ["0", "1", "2"]
+
+
+def test_collect_tracks_popularity_uploads_each_window(session: db.Session, label: db.Label) -> None:
+    album = get_album("a", label.name, datetime.date(2020, 1, 1), n_tracks=3)
+    upload_label_albums(session, [album], get_tracks(album), is_lofi=True)
+    fake = FakeSpotifyAPIClient(get_tracks(album, popularity=30))
+    collect_tracks_popularity(cast(SpotifyAPIClient, fake), session, ["a-t0", "a-t1", "a-t2"])
+    assert fake.windows == [["a-t0", "a-t1"], ["a-t2"]]
+    refreshed = session.execute(
+        select(db.PopularityRefresh.id, db.PopularityRefresh.popularity).where(
+            db.PopularityRefresh.kind == db.PopularityKind.track,
+        ),
+    )
+    assert dict(refreshed.tuples().all()) == {"a-t0": 30, "a-t1": 30, "a-t2": 30}
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+from typing import TYPE_CHECKING, cast
+
+import pytest
+
+from lofi.etl.main import (
+    get_label_album_counts,
+    get_label_search_years,
+    get_missing_albums_queries,
+    get_year_ranges,
+    search_label_years,
+    search_labels_missing_albums,
+    search_year_range,
+    upload_label_searches,
+)
+from lofi.spotify_api import AsyncSpotifyAPIClient, SearchAlbum, SpotifyAPIClient
+from lofi.spotify_api.errors import SearchWindowSaturatedError
+from tests.utils import LabelGenerator, PlaylistGenerator, iterator_to_list, load_data_output
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from lofi import db
+
+
+@pytest.fixture
+@load_data_output
+def playlist(session: db.Session, playlist_generator: PlaylistGenerator) -> db.Playlist:  # noqa: ARG001
+    return playlist_generator.generate()
+
+
+@pytest.fixture
+@load_data_output
+@iterator_to_list
+def labels(session: db.Session, playlist: db.Playlist, label_generator: LabelGenerator) -> Iterator[db.Label]:  # noqa: ARG001
+    for name in ("Foo Records", "Bar"):
+        yield label_generator.generate(name=name, playlist_id=playlist.id)
+
+
+def get_search_album(album_id: str, release_date: str = "2020") -> SearchAlbum:
+    return SearchAlbum.model_validate(
+        {"id": album_id, "name": album_id, "album_type": "single", "artists": [], "release_date": release_date},
+    )
+
+
+class FakeAsyncSpotifyAPIClient:
+    async def search_albums(self, q: str, *, raise_if_saturated: bool = False) -> list[SearchAlbum]:  # noqa: ARG002
+        await asyncio.sleep(0)
+        return [get_search_album(q)]
+
+
+class FakeSaturatedSpotifyAPIClient:
+    """Client whose searches saturate once they span more than `max_years` years."""
+
+    def __init__(self, max_years: int) -> None:
+        self.max_years = max_years
+        self.queries: list[str] = []
+
+    def search_albums(self, q: str, *, raise_if_saturated: bool = False) -> list[SearchAlbum]:
+        self.queries.append(q)
+        years = q.split()[0].removeprefix("year:").split("-")
+        if raise_if_saturated and int(years[-1]) - int(years[0]) + 1 > self.max_years:
+            raise SearchWindowSaturatedError(q, 5_000)
+        return [get_search_album(str(year)) for year in range(int(years[0]), int(years[-1]) + 1)]
+
+
+class FakeLabelSpotifyAPIClient:
+    """Client finding `albums_per_year` albums each year, whose searches saturate beyond 1,000 results."""
+
+    def __init__(self, albums_per_year: int) -> None:
+        self.albums_per_year = albums_per_year
+        self.queries: list[str] = []
+
+    def search_albums(self, q: str, *, raise_if_saturated: bool = False) -> list[SearchAlbum]:
+        self.queries.append(q)
+        years = q.split()[0].removeprefix("year:").split("-")
+        first_year, last_year = int(years[0]), int(years[-1])
+        if raise_if_saturated and (last_year - first_year + 1) * self.albums_per_year > 1_000:  # noqa: PLR2004
+            raise SearchWindowSaturatedError(q, 5_000)
+        albums = [
+            get_search_album(f"{year}-{i}", str(year))
+            for year in range(first_year, last_year + 1)
+            for i in range(self.albums_per_year)
+        ]
+        return albums[:1_000]
+
+
+def test_get_missing_albums_queries(labels: list[db.Label]) -> None:
+    this_year = datetime.date.today().year
+    assert get_missing_albums_queries(labels[0]) == [f"year:2015-{this_year} label:Foo label:Records"]
+    assert get_missing_albums_queries(labels[1], [2016, 2018, 2019]) == [
+        "year:2016 label:Bar",
+        "year:2018-2019 label:Bar",
+    ]
+
+
+@pytest.mark.parametrize(
+    ("years", "expected"),
+    [([], []), ([2020], [(2020, 2020)]), ([2023, 2020, 2021, 2025, 2024], [(2020, 2021), (2023, 2025)])],
+)
+def test_get_year_ranges(years: list[int], expected: list[tuple[int, int]]) -> None:
+    assert get_year_ranges(years) == expected
+
+
+@pytest.mark.parametrize(
+    ("album_counts", "expected"),
+    [
+        ({}, [(2020, 2025)]),
+        ({2020: 400, 2021: 400, 2022: 400}, [(2020, 2021), (2022, 2025)]),
+        ({2021: 1_000}, [(2020, 2020), (2021, 2021), (2022, 2025)]),
+        ({year: 999 for year in range(2020, 2026)}, [(year, year) for year in range(2020, 2026)]),
+    ],
+)
+def test_get_year_ranges_splits_known_saturated_ranges(
+    album_counts: dict[int, int],
+    expected: list[tuple[int, int]],
+) -> None:
+    assert get_year_ranges(range(2020, 2026), album_counts) == expected
+
+
+@pytest.mark.parametrize(("max_years", "n_queries"), [(8, 1), (4, 3), (1, 15)])
+def test_search_year_range_splits_saturated_ranges(max_years: int, n_queries: int) -> None:
+    api = FakeSaturatedSpotifyAPIClient(max_years)
+    albums = search_year_range(cast(SpotifyAPIClient, api), "Foo", 2015, 2022)
+    assert [album.id for album in albums] == [str(year) for year in range(2015, 2023)]
+    assert len(api.queries) == n_queries
+
+
+def test_label_searches_reuse_album_counts(session: db.Session, labels: list[db.Label]) -> None:
+    api = FakeLabelSpotifyAPIClient(albums_per_year=300)
+    years = range(2015, 2023)
+    results = search_label_years(cast(SpotifyAPIClient, api), labels[0].name, years)
+    assert len(results) == 2_400  # noqa: PLR2004
+    assert len(api.queries) == 7  # noqa: PLR2004
+
+    upload_label_searches(session, labels[0].name, years, results)
+    session.refresh(labels[0])
+    album_counts = get_label_album_counts(labels[0])
+    assert album_counts == dict.fromkeys(years, 300)
+
+    api.queries.clear()
+    assert search_label_years(cast(SpotifyAPIClient, api), labels[0].name, years, album_counts) == results
+    assert api.queries == [
+        "year:2015-2017 label:Foo label:Records",
+        "year:2018-2020 label:Foo label:Records",
+        "year:2021-2022 label:Foo label:Records",
+    ]
+
+
+def test_search_labels_missing_albums_maps_results_to_labels(labels: list[db.Label]) -> None:
+    api = cast(AsyncSpotifyAPIClient, FakeAsyncSpotifyAPIClient())
+    results = asyncio.run(search_labels_missing_albums(api, labels))
+    assert list(results) == [label.name for label in labels]
+    for label in labels:
+        assert [album.id for album in results[label.name]] == get_missing_albums_queries(label)
+
+
+def test_upload_label_searches_freezes_settled_years(
+    session: db.Session,
+    labels: list[db.Label],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    this_year = datetime.date.today().year
+    monkeypatch.setenv("SEARCH_SETTLING_DAYS", "0")
+    upload_label_searches(session, labels[0].name, range(this_year - 2, this_year + 1), [])
+    session.refresh(labels[0])
+    frozen = {search.year: search.is_frozen for search in labels[0].searches}
+    assert frozen == {this_year - 2: True, this_year - 1: True, this_year: False}
+    assert get_label_search_years(labels[0]) == [
+        year for year in range(2015, this_year + 1) if year not in {this_year - 2, this_year - 1}
+    ]
+    assert get_label_search_years(labels[1]) == list(range(2015, this_year + 1))
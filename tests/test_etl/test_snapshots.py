@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+from sqlalchemy import select
+
+import lofi.etl.snapshots
+from lofi import db
+from lofi.etl.snapshots import (
+    apply_snapshot_operations,
+    get_snapshot,
+    get_snapshot_operations,
+    snapshot_is_in_db,
+    upload_snapshot,
+)
+from tests.utils import PlaylistGenerator, load_data_output
+
+
+@pytest.fixture
+@load_data_output
+def playlist(session: db.Session, playlist_generator: PlaylistGenerator) -> db.Playlist:  # noqa: ARG001
+    return playlist_generator.generate()
+
+
+def get_tracklist(n: int) -> list[str]:
+    return [f"t{i}" for i in range(n)]
+
+
+@pytest.mark.parametrize(
+    ("target", "expected_types"),
+    [
+        (["new", *get_tracklist(10)], ["insert"]),
+        (get_tracklist(10)[:4] + get_tracklist(10)[5:], ["delete"]),
+        (["t9", *get_tracklist(9)], ["move"]),
+        (get_tracklist(8), ["delete"]),
+        (get_tracklist(10), []),
+    ],
+)
+def test_get_snapshot_operations(target: list[str], expected_types: list[str]) -> None:
+    operations = get_snapshot_operations(get_tracklist(10), target)
+    assert [operation.type for operation in operations] == expected_types
+    assert apply_snapshot_operations(get_tracklist(10), operations) == target
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_snapshot_operations_roundtrip(seed: int) -> None:
+    rng = random.Random(seed)  # noqa: S311
+    base = [f"t{rng.randrange(30)}" for _ in range(rng.randrange(40))]
+    target = [f"t{rng.randrange(30)}" for _ in range(rng.randrange(40))]
+    assert apply_snapshot_operations(base, get_snapshot_operations(base, target)) == target
+
+
+def test_upload_snapshot_stores_deltas_between_keyframes(
+    session: db.Session,
+    playlist: db.Playlist,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(lofi.etl.snapshots, "KEYFRAME_INTERVAL", 3)
+    tracklists = [get_tracklist(10)]
+    tracklists.append(["new", *tracklists[-1][:-1]])
+    tracklists.append(tracklists[-1][1:])
+    tracklists.append(tracklists[-1][::-1])
+    for i, tracklist in enumerate(tracklists):
+        upload_snapshot(session, playlist.id, f"s{i}", tracklist)
+
+    full_snapshot_ids = set(session.execute(select(db.Snapshot.id)).scalars())
+    assert full_snapshot_ids == {"s0", "s3"}
+    assert set(session.execute(select(db.SnapshotDelta.id)).scalars()) == {"s1", "s2"}
+    for i, tracklist in enumerate(tracklists):
+        assert snapshot_is_in_db(session, f"s{i}")
+        assert get_snapshot(session, f"s{i}") == tracklist
+    track_ids = db.snapshot_track_ids(select(db.Playlist.id).scalar_subquery())
+    assert set(session.execute(track_ids).scalars()) == {"new", *get_tracklist(10)}
+
+
+def test_upload_snapshot_stores_large_changes_in_full(session: db.Session, playlist: db.Playlist) -> None:
+    upload_snapshot(session, playlist.id, "s0", get_tracklist(10))
+    upload_snapshot(session, playlist.id, "s1", get_tracklist(20)[10:])
+    assert set(session.execute(select(db.Snapshot.id)).scalars()) == {"s0", "s1"}
+    assert get_snapshot(session, "s1") == get_tracklist(20)[10:]
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, cast
+
+import pytest
+from spotipy import SpotifyException  # type: ignore[import-untyped]
+
+from lofi.etl.main import update_tracked_playlists
+from lofi.etl.snapshots import get_snapshot, get_snapshot_ids_in_db, upload_snapshot
+from lofi.spotify_api import Playlist, SpotifyAPIClient
+from lofi.spotify_api.models import PlaylistTrack
+from tests.utils import LabelGenerator, PlaylistGenerator, iterator_to_list, load_data_output
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Sequence
+
+    from lofi import db
+
+
+@pytest.fixture
+@load_data_output
+def playlist(session: db.Session, playlist_generator: PlaylistGenerator) -> db.Playlist:  # noqa: ARG001
+    return playlist_generator.generate()
+
+
+@pytest.fixture
+@load_data_output
+def label(session: db.Session, playlist: db.Playlist, label_generator: LabelGenerator) -> db.Label:  # noqa: ARG001
+    return label_generator.generate(playlist_id=playlist.id)
+
+
+@pytest.fixture
+@load_data_output
+@iterator_to_list
+def tracked_playlists(
+    session: db.Session,  # noqa: ARG001
+    label: db.Label,
+    playlist_generator: PlaylistGenerator,
+) -> Iterator[db.Playlist]:
+    for _ in range(3):
+        yield playlist_generator.generate(filter_for_label_name=label.name)
+
+
+class FakeSpotifyAPIClient:
+    def __init__(self, snapshot_ids: dict[str, str]) -> None:
+        self.snapshot_ids = snapshot_ids
+        self.fetched_tracklists: list[str] = []
+
+    def map_concurrently(self, func: Callable[[str], object], items: Sequence[str]) -> list[object]:
+        return list(map(func, items))
+
+    def playlist(self, playlist_id: str) -> Playlist:
+        if playlist_id not in self.snapshot_ids:
+            raise SpotifyException(404, -1, "Not found")
+        return Playlist.model_validate(
+            {
+                "id": playlist_id,
+                "images": [],
+                "name": "",
+                "owner": {"id": "", "display_name": ""},
+                "snapshot_id": self.snapshot_ids[playlist_id],
+            },
+        )
+
+    def playlist_tracks(self, playlist_id: str) -> list[PlaylistTrack]:
+        self.fetched_tracklists.append(playlist_id)
+        return [PlaylistTrack(id=f"{playlist_id}-t{i}") for i in range(3)]
+
+
+def test_update_tracked_playlists_fetches_changed_tracklists_only(
+    session: db.Session,
+    tracked_playlists: list[db.Playlist],
+) -> None:
+    # The last tracked playlist was deleted from Spotify
+    unchanged, changed, _ = tracked_playlists
+    upload_snapshot(session, unchanged.id, "unchanged-snapshot", ["t1"])
+    fake = FakeSpotifyAPIClient({unchanged.id: "unchanged-snapshot", changed.id: "new-snapshot"})
+    update_tracked_playlists(cast(SpotifyAPIClient, fake), session)
+    assert fake.fetched_tracklists == [changed.id]
+    assert get_snapshot(session, "new-snapshot") == [f"{changed.id}-t{i}" for i in range(3)]
+
+
+def test_get_snapshot_ids_in_db(session: db.Session, tracked_playlists: list[db.Playlist]) -> None:
+    upload_snapshot(session, tracked_playlists[0].id, "full", ["t1", "t2", "t3", "t4"])
+    upload_snapshot(session, tracked_playlists[0].id, "delta", ["t1", "t2", "t3"])
+    assert get_snapshot_ids_in_db(session, ["full", "delta", "missing"]) == {"full", "delta"}
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import datetime
+from typing import Any
+
+import pytest
+from sqlalchemy import select, update
+
+from lofi import db
+from lofi.etl.main import upload_albums, upload_objects_artists, upload_tracks, upload_tracks_popularity
+from lofi.etl.snapshots import upload_snapshot
+from lofi.spotify_api import Album, Track
+from tests.utils import LabelGenerator, PlaylistGenerator, load_data_output
+
+
+@pytest.fixture
+@load_data_output
+def playlist(session: db.Session, playlist_generator: PlaylistGenerator) -> db.Playlist:  # noqa: ARG001
+    return playlist_generator.generate()
+
+
+@pytest.fixture
+@load_data_output
+def label(session: db.Session, playlist: db.Playlist, label_generator: LabelGenerator) -> db.Label:  # noqa: ARG001
+    return label_generator.generate(playlist_id=playlist.id, is_indie=False)
+
+
+def get_album(album_id: str, label_name: str, popularity: int = 10) -> Album:
+    return Album.model_validate(
+        {
+            "id": album_id,
+            "name": f"Album {album_id}",
+            "album_type": "single",
+            "artists": [{"id": "a1", "name": "Artist 1"}, {"id": "a2", "name": "Artist 2"}],
+            "release_date": "2024-01-01",
+            "images": [],
+            "label": label_name,
+            "popularity": popularity,
+            "tracks": {"items": [{"id": f"{album_id}-t1", "name": "Track 1"}]},
+        },
+    )
+
+
+def get_track(track_id: str, album_id: str, popularity: int = 20) -> Track:
+    data: dict[str, Any] = {
+        "id": track_id,
+        "name": f"Track {track_id}",
+        "album": {"id": album_id, "name": f"Album {album_id}"},
+        "artists": [{"id": "a1", "name": "Artist 1"}],
+        "external_ids": {"isrc": f"ISRC {track_id}"},
+        "popularity": popularity,
+        "track_number": 1,
+    }
+    return Track.model_validate(data)
+
+
+def test_upload_albums_creates_missing_labels(session: db.Session, label: db.Label) -> None:
+    albums = [get_album("1", label.name), get_album("2", "Unknown label")]
+    upload_objects_artists(session, albums)
+    upload_albums(session, albums)
+    new_label = session.get(db.Label, "Unknown label")
+    assert new_label is not None
+    assert new_label.is_indie
+    assert session.get(db.Label, label.name) is not None
+    assert set(session.execute(select(db.Album.id)).scalars()) == {"1", "2"}
+
+
+def test_upload_albums_twice_updates_popularity(session: db.Session, label: db.Label) -> None:
+    upload_objects_artists(session, [album := get_album("1", label.name, popularity=10)])
+    upload_albums(session, [album])
+    upload_albums(session, [get_album("1", label.name, popularity=30)])
+    assert session.execute(select(db.AlbumPopularity.popularity)).scalars().all() == [30]
+    rels = session.execute(select(db.RelArtistAlbum.artist_id).order_by(db.RelArtistAlbum.artist_position))
+    assert rels.scalars().all() == ["a1", "a2"]
+
+
+def test_upload_tracks(session: db.Session, label: db.Label) -> None:
+    upload_objects_artists(session, [album := get_album("1", label.name)])
+    upload_albums(session, [album])
+    tracks = [get_track("t1", "1"), get_track("t2", "1")]
+    upload_tracks(session, tracks, is_lofi=False)
+    upload_tracks(session, tracks, is_lofi=False)
+    assert set(session.execute(select(db.Track.id).where(~db.Track.is_lofi)).scalars()) == {"t1", "t2"}
+    popularity = session.execute(select(db.TrackPopularity.date, db.TrackPopularity.popularity)).all()
+    assert set(popularity) == {(datetime.date.today(), 20)}
+    assert len(session.execute(select(db.RelArtistTrack)).all()) == len(tracks)
+
+
+@pytest.mark.parametrize("change_only", [True, False])
+def test_upload_tracks_popularity_forward_fills_unchanged_values(
+    session: db.Session,
+    label: db.Label,
+    monkeypatch: pytest.MonkeyPatch,
+    change_only: bool,  # noqa: FBT001
+) -> None:
+    monkeypatch.setenv("POPULARITY_CHANGE_ONLY", "1" if change_only else "0")
+    today = datetime.date.today()
+    yesterday = today - datetime.timedelta(days=1)
+    upload_objects_artists(session, [album := get_album("1", label.name)])
+    upload_albums(session, [album])
+    upload_tracks(session, [get_track("t1", "1"), get_track("t2", "1")], is_lofi=True)
+    session.execute(update(db.TrackPopularity).values(date=yesterday))
+
+    upload_tracks_popularity(session, [get_track("t1", "1"), get_track("t2", "1", popularity=25)])
+    rows = session.execute(select(db.TrackPopularity.track_id, db.TrackPopularity.date)).all()
+    expected_rows = {("t1", yesterday), ("t2", yesterday), ("t2", today)}
+    assert set(rows) == (expected_rows if change_only else expected_rows | {("t1", today)})
+    for as_of, expected in (today, {("t1", 20), ("t2", 25)}), (yesterday, {("t1", 20), ("t2", 20)}):
+        popularity = db.track_popularity_as_of(as_of=as_of)
+        assert set(session.execute(select(popularity.c.track_id, popularity.c.popularity)).tuples()) == expected
+
+
+def test_upload_snapshot(session: db.Session, playlist: db.Playlist) -> None:
+    upload_snapshot(session, playlist.id, "snapshot", ["t1", "t2", "t3"])
+    upload_snapshot(session, playlist.id, "snapshot", ["t4"])
+    sql = select(db.Snapshot.track_id).where(db.Snapshot.id == "snapshot").order_by(db.Snapshot.position)
+    assert session.execute(sql).scalars().all() == ["t1", "t2", "t3"]
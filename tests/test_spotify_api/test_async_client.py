@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+import httpx
+import pytest
+from spotipy import SpotifyException  # type: ignore[import-untyped]
+
+from lofi.spotify_api import AsyncSpotifyAPIClient
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine
+
+    from lofi import db
+
+TOTAL_SEARCH_RESULTS = 1234
+
+
+def get_page(request: httpx.Request, items: list[Any], total: int | None = None) -> dict[str, Any]:
+    offset = int(request.url.params.get("offset", 0))
+    limit = int(request.url.params["limit"])
+    total = len(items) if total is None else total
+    return {
+        "href": str(request.url),
+        "items": items[offset : offset + limit],
+        "limit": limit,
+        "next": str(request.url.copy_set_param("offset", offset + limit)) if offset + limit < total else None,
+        "offset": offset,
+        "total": total,
+    }
+
+
+def get_search_album(i: int) -> dict[str, Any]:
+    return {"id": str(i), "name": "", "album_type": "single", "artists": [], "release_date": "2020"}
+
+
+def handle_request(request: httpx.Request) -> httpx.Response:
+    path = request.url.path.removeprefix("/v1/")
+    if path == "search":
+        albums = [get_search_album(i) for i in range(TOTAL_SEARCH_RESULTS)]
+        return httpx.Response(200, json={"albums": get_page(request, albums)})
+    if path == "playlists/missing":
+        return httpx.Response(404, json={"error": {"message": "Not found"}})
+    if path.startswith("playlists/") and path.endswith("/tracks"):
+        items = [{"track": {"id": str(i)}} for i in range(250)] + [{"track": None}]
+        return httpx.Response(200, json=get_page(request, items))
+    if path == "tracks/":
+        ids = request.url.params["ids"].split(",")
+        return httpx.Response(200, json={"tracks": [None if i == "missing" else get_track(i) for i in ids]})
+    raise NotImplementedError(path)
+
+
+def get_track(track_id: str) -> dict[str, Any]:
+    return {
+        "id": track_id,
+        "name": "",
+        "album": {"id": "", "name": ""},
+        "artists": [],
+        "external_ids": {"isrc": ""},
+        "popularity": 0,
+        "track_number": 0,
+    }
+
+
+@pytest.fixture
+def run_with_client(
+    session: db.Session,
+) -> Callable[[Callable[[AsyncSpotifyAPIClient], Coroutine[Any, Any, Any]]], Any]:
+    def run(func: Callable[[AsyncSpotifyAPIClient], Coroutine[Any, Any, Any]]) -> Any:  # noqa: ANN401
+        async def main() -> Any:  # noqa: ANN401
+            transport = httpx.MockTransport(handle_request)
+            async with AsyncSpotifyAPIClient(session, user_id="foo", max_concurrency=4, transport=transport) as api:
+                with patch.object(api, "_auth_headers", return_value={}):
+                    return await func(api)
+
+        return asyncio.run(main())
+
+    return run
+
+
+def test_search_albums_respects_max_offset(run_with_client: Callable[..., Any]) -> None:
+    albums = run_with_client(lambda api: api.search_albums("foo"))
+    assert [album.id for album in albums] == [str(i) for i in range(1000)]
+
+
+def test_playlist_tracks_returns_all_tracks_in_order(run_with_client: Callable[..., Any]) -> None:
+    tracks = run_with_client(lambda api: api.playlist_tracks("foo"))
+    assert [track.id for track in tracks] == [str(i) for i in range(250)]
+
+
+def test_tracks_skips_missing_tracks(run_with_client: Callable[..., Any]) -> None:
+    ids = [str(i) for i in range(120)]
+    tracks = run_with_client(lambda api: api.tracks([*ids, "missing"]))
+    assert [track.id for track in tracks] == ids
+
+
+def test_missing_playlist_raises_spotify_exception(run_with_client: Callable[..., Any]) -> None:
+    with pytest.raises(SpotifyException) as exc_info:
+        run_with_client(lambda api: api.playlist("missing"))
+    assert exc_info.value.http_status == httpx.codes.NOT_FOUND
+
+
+def test_client_outside_context_raises_error(session: db.Session) -> None:
+    with pytest.raises(RuntimeError):
+        _ = AsyncSpotifyAPIClient(session, user_id="foo").http
+
+
+def test_access_token_is_got_off_the_event_loop(session: db.Session) -> None:
+    thread_ids = []
+
+    def get_access_token(*, as_dict: bool) -> str:  # noqa: ARG001
+        thread_ids.append(threading.get_ident())
+        return "token"
+
+    async def main() -> dict[str, str]:
+        api = AsyncSpotifyAPIClient(session, user_id="foo")
+        with patch.object(api.auth_manager, "get_access_token", get_access_token):
+            return await api._auth_headers()  # noqa: SLF001
+
+    assert asyncio.run(main()) == {"Authorization": "Bearer token"}
+    assert thread_ids != [threading.get_ident()]
@@ -1,7 +1,11 @@
+import threading
+import time
+from unittest.mock import patch
+
 import pytest
 
 from lofi import db
-from lofi.spotify_api.cache_handler import CacheHandler
+from lofi.spotify_api.cache_handler import REFRESH_MARGIN_SECONDS, CacheHandler, SingleFlightSpotifyOAuth
 from lofi.spotify_api.token import Token
 from tests.utils import load_data
 
@@ -81,3 +85,59 @@ def test_get_cached_token_uses_memory_cache_when_save_to_db_is_false(
     cache_handler.save_token_to_cache(token.model_dump())
     assert cache_handler.token_cache == token.model_dump()
     assert cache_handler.get_cached_token() == token.model_dump()
+
+
+def test_get_cached_token_reads_database_once(session: db.Session, user_with_token: db.User, token: Token) -> None:
+    cache_handler = CacheHandler(user_id=user_with_token.id, session=session)
+    assert cache_handler.get_cached_token() == token.model_dump()
+    user_with_token.token = None
+    assert cache_handler.get_cached_token() == token.model_dump()
+
+
+def test_save_token_writes_database_only_on_change(
+    session: db.Session,
+    user_with_token: db.User,
+    token: Token,
+) -> None:
+    cache_handler = CacheHandler(user_id=user_with_token.id, session=session)
+    cache_handler.get_cached_token()
+    user_with_token.token = "unchanged"  # noqa: S105
+    cache_handler.save_token_to_cache(token.model_dump())
+    assert user_with_token.token == "unchanged"  # noqa: S105
+    new_token = token.model_copy(update={"access_token": "new"})
+    cache_handler.save_token_to_cache(new_token.model_dump())
+    assert user_with_token.token == new_token.model_dump_json()
+    assert cache_handler.get_cached_token() == new_token.model_dump()
+
+
+def test_token_is_refreshed_once_before_expiry(session: db.Session, user_without_token: db.User, token: Token) -> None:
+    cache_handler = CacheHandler(user_id=user_without_token.id, session=session)
+    # Still valid for spotipy, which refreshes tokens a minute before expiry
+    expires_at = int(time.time()) + REFRESH_MARGIN_SECONDS // 2
+    cache_handler.save_token_to_cache(token.model_copy(update={"expires_at": expires_at}).model_dump())
+    auth_manager = SingleFlightSpotifyOAuth(
+        client_id="id",
+        client_secret="secret",  # noqa: S106
+        redirect_uri="http://localhost",
+        scope=token.scope,
+        cache_handler=cache_handler,
+    )
+    refreshed = token.model_copy(update={"access_token": "refreshed", "expires_at": int(time.time()) + 3600})
+
+    def refresh_access_token(refresh_token: str) -> dict[str, object]:  # noqa: ARG001
+        time.sleep(0.05)
+        cache_handler.save_token_to_cache(refreshed.model_dump())
+        return refreshed.model_dump()
+
+    with patch.object(auth_manager, "refresh_access_token", side_effect=refresh_access_token) as mock:
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(auth_manager.get_access_token(as_dict=False)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    mock.assert_called_once()
+    assert results == ["refreshed"] * len(threads)
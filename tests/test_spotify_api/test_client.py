@@ -1,18 +1,26 @@
 from __future__ import annotations
 
 import datetime
+import threading
 import time
 from typing import TYPE_CHECKING, Any
 from unittest.mock import Mock, patch
 
 import pytest
+import spotipy  # type: ignore[import-untyped]
 from requests import ConnectionError as RequestsConnectionError
 from requests import ReadTimeout
 
 from lofi.spotify_api import SpotifyAPIClient
-from lofi.spotify_api.client import chunk, get_first_differing_index, get_tracklist_diffs, retry_on_timeout
-from lofi.spotify_api.errors import PlaylistAlreadyExistsError
-from lofi.spotify_api.models import ArtistAlbum, Playlist, User
+from lofi.spotify_api.client import (
+    chunk,
+    get_page_offsets,
+    retry_on_timeout,
+    set_url_offset,
+)
+from lofi.spotify_api.errors import PlaylistAlreadyExistsError, SearchWindowSaturatedError
+from lofi.spotify_api.models import ArtistAlbum, Page, Playlist, User
+from lofi.spotify_api.tracklist_utils import TracklistStrategy
 
 if TYPE_CHECKING:
     from collections.abc import Sequence
@@ -45,32 +53,22 @@ def test_client_uses_env_variable_if_no_user_id_is_provided(session: db.Session,
     assert SpotifyAPIClient(session).user_id == default_user_id
 
 
-@pytest.mark.parametrize(
-    ("l1", "l2", "expected"),
-    [([], [], None), ([], [1, 2], None), ([1], [1, 2], None), ([1, 2, 3], [1, 2, 4], 2), ([1, 2], [1, 0, 3], 1)],
-)
-def test_get_first_differing_index(l1: list[int], l2: list[int], expected: int) -> None:
-    assert get_first_differing_index(l1, l2) == expected
-    assert get_first_differing_index(l2, l1) == expected
+@pytest.mark.usefixtures("default_user_id")
+@pytest.mark.parametrize(("max_workers", "expected"), [(1, 10), (32, 32)])
+def test_connection_pool_is_sized_for_workers(session: db.Session, max_workers: int, expected: int) -> None:
+    client = SpotifyAPIClient(session, max_workers=max_workers)
+    adapter = client.api._session.get_adapter("https://api.spotify.com")  # noqa: SLF001
+    assert adapter._pool_maxsize == expected  # noqa: SLF001
+    assert adapter.max_retries.total == client.api.retries
 
 
-@pytest.mark.parametrize(
-    ("target", "current", "expected_added", "expected_removed"),
-    [
-        ([], [], [], []),
-        ([], [1, 2], [], [1, 2]),
-        ([1], [1, 2], [1], [1, 2]),
-        ([1, 2, 3], [2, 3], [1], []),
-        ([1, 3], [1, 0, 3], [1], [1, 0]),
-    ],
-)
-def test_get_tracklist_diffs(
-    target: list[int],
-    current: list[int],
-    expected_added: list[int],
-    expected_removed: list[int],
-) -> None:
-    assert get_tracklist_diffs(target, current) == (expected_added, expected_removed)
+@pytest.mark.usefixtures("default_user_id")
+def test_client_context_closes_connections(session: db.Session) -> None:
+    client = SpotifyAPIClient(session)
+    with patch.object(client.api._session, "close") as close:  # noqa: SLF001
+        with client:
+            close.assert_not_called()
+        close.assert_called_once()
 
 
 @pytest.mark.usefixtures("default_user_id")
@@ -82,11 +80,14 @@ def test_retry_on_timeout(session: db.Session, exc: type[RequestsConnectionError
         def raise_exc(self: SpotifyAPIClient) -> None:  # noqa: ARG001
             raise exc()
 
+        client = SpotifyAPIClient(session)
+        api = client.api
         with pytest.raises(exc):
-            raise_exc(SpotifyAPIClient(session))
+            raise_exc(client)
 
     call_args = [call.args for call in mock.call_args_list]
     assert call_args == [(2**i,) for i in range(10)]
+    assert client.api is api
 
 
 @pytest.mark.parametrize(("it", "n", "expected"), [([], 2, []), (range(5), 2, [[0, 1], [2, 3], [4]])])
@@ -110,12 +111,21 @@ def test_set_playlist_tracks(session: db.Session, *, fetch_current_tracklist: bo
         playlist_id: list(map(str, reversed(range(10, 1000, 3)))),
     }
 
-    def add_items(playlist_id: str, ids: list[str], position: int) -> None:
+    def get_snapshot_id() -> dict[str, str]:
+        return {"snapshot_id": ",".join(playlists[playlist_id])}
+
+    def add_items(playlist_id: str, ids: list[str], position: int) -> dict[str, str]:
         playlists[playlist_id] = playlists[playlist_id][:position] + ids + playlists[playlist_id][position:]
+        return get_snapshot_id()
 
-    def remove_items(playlist_id: str, ids: list[str]) -> None:
+    def remove_items(playlist_id: str, ids: list[str]) -> dict[str, str]:
         ids_set = set(ids)
         playlists[playlist_id] = [t for t in playlists[playlist_id] if t not in ids_set]
+        return get_snapshot_id()
+
+    def replace_items(playlist_id: str, ids: list[str]) -> dict[str, str]:
+        playlists[playlist_id] = list(ids)
+        return get_snapshot_id()
 
     def get_items(playlist_id: str, limit: int, offset: int = 0) -> dict[str, Any]:
         return {
@@ -133,15 +143,73 @@ def test_set_playlist_tracks(session: db.Session, *, fetch_current_tracklist: bo
         session,
         playlist_add_items=add_items,
         playlist_remove_all_occurrences_of_items=remove_items,
+        playlist_replace_items=replace_items,
         playlist_items=get_items,
         next=next,
     )
-    api.set_playlist_tracks(
+    snapshot_id = api.set_playlist_tracks(
         playlist_id,
         expected := list(map(str, reversed(range(1000)))),
         None if fetch_current_tracklist else playlists[playlist_id],
     )
     assert playlists[playlist_id] == expected
+    assert snapshot_id == ",".join(expected)
+    assert api.set_playlist_tracks(playlist_id, expected, expected) is None
+
+
+@pytest.mark.usefixtures("default_user_id")
+@pytest.mark.parametrize("applied_before_timeout", [True, False])
+def test_set_playlist_tracks_replans_after_timeout(session: db.Session, *, applied_before_timeout: bool) -> None:
+    current = list(map(str, range(300)))
+    tracklist = list(current)
+    timeouts = [ReadTimeout()]
+
+    def add_items(_: str, ids: list[str], position: int) -> dict[str, str]:
+        # Inserts are not idempotent: time out on the first one, once
+        if timeouts and not applied_before_timeout:
+            raise timeouts.pop()
+        tracklist[position:position] = ids
+        if timeouts:
+            raise timeouts.pop()
+        return {"snapshot_id": ",".join(tracklist)}
+
+    def remove_items(_: str, ids: list[str]) -> dict[str, str]:
+        tracklist[:] = [track_id for track_id in tracklist if track_id not in ids]
+        return {"snapshot_id": ",".join(tracklist)}
+
+    def get_items(*_: object, **__: object) -> dict[str, Any]:
+        return {"items": [{"track": {"id": track_id}} for track_id in tracklist], "next": None}
+
+    api = get_patched_client(
+        session,
+        playlist_add_items=add_items,
+        playlist_remove_all_occurrences_of_items=remove_items,
+        playlist_items=get_items,
+        playlist=lambda _: {**DEFAULT_PATCHED_PLAYLIST, "snapshot_id": ",".join(tracklist)},
+    )
+    expected = ["x", "y", *current[:150], *current[151:]]
+    with patch.object(time, "sleep"):
+        snapshot_id = api.set_playlist_tracks("foo", expected, current)
+    assert tracklist == expected
+    assert snapshot_id == ",".join(expected)
+
+
+@pytest.mark.usefixtures("default_user_id")
+def test_set_playlist_tracks_skips_unchanged_tracklist_with_duplicates(session: db.Session) -> None:
+    replace_items = Mock()
+    api = get_patched_client(session, playlist_replace_items=replace_items)
+    assert api.set_playlist_tracks("foo", ["1", "1"], ["1", "1"]) is None
+    replace_items.assert_not_called()
+
+
+@pytest.mark.usefixtures("default_user_id")
+def test_plan_playlist_tracks_does_not_mutate_playlist(session: db.Session) -> None:
+    api = get_patched_client(session)
+    current = list(map(str, range(500)))
+    plan = api.plan_playlist_tracks("foo", list(map(str, range(1, 500))), current)
+    assert plan.strategy == TracklistStrategy.suffix_diff
+    assert plan.request_count == 1
+    assert plan.payload == 1
 
 
 @pytest.mark.usefixtures("default_user_id")
@@ -188,11 +256,205 @@ def test_create_playlist_that_does_not_exist(session: db.Session) -> None:
     create_playlist.assert_called_once()
 
 
+@pytest.mark.usefixtures("default_user_id")
+def test_playlist_index_is_listed_once_and_updated_on_create(session: db.Session) -> None:
+    existing = Playlist.model_validate({**DEFAULT_PATCHED_PLAYLIST, "id": "existing", "name": "Existing"})
+    created = Playlist.model_validate({**DEFAULT_PATCHED_PLAYLIST, "id": "created", "name": "Created"})
+    user_playlists = Mock(return_value={"items": [existing.model_dump()]})
+    api = get_patched_client(
+        session,
+        user_playlists=user_playlists,
+        user_playlist_create=Mock(return_value=created.model_dump()),
+    )
+    assert api.create_playlist("Existing", skip_if_already_exists=True) == existing
+    assert api.create_playlist("Created") == created
+    assert api.create_playlist("Created", skip_if_already_exists=True) == created
+    assert set(api.get_playlist_index().by_id) == {"existing", "created"}
+    user_playlists.assert_called_once()
+    assert set(api.get_playlist_index(refresh=True).by_id) == {"existing"}
+    assert user_playlists.call_count == 2  # noqa: PLR2004
+
+
 @pytest.mark.usefixtures("default_user_id")
 def test_get_artist_albums(session: db.Session) -> None:
     artist_id = "foo"
     props = {"release_date": datetime.date.today(), "total_tracks": 10}
     albums = [{"id": "foo", "name": "Foo", **props}, {"id": "bar", "name": "Bar", **props}]
-    api = get_patched_client(session, artist_albums=Mock(return_value={"items": albums}))
+    api = get_patched_client(session, artist_albums=Mock(return_value={"items": albums, "total": 2}))
     received = api.artist_albums(artist_id)
-    assert received == list(map(ArtistAlbum.model_validate, albums))
+    assert received == Page[ArtistAlbum](items=list(map(ArtistAlbum.model_validate, albums)), total=2)
+
+
+@pytest.mark.usefixtures("default_user_id")
+def test_get_artist_albums_skips_after_first_page(session: db.Session) -> None:
+    props = {"release_date": datetime.date.today(), "total_tracks": 10}
+    response = {"items": [{"id": "foo", "name": "Foo", **props}], "total": 2, "next": "https://next"}
+    api = get_patched_client(session, artist_albums=Mock(return_value=response), next=(next_page := Mock()))
+    assert api.artist_albums("foo", skip_if=lambda page: page.total == 2) is None  # noqa: PLR2004
+    next_page.assert_not_called()
+
+
+def get_raw_track(track_id: str) -> dict[str, Any]:
+    return {
+        "id": track_id,
+        "name": "",
+        "album": {"id": "", "name": ""},
+        "artists": [],
+        "external_ids": {"isrc": ""},
+        "popularity": 0,
+        "track_number": 0,
+    }
+
+
+@pytest.mark.usefixtures("default_user_id")
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_tracks_are_returned_in_input_order(session: db.Session, max_workers: int) -> None:
+    def tracks(ids: list[str]) -> dict[str, Any]:
+        time.sleep(0.01 * (int(ids[0]) % 3))
+        return {"tracks": [get_raw_track(track_id) for track_id in ids]}
+
+    api = get_patched_client(session, tracks=tracks)
+    api.max_workers = max_workers
+    ids = [str(i) for i in range(500)]
+    assert [track.id for track in api.tracks(ids)] == ids
+
+
+@pytest.mark.usefixtures("default_user_id")
+def test_iter_tracks_fetches_one_window_at_a_time(session: db.Session) -> None:
+    requested: list[str] = []
+
+    def tracks(ids: list[str]) -> dict[str, Any]:
+        requested.extend(ids)
+        return {"tracks": [get_raw_track(track_id) for track_id in ids]}
+
+    api = get_patched_client(session, tracks=tracks)
+    ids = [str(i) for i in range(250)]
+    windows = api.iter_tracks(ids, window_size=100)
+    assert [track.id for track in next(windows)] == ids[:100]
+    assert requested == ids[:100]
+    assert [len(window) for window in windows] == [100, 50]
+    assert requested == ids
+
+
+@pytest.mark.usefixtures("default_user_id")
+def test_map_concurrently_isolates_failures(session: db.Session) -> None:
+    called = []
+
+    def func(i: int) -> int:
+        called.append(i)
+        if i == 1:
+            raise ValueError
+        return i
+
+    api = SpotifyAPIClient(session, max_workers=4)
+    with pytest.raises(ValueError):  # noqa: PT011
+        api.map_concurrently(func, list(range(10)))
+    assert sorted(called) == [0, 1, 1, *range(2, 10)]
+
+
+@pytest.mark.usefixtures("default_user_id")
+def test_map_concurrently_runs_nested_calls_on_the_worker_thread(session: db.Session) -> None:
+    api = SpotifyAPIClient(session, max_workers=4)
+
+    def get_thread_ids(_: int) -> set[int]:
+        outer = threading.get_ident()
+        inner = api.map_concurrently(lambda _: threading.get_ident(), list(range(4)), show_progress=False)
+        return {outer, *inner}
+
+    thread_ids = api.map_concurrently(get_thread_ids, list(range(4)))
+    assert all(len(ids) == 1 for ids in thread_ids)
+    assert threading.get_ident() not in set().union(*thread_ids)
+
+
+@pytest.mark.usefixtures("default_user_id")
+def test_map_concurrently_retries_failed_calls_alone(session: db.Session) -> None:
+    called = []
+
+    def func(i: int) -> int:
+        called.append(i)
+        if i == 1 and called.count(1) == 1:
+            raise ValueError
+        return i
+
+    api = SpotifyAPIClient(session, max_workers=4)
+    assert api.map_concurrently(func, list(range(10))) == list(range(10))
+    assert sorted(called) == [0, 1, 1, *range(2, 10)]
+
+
+@pytest.mark.usefixtures("default_user_id")
+def test_failing_batch_is_retried_alone(session: db.Session) -> None:
+    calls: list[str] = []
+
+    def tracks(_: spotipy.Spotify, ids: list[str]) -> dict[str, Any]:
+        calls.append(ids[0])
+        if ids[0] == "50" and calls.count("50") == 1:
+            raise ReadTimeout
+        return {"tracks": [get_raw_track(track_id) for track_id in ids]}
+
+    ids = [str(i) for i in range(150)]
+    with patch.object(spotipy.Spotify, "tracks", tracks), patch.object(time, "sleep"):
+        received = SpotifyAPIClient(session, max_workers=3).tracks(ids)
+    assert [track.id for track in received] == ids
+    assert sorted(calls) == sorted(["0", "50", "50", "100"])
+
+
+@pytest.mark.parametrize(
+    ("page", "max_offset", "expected"),
+    [
+        ({"offset": 0, "limit": 50, "total": 30}, None, []),
+        ({"offset": 0, "limit": 50, "total": 120}, None, [50, 100]),
+        ({"offset": 0, "limit": 50, "total": 5000}, 950, list(range(50, 1000, 50))),
+        ({"offset": 100, "limit": 100, "total": 301}, None, [200, 300]),
+    ],
+)
+def test_get_page_offsets(page: dict[str, int], max_offset: int | None, expected: list[int]) -> None:
+    assert list(get_page_offsets(page, max_offset)) == expected
+
+
+def test_set_url_offset() -> None:
+    url = "https://api.spotify.com/v1/search?query=foo&type=album&offset=50&limit=50"
+    expected = "https://api.spotify.com/v1/search?query=foo&type=album&offset=900&limit=50"
+    assert set_url_offset(url, 900) == expected
+
+
+@pytest.mark.usefixtures("default_user_id")
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_search_albums_fetches_all_pages_up_to_max_offset(session: db.Session, max_workers: int) -> None:
+    url = "https://api.spotify.com/v1/search?q=foo&type=album&offset={}&limit=50"
+    total = 1234
+    requested_offsets = []
+
+    def get_page(offset: int) -> dict[str, Any]:
+        requested_offsets.append(offset)
+        albums = [
+            {"id": str(i), "name": "", "album_type": "single", "artists": [], "release_date": "2020"}
+            for i in range(offset, min(offset + 50, total))
+        ]
+        next_url = url.format(offset + 50) if offset + 50 < total else None
+        page = {"items": albums, "limit": 50, "offset": offset, "total": total, "next": next_url}
+        return {"albums": page}
+
+    def get(url: str) -> dict[str, Any]:
+        return get_page(int(dict(p.split("=") for p in url.split("?")[1].split("&"))["offset"]))
+
+    api = get_patched_client(
+        session,
+        search=lambda *args, **kwargs: get_page(0),  # noqa: ARG005
+        _get=get,
+        next=lambda response: get(response["next"]),
+    )
+    api.max_workers = max_workers
+    albums = api.search_albums("foo")
+    assert [album.id for album in albums] == [str(i) for i in range(1000)]
+    assert sorted(requested_offsets) == list(range(0, 1000, 50))
+
+
+@pytest.mark.usefixtures("default_user_id")
+def test_saturated_search_raises_after_first_page(session: db.Session) -> None:
+    page = {"items": [], "limit": 50, "offset": 0, "total": 1001, "next": "https://api.spotify.com/v1/search"}
+    api = get_patched_client(session, search=Mock(return_value={"albums": page}), _get=Mock(), next=Mock())
+    with pytest.raises(SearchWindowSaturatedError) as e:
+        api.search_albums("foo", raise_if_saturated=True)
+    assert (e.value.q, e.value.total) == ("foo", 1001)
+    api.api._get.assert_not_called()  # noqa: SLF001
+    api.api.next.assert_not_called()
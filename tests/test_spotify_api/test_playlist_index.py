@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from lofi.spotify_api import Playlist
+from lofi.spotify_api.playlist_index import PlaylistIndex
+
+
+def get_playlist(playlist_id: str, name: str) -> Playlist:
+    return Playlist.model_validate(
+        {
+            "id": playlist_id,
+            "images": [],
+            "name": name,
+            "owner": {"id": "", "display_name": ""},
+            "snapshot_id": "",
+        },
+    )
+
+
+def test_playlist_index_lists_playlists_sharing_a_name() -> None:
+    index = PlaylistIndex([get_playlist("a", "Foo"), get_playlist("b", "Bar"), get_playlist("c", "Foo")])
+    assert len(index) == 3  # noqa: PLR2004
+    assert [p.id for p in index.get_by_name("Foo")] == ["a", "c"]
+    assert index.get_by_name("Baz") == []
+    assert "Baz" not in index.by_name
+
+
+def test_playlist_index_replaces_readded_playlist() -> None:
+    index = PlaylistIndex([get_playlist("a", "Foo")])
+    index.add(get_playlist("a", "Bar"))
+    assert len(index) == 1
+    assert index.get_by_name("Foo") == []
+    assert [p.id for p in index.get_by_name("Bar")] == ["a"]
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING
+from unittest.mock import Mock, patch
+
+import pytest
+import spotipy  # type: ignore[import-untyped]
+
+from lofi.spotify_api.client import RateLimitedSpotify
+from lofi.spotify_api.rate_limiter import RateLimiter, get_retry_after
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+class FakeSpotifyHandler(BaseHTTPRequestHandler):
+    """Answer queued `(status, headers)` responses, then `{"id": "foo"}`."""
+
+    queued: list[tuple[int, dict[str, str]]]
+    requests: int
+
+    def do_GET(self) -> None:  # noqa: N802
+        type(self).requests += 1
+        status, headers = self.queued.pop(0) if self.queued else (200, {})
+        body = json.dumps({"id": "foo"}).encode()
+        self.send_response(status)
+        for name, value in {"Content-Type": "application/json", **headers}.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server() -> Iterator[ThreadingHTTPServer]:
+    FakeSpotifyHandler.queued = []
+    FakeSpotifyHandler.requests = 0
+    with ThreadingHTTPServer(("127.0.0.1", 0), FakeSpotifyHandler) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        thread.join()
+
+
+def get_server_api(server: ThreadingHTTPServer) -> RateLimitedSpotify:
+    api = RateLimitedSpotify(auth="token", retries=3, backoff_factor=0)
+    api.prefix = f"http://127.0.0.1:{server.server_address[1]}/"
+    return api
+
+
+@pytest.fixture
+def clock() -> Iterator[Mock]:
+    with patch.object(time, "monotonic", Mock(return_value=100.0)) as mock:
+        yield mock
+
+
+@pytest.mark.usefixtures("clock")
+def test_reserve_spaces_requests_once_bucket_is_empty() -> None:
+    rate_limiter = RateLimiter(rate=10, capacity=2)
+    delays = [rate_limiter.reserve() for _ in range(5)]
+    assert delays == pytest.approx([0, 0, 0.1, 0.2, 0.3])
+    assert rate_limiter.requests == len(delays)
+    assert rate_limiter.throttled_seconds == pytest.approx(0.6)
+
+
+def test_bucket_refills_over_time(clock: Mock) -> None:
+    rate_limiter = RateLimiter(rate=10, capacity=2)
+    for _ in range(3):
+        rate_limiter.reserve()
+    clock.return_value += 1
+    assert rate_limiter.reserve() == 0
+
+
+def test_pause_delays_all_callers(clock: Mock) -> None:
+    rate_limiter = RateLimiter(rate=10, capacity=2)
+    rate_limiter.pause(5)
+    assert rate_limiter.reserve() == pytest.approx(5.1)
+    assert rate_limiter.reserve() == pytest.approx(5.2)
+    clock.return_value += 10
+    assert rate_limiter.reserve() == 0
+    assert rate_limiter.paused_seconds == pytest.approx(5)
+    assert rate_limiter.rate_limited_responses == 1
+
+
+@pytest.mark.parametrize(
+    ("headers", "expected"), [(None, 1), ({}, 1), ({"Retry-After": "3"}, 3), ({"Retry-After": "x"}, 1)]
+)
+def test_get_retry_after(headers: dict[str, str] | None, expected: float) -> None:
+    assert get_retry_after(headers) == expected
+
+
+def test_rate_limited_responses_pause_rate_limiter() -> None:
+    rate_limiter = Mock(spec=RateLimiter)
+    rate_limited = spotipy.SpotifyException(429, -1, "", headers={"Retry-After": "3"})
+    internal_call = Mock(side_effect=[rate_limited, rate_limited, {"id": "foo"}])
+    with (
+        patch("lofi.spotify_api.client.get_rate_limiter", return_value=rate_limiter),
+        patch.object(spotipy.Spotify, "_internal_call", internal_call),
+    ):
+        assert RateLimitedSpotify().me() == {"id": "foo"}
+    assert rate_limiter.acquire.call_count == internal_call.call_count
+    assert [call.args for call in rate_limiter.pause.call_args_list] == [(3,), (3,)]
+
+
+def test_rate_limited_responses_reach_rate_limiter(server: ThreadingHTTPServer) -> None:
+    FakeSpotifyHandler.queued = [(429, {"Retry-After": "3"})]
+    rate_limiter = Mock(spec=RateLimiter)
+    with patch("lofi.spotify_api.client.get_rate_limiter", return_value=rate_limiter):
+        assert get_server_api(server).me() == {"id": "foo"}
+    assert FakeSpotifyHandler.requests == 2  # noqa: PLR2004
+    rate_limiter.pause.assert_called_once_with(3)
+
+
+def test_server_errors_keep_their_status(server: ThreadingHTTPServer) -> None:
+    FakeSpotifyHandler.queued = [(503, {})] * 10
+    rate_limiter = Mock(spec=RateLimiter)
+    with (
+        patch("lofi.spotify_api.client.get_rate_limiter", return_value=rate_limiter),
+        pytest.raises(spotipy.SpotifyException) as exc_info,
+    ):
+        get_server_api(server).me()
+    assert exc_info.value.http_status == 503  # noqa: PLR2004
+    rate_limiter.pause.assert_not_called()
+
+
+def test_other_errors_are_not_retried() -> None:
+    internal_call = Mock(side_effect=spotipy.SpotifyException(404, -1, ""))
+    with patch.object(spotipy.Spotify, "_internal_call", internal_call), pytest.raises(spotipy.SpotifyException):
+        RateLimitedSpotify().me()
+    internal_call.assert_called_once()
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import datetime
+import time
+from typing import TYPE_CHECKING
+from unittest.mock import Mock, patch
+
+import pytest
+
+from lofi.spotify_api.client import RateLimitedSpotify
+from lofi.spotify_api.response_cache import ResponseCache, get_cache_key, get_endpoint
+
+if TYPE_CHECKING:
+    import pathlib
+    from collections.abc import Iterator
+
+TTL = datetime.timedelta(days=1)
+
+
+@pytest.fixture
+def cache(tmp_path: pathlib.Path) -> ResponseCache:
+    return ResponseCache(tmp_path / "cache.db", max_entries=3)
+
+
+@pytest.fixture
+def clock() -> Iterator[Mock]:
+    with patch.object(time, "time", Mock(return_value=1_000.0)) as mock:
+        yield mock
+
+
+@pytest.mark.parametrize(
+    ("url", "params", "expected"),
+    [
+        ("albums/", {"ids": "a,b", "market": None}, "albums?ids=a%2Cb"),
+        ("https://api.spotify.com/v1/search?type=album&q=x", {"limit": 50}, "search?limit=50&q=x&type=album"),
+        ("artists/abc/albums?offset=50&limit=50", None, "artists/abc/albums?limit=50&offset=50"),
+    ],
+)
+def test_get_cache_key(url: str, params: dict[str, object] | None, expected: str) -> None:
+    assert get_cache_key(url, params) == expected
+
+
+@pytest.mark.parametrize(
+    ("key", "expected"),
+    [
+        ("albums?ids=a", "albums"),
+        ("artists/abc/albums?limit=50", "artists/{id}/albums"),
+        ("playlists/p", "playlists/{id}"),
+    ],
+)
+def test_get_endpoint(key: str, expected: str) -> None:
+    assert get_endpoint(key) == expected
+
+
+def test_ttl_is_none_for_uncached_endpoints(cache: ResponseCache) -> None:
+    assert cache.get_ttl("albums?ids=a") == datetime.timedelta(days=7)
+    assert cache.get_ttl("me?") is None
+
+
+@pytest.mark.parametrize("key", ["users/u/playlists?limit=50", "playlists/p?", "playlists/p/tracks?offset=0"])
+def test_playlists_are_not_cached(cache: ResponseCache, key: str) -> None:
+    assert cache.get_ttl(key) is None
+
+
+def test_get_returns_cached_response_until_expiry(cache: ResponseCache, clock: Mock) -> None:
+    cache.set("albums?ids=a", {"albums": [1]}, TTL)
+    assert cache.get("albums?ids=a") == {"albums": [1]}
+    clock.return_value += TTL.total_seconds()
+    assert cache.get("albums?ids=a") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evict_removes_least_recently_used_responses(cache: ResponseCache, clock: Mock) -> None:
+    for key in ["a", "b", "c", "d"]:
+        clock.return_value += 1
+        cache.set(key, key, TTL)
+    clock.return_value += 1
+    cache.get("a")
+    cache.evict()
+    assert [cache.get(key) for key in ["a", "b", "c", "d"]] == ["a", None, "c", "d"]
+
+
+def test_invalidate_removes_written_resource(cache: ResponseCache) -> None:
+    for key in ["playlists/p?", "playlists/p/tracks?offset=0", "playlists/p2?", "albums?ids=p"]:
+        cache.set(key, key, TTL)
+    cache.invalidate("playlists/p/tracks")
+    assert cache.get("playlists/p?") is None
+    assert cache.get("playlists/p/tracks?offset=0") is None
+    assert cache.get("playlists/p2?") == "playlists/p2?"
+    assert cache.get("albums?ids=p") == "albums?ids=p"
+
+
+def test_disabled_bypasses_cache(cache: ResponseCache) -> None:
+    with cache.disabled():
+        assert cache.get_ttl("albums?ids=a") is None
+    assert cache.get_ttl("albums?ids=a") is not None
+
+
+def test_rate_limited_spotify_serves_cached_responses(cache: ResponseCache) -> None:
+    api = RateLimitedSpotify(auth_manager=Mock())
+    with (
+        patch("lofi.spotify_api.client.get_response_cache", return_value=cache),
+        patch.object(api, "_send", return_value={"albums": []}) as send,
+    ):
+        for _ in range(2):
+            assert api._internal_call("GET", "albums/", None, {"ids": "a"}) == {"albums": []}  # noqa: SLF001
+        send.assert_called_once()
+        api._internal_call("PUT", "albums/", None, {})  # noqa: SLF001
+        api._internal_call("GET", "albums/", None, {"ids": "a"})  # noqa: SLF001
+    assert send.call_count == 3  # noqa: PLR2004
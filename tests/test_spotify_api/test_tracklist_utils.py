@@ -1,10 +1,75 @@
 from __future__ import annotations
 
 import itertools
+import random
+from typing import TYPE_CHECKING
 
 import pytest
 
-from lofi.spotify_api.tracklist_utils import InvertibleList, get_tracklist_reorders
+from lofi.spotify_api.tracklist_utils import (
+    InvertibleList,
+    TracklistEdits,
+    TracklistInsert,
+    TracklistPlan,
+    TracklistRemove,
+    TracklistReorder,
+    TracklistReplace,
+    TracklistStrategy,
+    get_first_differing_index,
+    get_longest_increasing_subsequence,
+    get_minimal_edits_plan,
+    get_reorders_plan,
+    get_replace_plan,
+    get_suffix_diff_plan,
+    get_tracklist_diffs,
+    get_tracklist_edits,
+    get_tracklist_plan,
+    get_tracklist_reorders,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
+def apply_tracklist_edits(current: list[int], edits: TracklistEdits[int]) -> list[int]:
+    ids_to_remove = set(edits.ids_to_remove)
+    current = [track_id for track_id in current if track_id not in ids_to_remove]
+    for insert in edits.inserts:
+        assert len(insert.ids) <= 100  # noqa: PLR2004
+        current[insert.position : insert.position] = insert.ids
+    return current
+
+
+def apply_tracklist_reorders(current: list[int], reorders: Iterable[TracklistReorder]) -> list[int]:
+    """Apply reorders the way Spotify API does."""
+    current = list(current)
+    for reorder in reorders:
+        start, stop = reorder.range_start, reorder.range_start + reorder.range_length
+        assert reorder.range_length <= 100  # noqa: PLR2004
+        assert not start < reorder.insert_before <= stop
+        moved = current[start:stop]
+        insert_before = (
+            reorder.insert_before - reorder.range_length if reorder.insert_before > stop else reorder.insert_before
+        )
+        del current[start:stop]
+        current[insert_before:insert_before] = moved
+    return current
+
+
+def apply_tracklist_plan(current: list[int], plan: TracklistPlan[int]) -> list[int]:
+    for step in plan.steps:
+        if isinstance(step, TracklistRemove):
+            assert len(step.ids) <= 100  # noqa: PLR2004
+            current = [track_id for track_id in current if track_id not in step.ids]
+        elif isinstance(step, TracklistInsert):
+            assert len(step.ids) <= 100  # noqa: PLR2004
+            current = [*current[: step.position], *step.ids, *current[step.position :]]
+        elif isinstance(step, TracklistReplace):
+            assert len(step.ids) <= 100  # noqa: PLR2004
+            current = list(step.ids)
+        else:
+            current = apply_tracklist_reorders(current, [step])
+    return current
 
 
 @pytest.mark.parametrize(
@@ -33,14 +98,218 @@ def test_insert_into_invertible_list(input_list: list[int], start: int, values:
         assert il.index(val) == input_list.index(val)
 
 
+@pytest.mark.parametrize(
+    ("input_list", "start", "length", "insert_before"),
+    [
+        (list(range(n)), i, length, insert_before)
+        for n in range(6)
+        for i in range(n)
+        for length in range(n - i)
+        for insert_before in range(n - length + 1)
+    ],
+)
+def test_move_in_invertible_list(input_list: list[int], start: int, length: int, insert_before: int) -> None:
+    il = InvertibleList(input_list)
+    il.move(start, length, insert_before)
+    moved = input_list[start : start + length]
+    del input_list[start : start + length]
+    input_list[insert_before:insert_before] = moved
+    assert list(il) == input_list
+    for val in input_list:
+        assert il.index(val) == input_list.index(val)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_invertible_list_matches_list(seed: int) -> None:
+    rng = random.Random(seed)  # noqa: S311
+    values = list(range(200))
+    il = InvertibleList(values)
+    for _ in range(100):
+        start = rng.randrange(len(values))
+        length = rng.randrange(len(values) - start)
+        insert_before = rng.randrange(len(values) - length + 1)
+        il.move(start, length, insert_before)
+        moved = values[start : start + length]
+        del values[start : start + length]
+        values[insert_before:insert_before] = moved
+    assert len(il) == len(values)
+    assert list(il) == values
+    assert [il[i] for i in range(-len(values), len(values))] == values + values
+    assert il[10:20] == values[10:20]
+    assert il[190:250] == values[190:250]
+    assert il[::3] == values[::3]
+    assert all(il.index(val) == i for i, val in enumerate(values))
+    with pytest.raises(IndexError):
+        il[len(values)]
+
+
 @pytest.mark.parametrize(
     ("current", "target"),
     [(list(permutation), list(range(n))) for n in range(5) for permutation in itertools.permutations(list(range(n)))],
 )
 def test_get_tracklist_reorders(current: list[int], target: list[int]) -> None:
-    for reorder in get_tracklist_reorders(target, current):
-        moved_indexes = slice(reorder.range_start, reorder.range_start + reorder.range_length)
-        moved_items = current[moved_indexes]
-        del current[moved_indexes]
-        current = current[: reorder.insert_before] + moved_items + current[reorder.insert_before :]
-    assert target == current
+    assert apply_tracklist_reorders(current, get_tracklist_reorders(target, current)) == target
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_get_tracklist_reorders_of_large_playlist(seed: int) -> None:
+    rng = random.Random(seed)  # noqa: S311
+    target = list(range(2_000))
+    current = rng.sample(target, len(target))
+    reorders = list(get_tracklist_reorders(target, current))
+    assert apply_tracklist_reorders(current, reorders) == target
+    # Only tracks out of a longest increasing subsequence of target positions move
+    moved_count = len(target) - len(get_longest_increasing_subsequence(current))
+    assert sum(reorder.range_length for reorder in reorders) == moved_count
+
+
+@pytest.mark.parametrize(
+    ("current", "target", "expected"),
+    [
+        ([1, 2, 3, 0], [0, 1, 2, 3], [(3, 1, 0)]),
+        ([3, 0, 1, 2], [0, 1, 2, 3], [(0, 1, 4)]),
+        ([4, 5, 0, 1, 2, 3], [0, 1, 2, 3, 4, 5], [(0, 2, 6)]),
+        ([0, 3, 4, 5, 1, 2, 6], [0, 1, 2, 3, 4, 5, 6], [(4, 2, 1)]),
+        (list(range(150, 300)) + list(range(150)), list(range(300)), [(0, 100, 300), (0, 50, 300)]),
+    ],
+)
+def test_get_tracklist_reorders_moves_ranges(
+    current: list[int],
+    target: list[int],
+    expected: list[tuple[int, int, int]],
+) -> None:
+    reorders = list(get_tracklist_reorders(target, current))
+    assert [(r.range_start, r.range_length, r.insert_before) for r in reorders] == expected
+    assert apply_tracklist_reorders(current, reorders) == target
+
+
+@pytest.mark.parametrize(
+    ("values", "expected_length"),
+    [([], 0), ([3], 1), ([3, 2, 1], 1), ([1, 2, 3], 3), ([2, 2, 2], 1), ([5, 1, 6, 2, 7, 3, 8], 4)],
+)
+def test_get_longest_increasing_subsequence(values: list[int], expected_length: int) -> None:
+    indexes = get_longest_increasing_subsequence(values)
+    assert len(indexes) == expected_length
+    assert indexes == sorted(indexes)
+    assert all(values[i] < values[j] for i, j in itertools.pairwise(indexes))
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_get_tracklist_edits(seed: int) -> None:
+    rng = random.Random(seed)  # noqa: S311
+    # Small ID range so that tracklists share tracks and contain duplicates
+    current = [rng.randrange(15) for _ in range(rng.randrange(12))]
+    target = [rng.randrange(15) for _ in range(rng.randrange(12))]
+    assert apply_tracklist_edits(current, get_tracklist_edits(target, current)) == target
+
+
+def test_get_tracklist_edits_keeps_common_tracks() -> None:
+    current = list(range(1000))
+    # Release added near the end of a label playlist, and one track removed
+    target = [*current[:990], 1000, *current[990:]]
+    del target[10]
+    edits = get_tracklist_edits(target, current)
+    assert edits.ids_to_remove == [10]
+    assert [(insert.position, insert.ids) for insert in edits.inserts] == [(989, [1000])]
+    assert edits.request_count == 2  # noqa: PLR2004
+    assert apply_tracklist_edits(current, edits) == target
+
+
+def test_get_tracklist_edits_merges_close_inserts() -> None:
+    # Removing track 3 along with track 9 is free, and saves an insert request
+    current = list(range(10))
+    target = [*current[:3], 10, current[3], 11, *current[4:9]]
+    edits = get_tracklist_edits(target, current)
+    assert edits.ids_to_remove == [3, 9]
+    assert [(insert.position, insert.ids) for insert in edits.inserts] == [(3, [10, 3, 11])]
+    assert apply_tracklist_edits(current, edits) == target
+
+
+@pytest.mark.parametrize(
+    ("l1", "l2", "expected"),
+    [([], [], None), ([], [1, 2], None), ([1], [1, 2], None), ([1, 2, 3], [1, 2, 4], 2), ([1, 2], [1, 0, 3], 1)],
+)
+def test_get_first_differing_index(l1: list[int], l2: list[int], expected: int) -> None:
+    assert get_first_differing_index(l1, l2) == expected
+    assert get_first_differing_index(l2, l1) == expected
+
+
+@pytest.mark.parametrize(
+    ("target", "current", "expected_added", "expected_removed"),
+    [
+        ([], [], [], []),
+        ([], [1, 2], [], [1, 2]),
+        ([1], [1, 2], [1], [1, 2]),
+        ([1, 2, 3], [2, 3], [1], []),
+        ([1, 3], [1, 0, 3], [1], [1, 0]),
+    ],
+)
+def test_get_tracklist_diffs(
+    target: list[int],
+    current: list[int],
+    expected_added: list[int],
+    expected_removed: list[int],
+) -> None:
+    assert get_tracklist_diffs(target, current) == (expected_added, expected_removed)
+
+
+@pytest.mark.parametrize("seed", range(100))
+@pytest.mark.parametrize("with_duplicates", [False, True])
+def test_tracklist_plans(seed: int, with_duplicates: bool) -> None:  # noqa: FBT001
+    rng = random.Random(seed)  # noqa: S311
+    if with_duplicates:
+        current = rng.choices(range(50), k=rng.randrange(300))
+        target = rng.choices(range(50), k=rng.randrange(300)) + current[rng.randrange(len(current) + 1) :]
+    else:
+        current = rng.sample(range(400), rng.randrange(300))
+        target = rng.sample(range(400), rng.randrange(300))
+    plans = [
+        get_suffix_diff_plan(target, current),
+        get_minimal_edits_plan(target, current),
+        get_reorders_plan(target, current),
+        get_replace_plan(target),
+    ]
+    for plan in plans:
+        if with_duplicates and plan is None:
+            continue
+        assert plan is not None
+        assert apply_tracklist_plan(current, plan) == target
+    assert get_tracklist_plan(target, current).request_count == min(plan.request_count for plan in plans if plan)
+
+
+def test_reorders_plan_is_skipped_on_duplicates() -> None:
+    assert get_reorders_plan([1, 1, 2], [1, 2]) is None
+    assert get_tracklist_plan([1, 1, 2], [1, 2]).strategy != TracklistStrategy.reorders
+
+
+@pytest.mark.parametrize("tracklist", [[], [0], [0, 0], [0, 1, 0]])
+def test_tracklist_plan_is_empty_for_unchanged_tracklists(tracklist: list[int]) -> None:
+    plan = get_tracklist_plan(tracklist, list(tracklist))
+    assert plan.steps == []
+    assert plan.request_count == 0
+
+
+def test_suffix_diff_plan_is_skipped_on_current_duplicates() -> None:
+    assert get_suffix_diff_plan([0], [0, 0]) is None
+    assert get_suffix_diff_plan([0, 0], [0]) is not None
+    assert apply_tracklist_plan([0, 0], get_tracklist_plan([0], [0, 0])) == [0]
+
+
+@pytest.mark.parametrize(
+    ("current", "target", "expected"),
+    [
+        (list(range(1000)), list(range(1000)), (TracklistStrategy.suffix_diff, 0)),
+        (list(range(1000)), [-1, *range(1000)], (TracklistStrategy.suffix_diff, 1)),
+        (list(range(1000)), [*range(990), -1, *range(990, 1000)], (TracklistStrategy.minimal_edits, 1)),
+        (list(range(300)), [*range(1, 300), 0], (TracklistStrategy.reorders, 1)),
+        (list(range(300)), list(reversed(range(300))), (TracklistStrategy.full_replace, 3)),
+    ],
+)
+def test_get_tracklist_plan_picks_cheapest_strategy(
+    current: list[int],
+    target: list[int],
+    expected: tuple[TracklistStrategy, int],
+) -> None:
+    plan = get_tracklist_plan(target, current)
+    assert (plan.strategy, plan.request_count) == expected
+    assert apply_tracklist_plan(current, plan) == target